@@ -0,0 +1,163 @@
+"""
+Архивирование готовых заданий в холодное хранение.
+
+Задания, завершенные больше ARCHIVE_AFTER_DAYS дней назад, переносятся вместе
+с историей из рабочих таблиц tasks и task_history в tasks_archive и
+task_history_archive (id сохраняются). Рабочая таблица остается небольшой,
+и списки, поиск и статистика активных заданий не замедляются с ростом архива.
+
+Перенос выполняется пачками по ARCHIVE_BATCH_SIZE заданий, каждая в своей
+короткой транзакции, поэтому архивирование большого объема не блокирует
+запись надолго. Фоновый планировщик запускает его каждые ARCHIVE_INTERVAL
+секунд вместе со сжатием старой истории (history.py) и снимками заданий
+(revisions.py); POST /api/tasks/archive запускает архивирование немедленно.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Sequence
+
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.orm import Session
+
+from bulk import chunked
+from history import compact_history
+from models import (
+    ArchivedTask, ArchivedTaskHistory, SessionLocal, Task, TaskHistory,
+    begin_write, log_task_changes
+)
+from revisions import snapshot_tasks
+from stats import StatsDelta, apply_stats_delta, count_task
+
+# Через сколько дней после завершения задание уходит в архив (5 рабочих = 7 календарных)
+ARCHIVE_AFTER_DAYS = int(os.getenv("SKLAD_ARCHIVE_AFTER_DAYS", "7"))
+
+# Заданий в одной транзакции переноса
+ARCHIVE_BATCH_SIZE = int(os.getenv("SKLAD_ARCHIVE_BATCH_SIZE", "500"))
+
+# Период фонового архивирования, секунды (0 - планировщик выключен)
+ARCHIVE_INTERVAL = float(os.getenv("SKLAD_ARCHIVE_INTERVAL", "3600"))
+
+TASK_COLUMN_NAMES = [column.name for column in Task.__table__.columns]
+HISTORY_COLUMN_NAMES = [column.name for column in TaskHistory.__table__.columns]
+
+
+def move_to_archive(db: Session, task_ids: Sequence[int], archived_date: datetime):
+    """
+    Перенос заданий и их истории в архивные таблицы (в текущей транзакции).
+    Сначала выполняется вставка в архив, затем удаление из рабочих таблиц:
+    триггер журнала изменений по наличию записи в архиве отличает перенос
+    от удаления.
+    """
+    copied = [name for name in TASK_COLUMN_NAMES if name != "archived"]
+    for chunk in chunked(task_ids):
+        db.execute(
+            insert(ArchivedTask.__table__).from_select(
+                copied + ["archived", "archived_date"],
+                select(
+                    *[Task.__table__.c[name] for name in copied],
+                    literal(True), literal(archived_date)
+                ).where(Task.id.in_(chunk))
+            )
+        )
+        db.execute(
+            insert(ArchivedTaskHistory.__table__).from_select(
+                HISTORY_COLUMN_NAMES,
+                select(*TaskHistory.__table__.columns).where(TaskHistory.task_id.in_(chunk))
+            )
+        )
+        db.execute(delete(TaskHistory.__table__).where(TaskHistory.task_id.in_(chunk)))
+        db.execute(delete(Task.__table__).where(Task.id.in_(chunk)))
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Одна пачка: до batch_size заданий, завершенных до cutoff. Возвращает количество"""
+    begin_write(db)
+    rows = db.execute(
+        select(Task.id, Task.name, Task.status, Task.priority)
+        .where(Task.status == "готово", Task.completed_date < cutoff)
+        .order_by(Task.completed_date, Task.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return 0
+
+    now = datetime.now()
+    move_to_archive(db, [row.id for row in rows], now)
+
+    delta = StatsDelta()
+    for row in rows:
+        count_task(delta, row.status, row.priority, -1)
+    apply_stats_delta(db, delta)
+
+    log_task_changes(db, [
+        {
+            "task_id": row.id,
+            "action": "Архивирован",
+            "new_value": row.name,
+            "timestamp": now
+        }
+        for row in rows
+    ], model=ArchivedTaskHistory)
+    return len(rows)
+
+
+def archive_old_tasks(days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Архивирование старых заданий пачками; возвращает количество перенесенных"""
+    cutoff = datetime.now() - timedelta(days=days)
+    count = 0
+    while True:
+        db = SessionLocal()
+        try:
+            archived = archive_batch(db, cutoff, batch_size)
+            db.commit()
+        except Exception as e:
+            print(f"❌ Ошибка архивирования: {e}")
+            db.rollback()
+            return count
+        finally:
+            db.close()
+        count += archived
+        if archived < batch_size:
+            return count
+
+
+class ArchiveScheduler:
+    """Периодическое архивирование, сжатие истории и снимки заданий в фоновом потоке текущего процесса"""
+
+    def __init__(self, interval: float = ARCHIVE_INTERVAL):
+        self.interval = interval
+        self.last_run: Optional[datetime] = None
+        self.last_count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="archive", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.last_count = archive_old_tasks()
+            self.last_run = datetime.now()
+            if self.last_count:
+                print(f"🗄️ Архивировано заданий: {self.last_count}")
+            removed = compact_history()
+            if removed:
+                print(f"🗄️ Сжата история: удалено записей {removed}")
+            snapshots = snapshot_tasks()
+            if snapshots:
+                print(f"🗄️ Снимки заданий: {snapshots}")
+
+
+archive_scheduler = ArchiveScheduler()
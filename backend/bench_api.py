@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Воспроизводимый бенчмарк API на синтетических данных (см. datagen.py).
+
+Набор данных генерируется с фиксированным --seed (или берется готовый --db) и
+копируется во временный файл, поэтому пишущие сценарии не портят исходник и
+каждый прогон начинается с одинаковых данных. Сервер uvicorn запускается на
+копии отдельным процессом; его память (RSS и пик) читается из /proc.
+
+Каждый сценарий нагружается --concurrency клиентами в течение --duration
+секунд (импорт - --import-runs раз подряд). Подготовительные запросы
+сценариев (например, изменение перед откатом) в замер не входят.
+
+Результаты: запросов, ошибок, запросов в секунду, p50/p95/p99 и память.
+--save сохраняет их в JSON, --baseline сравнивает с сохраненными ранее:
+рост p95 или падение пропускной способности больше --threshold процентов
+считается регрессией (код выхода 1).
+
+Запуск:
+    python bench_api.py --tasks 100000 --history 5 --receptions 50000 --save baseline.json
+    python bench_api.py --tasks 100000 --history 5 --receptions 50000 --baseline baseline.json
+    python bench_api.py --db bench.db --scenarios tasks_list,stats,history --concurrency 8
+    python bench_api.py --url http://127.0.0.1:8000 --scenarios tasks_list,stats
+"""
+
+import argparse
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlparse
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_load import percentile
+from datagen import LIFECYCLE, PARTS, PRIORITIES, STATUSES, designation, part_name, reception_quantity
+
+BACKEND_DIR = Path(__file__).parent
+SERVER_START_TIMEOUT = 60.0
+IMPORT_POLL_INTERVAL = 0.05
+# Изменения p95 меньше этого порога (мс) - шум, не регрессия
+NOISE_MS = 1.0
+
+
+class BenchError(Exception):
+    """Ошибочный ответ сервера"""
+
+
+class Client:
+    """Клиент на keep-alive соединении; timed - время замеряемых запросов"""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.connection = http.client.HTTPConnection(host, port, timeout=300)
+        self.timed = 0.0
+
+    def request(self, method: str, path: str, body=None, headers: Optional[Dict[str, str]] = None,
+                timed: bool = True):
+        if body is not None and not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False).encode()
+            headers = {"Content-Type": "application/json", **(headers or {})}
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers or {})
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=300)
+            raise
+        finally:
+            if timed:
+                self.timed += time.perf_counter() - started
+        if response.status >= 400:
+            raise BenchError(f"{method} {path.split('?')[0]}: {response.status} {data[:200].decode(errors='replace')}")
+        return json.loads(data) if response.getheader("Content-Type", "").startswith("application/json") else data
+
+    def get(self, path: str, timed: bool = True):
+        return self.request("GET", path, timed=timed)
+
+    def close(self):
+        self.connection.close()
+
+
+class Context:
+    """Данные для сценариев, собранные перед замерами"""
+
+    def __init__(self, client: Client):
+        self.task_ids = [task["id"] for task in client.get("/api/tasks?limit=1000&fields=id", timed=False)["tasks"]]
+        self.archived_ids = [
+            task["id"] for task in client.get("/api/tasks?archived=true&limit=1000&fields=id", timed=False)["tasks"]
+        ]
+        if not self.task_ids:
+            raise BenchError("В базе нет активных заданий")
+        responsible = client.get(f"/api/tasks/{self.task_ids[0]}", timed=False)["responsible"]
+        self.responsible = responsible.split()[0] if responsible else "Иванов"
+        self.filter_id = client.request("POST", "/api/filters", {
+            "name": f"Бенчмарк {uuid.uuid4().hex[:6]}",
+            "filter_data": json.dumps({"status": "выполняется", "priority": "высокий"}, ensure_ascii=False),
+        }, timed=False)["id"]
+        # Журнал изменений - примерно по записи на активное задание
+        self.last_seq = client.get("/api/tasks-stats", timed=False)["total_tasks"]
+        self.lock = threading.Lock()
+
+    def take_task_ids(self, rnd: random.Random, count: int) -> List[int]:
+        return rnd.sample(self.task_ids, min(count, len(self.task_ids)))
+
+
+Scenario = Callable[[Client, Context, random.Random], None]
+
+
+def _search_word(rnd: random.Random) -> str:
+    return quote(rnd.choice(PARTS).lower())
+
+
+def scenario_create(client: Client, ctx: Context, rnd: random.Random):
+    task = client.request("POST", "/api/tasks", {
+        "number": f"БЕНЧ/{uuid.uuid4().hex[:12]}",
+        "name": part_name(rnd),
+        "description": "Создано бенчмарком",
+        "priority": rnd.choice(PRIORITIES),
+    })
+    with ctx.lock:
+        ctx.task_ids.append(task["id"])
+
+
+def scenario_revert(client: Client, ctx: Context, rnd: random.Random):
+    task_id = rnd.choice(ctx.task_ids)
+    # Уникальное значение: изменение всегда попадает в историю и находится среди правок других клиентов
+    value = f"{ctx.responsible} {uuid.uuid4().hex[:6]}"
+    client.request("PUT", f"/api/tasks/{task_id}", {"responsible": value}, timed=False)
+    history = client.get(f"/api/tasks/{task_id}/history?limit=20", timed=False)["history"]
+    entry = next(entry for entry in history if entry["new_value"] == value)
+    client.request("POST", f"/api/tasks/{task_id}/revert/{entry['id']}")
+
+
+def scenario_reception_batch(client: Client, ctx: Context, rnd: random.Random):
+    # Пакет из 100 сканов; десятая часть - повторы уже отправленных (ретраи сканера)
+    scanner = uuid.uuid4().hex[:8]
+    items = [
+        {
+            "order_number": f"СКАН/{scanner}", "designation": designation(rnd), "name": part_name(rnd),
+            "route_card_number": str(rnd.randint(100000, 999999)),
+            "idempotency_key": f"{scanner}-{i}", **reception_quantity(rnd),
+        }
+        for i in range(90)
+    ]
+    items += rnd.sample(items, 10)
+    result = client.request("POST", "/api/receptions/batch", {"items": items})
+    if result["created_count"] != 90:
+        raise BenchError(f"Пакет приемки: создано {result['created_count']} вместо 90")
+
+
+def scenario_bulk_restore(client: Client, ctx: Context, rnd: random.Random):
+    # Время сервера и клиента совпадает - сервер на той же машине
+    task_ids = ctx.take_task_ids(rnd, 50)
+    moment = datetime.now().isoformat()
+    time.sleep(0.002)
+    client.request("PUT", "/api/tasks/bulk-update", {"task_ids": task_ids, "status": rnd.choice(STATUSES)},
+                   timed=False)
+    client.request("POST", "/api/tasks/bulk-restore", {"task_ids": task_ids, "timestamp": moment})
+
+
+def import_workbook(rows: int, rnd: random.Random) -> bytes:
+    """Excel-файл импорта с уникальными номерами"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Номер", "Наименование", "Описание", "Статус"])
+    prefix = uuid.uuid4().hex[:8]
+    for i in range(rows):
+        sheet.append([f"ИМП/{prefix}/{i:06d}", part_name(rnd), "Импорт бенчмарка", rnd.choice(LIFECYCLE)])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def make_import_scenario(rows: int) -> Scenario:
+    def scenario_import(client: Client, ctx: Context, rnd: random.Random):
+        content = import_workbook(rows, rnd)
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"bench.xlsx\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+        job = client.request("POST", "/api/tasks/import", body,
+                             {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        # Замеряется полное время импорта, включая ожидание фоновой задачи
+        started = time.perf_counter()
+        while job["status"] in ("queued", "running"):
+            time.sleep(IMPORT_POLL_INTERVAL)
+            job = client.get(f"/api/import-jobs/{job['id']}", timed=False)
+        client.timed += time.perf_counter() - started
+        if job["status"] != "completed" or job["rows_failed"]:
+            raise BenchError(f"Импорт: {job['status']}, ошибок {job['rows_failed']} {job['error']}")
+    return scenario_import
+
+
+# Сценарии: чтение, затем запись
+SCENARIOS: Dict[str, Scenario] = {
+    "tasks_list": lambda client, ctx, rnd: client.get("/api/tasks?limit=100"),
+    "tasks_total": lambda client, ctx, rnd: client.get("/api/tasks?limit=100&with_total=true"),
+    "tasks_filter": lambda client, ctx, rnd: client.get(
+        f"/api/tasks?status={quote(rnd.choice(STATUSES))}&priority={quote(rnd.choice(PRIORITIES))}"
+        f"&sort_by=due_date&sort_order=asc&limit=100"),
+    "tasks_responsible": lambda client, ctx, rnd: client.get(
+        f"/api/tasks?responsible={quote(ctx.responsible)}&limit=100"),
+    "tasks_search": lambda client, ctx, rnd: client.get(f"/api/tasks?search={_search_word(rnd)}&limit=100"),
+    "tasks_relevance": lambda client, ctx, rnd: client.get(
+        f"/api/tasks?search={_search_word(rnd)}&sort_by=relevance&limit=100"),
+    "tasks_overdue": lambda client, ctx, rnd: client.get("/api/tasks?overdue=true&limit=100"),
+    "tasks_archive": lambda client, ctx, rnd: client.get("/api/tasks?archived=true&limit=100"),
+    "task_get": lambda client, ctx, rnd: client.get(f"/api/tasks/{rnd.choice(ctx.task_ids)}"),
+    "stats": lambda client, ctx, rnd: client.get("/api/tasks-stats"),
+    "history": lambda client, ctx, rnd: client.get(
+        f"/api/tasks/{rnd.choice(ctx.task_ids + ctx.archived_ids)}/history"),
+    "filters": lambda client, ctx, rnd: client.get("/api/filters"),
+    "filter_tasks": lambda client, ctx, rnd: client.get(f"/api/filters/{ctx.filter_id}/tasks?limit=100"),
+    "receptions": lambda client, ctx, rnd: client.get(f"/api/receptions?search={_search_word(rnd)}"),
+    "reception_totals": lambda client, ctx, rnd: client.get("/api/receptions/totals?group_by=name"),
+    "sync": lambda client, ctx, rnd: client.get(
+        f"/api/sync?since={rnd.randint(0, max(ctx.last_seq - 100, 0))}&limit=100"),
+    "export": lambda client, ctx, rnd: client.get(
+        f"/api/export/tasks?format=ndjson&status={quote(rnd.choice(STATUSES))}"),
+    "create": scenario_create,
+    "update": lambda client, ctx, rnd: client.request(
+        "PUT", f"/api/tasks/{rnd.choice(ctx.task_ids)}",
+        {"priority": rnd.choice(PRIORITIES), "responsible": ctx.responsible}),
+    "bulk_update": lambda client, ctx, rnd: client.request(
+        "PUT", "/api/tasks/bulk-update", {"task_ids": ctx.take_task_ids(rnd, 100), "status": rnd.choice(STATUSES)}),
+    "reception_batch": scenario_reception_batch,
+    "revert": scenario_revert,
+    "bulk_restore": scenario_bulk_restore,
+    "import": None,  # см. make_import_scenario
+}
+
+
+def worker(host: str, port: int, scenario: Scenario, ctx: Context, seed: int, deadline: float,
+           iterations: Optional[int], latencies: list, errors: list):
+    """Один клиент: сценарий подряд до истечения времени (или iterations раз)"""
+    client = Client(host, port)
+    rnd = random.Random(seed)
+    done = 0
+    while time.perf_counter() < deadline if iterations is None else done < iterations:
+        client.timed = 0.0
+        try:
+            scenario(client, ctx, rnd)
+        except (OSError, http.client.HTTPException, BenchError, KeyError, IndexError, StopIteration) as e:
+            errors.append(str(e))
+        else:
+            latencies.append(client.timed * 1000)
+        done += 1
+    client.close()
+
+
+def run_scenario(host: str, port: int, scenario: Scenario, ctx: Context, concurrency: int,
+                 duration: float, seed: int, iterations: Optional[int] = None) -> Tuple[list, list, float]:
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=worker, args=(host, port, scenario, ctx, seed * 1000 + i, deadline,
+                                              iterations, latencies, errors))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def process_memory(pid: Optional[int]) -> Dict[str, float]:
+    """RSS и пиковый RSS процесса (МБ) из /proc; пусто, если недоступно"""
+    if not pid:
+        return {}
+    try:
+        with open(f"/proc/{pid}/status") as status_file:
+            values = dict(line.split(":", 1) for line in status_file if ":" in line)
+    except OSError:
+        return {}
+    return {
+        "rss_mb": round(int(values["VmRSS"].split()[0]) / 1024, 1),
+        "peak_mb": round(int(values["VmHWM"].split()[0]) / 1024, 1),
+    }
+
+
+def prepare_database(args) -> str:
+    """Копия набора данных для прогона (исходник генерируется, если его нет)"""
+    source = args.db
+    if not source or not os.path.exists(source):
+        from datagen import fill_database
+        from migrations import migrate
+        from models import create_db_engine
+
+        if not source:
+            fd, source = tempfile.mkstemp(prefix="sklad-dataset-", suffix=".db")
+            os.close(fd)
+        print(f"⏳ Генерация данных: {args.tasks} заданий, ~{args.tasks * args.history} записей истории, "
+              f"{args.receptions} приемок (seed {args.seed})")
+        engine = create_db_engine(f"sqlite:///{source}")
+        migrate(engine)
+        fill_database(engine, args.tasks, args.history, args.receptions, args.seed)
+        engine.dispose()
+        if not args.db:
+            args.generated = source
+
+    fd, path = tempfile.mkstemp(prefix="sklad-bench-", suffix=".db")
+    os.close(fd)
+    with sqlite3.connect(source) as src, sqlite3.connect(path) as target:
+        src.backup(target)
+    return path
+
+
+def start_server(path: str) -> Tuple[subprocess.Popen, int]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", SKLAD_ARCHIVE_INTERVAL="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    deadline = time.perf_counter() + SERVER_START_TIMEOUT
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Сервер завершился с кодом {server.returncode}")
+        try:
+            Client("127.0.0.1", port).get("/api/tasks-stats", timed=False)
+            return server, port
+        except (OSError, http.client.HTTPException, BenchError):
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Сервер не запустился")
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Сравнение с базовой линией; возвращает список регрессий"""
+    regressions = []
+    print(f"\n📊 Сравнение с базовой линией ({baseline['meta'].get('date', '?')}), порог {threshold:.0f}%")
+    for key in ("dataset", "concurrency", "duration"):
+        if results["meta"].get(key) != baseline["meta"].get(key):
+            print(f"   ⚠️ Отличается {key}: {baseline['meta'].get(key)} → {results['meta'].get(key)}")
+    print(f"   {'сценарий':<18} {'p95 было':>9} {'стало':>9} {'Δp95':>7} {'rps было':>9} {'стало':>9} {'Δrps':>7}")
+    for name, current in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if not before:
+            continue
+        p95_change = (current["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0
+        rps_change = (current["rps"] - before["rps"]) / before["rps"] * 100 if before["rps"] else 0
+        slower = p95_change > threshold and current["p95_ms"] - before["p95_ms"] > NOISE_MS
+        fewer = rps_change < -threshold
+        mark = " ⚠️" if slower or fewer else ""
+        print(f"   {name:<18} {before['p95_ms']:>9.1f} {current['p95_ms']:>9.1f} {p95_change:>+6.0f}% "
+              f"{before['rps']:>9.1f} {current['rps']:>9.1f} {rps_change:>+6.0f}%{mark}")
+        if slower or fewer:
+            regressions.append(name)
+
+    peak, peak_before = results["memory"].get("peak_mb"), baseline.get("memory", {}).get("peak_mb")
+    if peak and peak_before:
+        change = (peak - peak_before) / peak_before * 100
+        print(f"   {'память (пик)':<18} {peak_before:>8.1f}М {peak:>8.1f}М {change:>+6.0f}%")
+        if change > threshold:
+            regressions.append("memory")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк API на синтетических данных")
+    parser.add_argument("--db", default=None, help="Набор данных SQLite (создается, если файла нет)")
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--history", type=int, default=5, help="Записей истории на задание (в среднем)")
+    parser.add_argument("--receptions", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", default=None, help="Уже запущенный сервер (без генерации и замера памяти)")
+    parser.add_argument("--pid", type=int, default=None, help="PID уже запущенного сервера для замера памяти")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Сценарии через запятую")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0, help="Секунд на сценарий")
+    parser.add_argument("--import-rows", type=int, default=1000)
+    parser.add_argument("--import-runs", type=int, default=3)
+    parser.add_argument("--save", default=None, help="Сохранить результаты в JSON")
+    parser.add_argument("--baseline", default=None, help="Сравнить с результатами из JSON")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Допустимое ухудшение, %%")
+    args = parser.parse_args()
+    args.generated = None
+
+    names = [name for name in args.scenarios.split(",") if name]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Неизвестные сценарии: {', '.join(unknown)}")
+
+    server, path, pid = None, None, args.pid
+    try:
+        if args.url:
+            url = urlparse(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            path = prepare_database(args)
+            server, port = start_server(path)
+            host, pid = "127.0.0.1", server.pid
+
+        ctx = Context(Client(host, port))
+        memory_start = process_memory(pid)
+        results = {
+            "meta": {
+                "date": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "dataset": None if args.url else {
+                    "db": args.db, "tasks": args.tasks, "history": args.history,
+                    "receptions": args.receptions, "seed": args.seed,
+                },
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+            },
+            "scenarios": {},
+            "memory": {},
+        }
+
+        print(f"\n📊 {'сценарий':<18} {'запросов':>8} {'ошибок':>7} {'запр/с':>8} "
+              f"{'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8} {'RSS МБ':>7}")
+        for name in names:
+            if name == "import":
+                scenario, concurrency, iterations = make_import_scenario(args.import_rows), 1, args.import_runs
+            else:
+                scenario, concurrency, iterations = SCENARIOS[name], args.concurrency, None
+            latencies, errors, elapsed = run_scenario(
+                host, port, scenario, ctx, concurrency, args.duration, args.seed, iterations
+            )
+            memory = process_memory(pid)
+            result = {
+                "requests": len(latencies),
+                "errors": len(errors),
+                "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+                "p50_ms": round(percentile(latencies, 0.50), 2),
+                "p95_ms": round(percentile(latencies, 0.95), 2),
+                "p99_ms": round(percentile(latencies, 0.99), 2),
+                "rss_mb": memory.get("rss_mb"),
+            }
+            results["scenarios"][name] = result
+            print(f"   {name:<18} {result['requests']:>8} {result['errors']:>7} {result['rps']:>8.1f} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                  f"{memory.get('rss_mb', 0):>7.1f}")
+            if errors:
+                print(f"      ❌ {errors[0]}")
+
+        memory_end = process_memory(pid)
+        if memory_end:
+            results["memory"] = {"rss_start_mb": memory_start.get("rss_mb"), **memory_end}
+            print(f"\n💾 Память сервера: {memory_start['rss_mb']} → {memory_end['rss_mb']} МБ, "
+                  f"пик {memory_end['peak_mb']} МБ")
+
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as target:
+                json.dump(results, target, ensure_ascii=False, indent=2)
+            print(f"💾 Результаты сохранены: {args.save}")
+
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as source:
+                regressions = compare(results, json.load(source), args.threshold)
+            if regressions:
+                print(f"\n❌ Регрессии: {', '.join(regressions)}")
+                sys.exit(1)
+            print("\n✅ Регрессий нет")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        for file in (path, args.generated):
+            if file:
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(file + suffix):
+                        os.remove(file + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк индексов: планы запросов и время выполнения до и после миграции 2.
+
+Запуск:
+    python bench_indexes.py --tasks 200000 --history 5 --receptions 100000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine, func, select
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from datagen import fill_database
+from models import Base, Task, TaskHistory, Reception
+from migrations import COMPOSITE_INDEXES, create_indexes, drop_indexes
+
+
+def benchmark_queries(engine, tasks: int):
+    """Запросы в том виде, в котором их строит main.py"""
+    now = datetime.now()
+    task_id = max(tasks // 2, 1)
+    with engine.connect() as conn:
+        number = conn.execute(select(Task.number).where(Task.id == task_id)).scalar()
+    return {
+        "Список активных заданий": select(Task).where(Task.archived == False)
+            .order_by(Task.created_date.desc(), Task.id.desc()).limit(100),
+        "Фильтр по статусу": select(Task).where(Task.archived == False, Task.status == "выполняется")
+            .order_by(Task.created_date.desc(), Task.id.desc()).limit(100),
+        "Фильтр по приоритету": select(Task).where(Task.archived == False, Task.priority == "срочный")
+            .order_by(Task.created_date.desc(), Task.id.desc()).limit(100),
+        "Количество просроченных": select(func.count(Task.id)).where(
+            Task.archived == False, Task.due_date < now, Task.status != "готово"),
+        "Статистика по статусам": select(Task.status, func.count(Task.id))
+            .where(Task.archived == False).group_by(Task.status),
+        "История задания": select(TaskHistory).where(TaskHistory.task_id == task_id)
+            .order_by(TaskHistory.timestamp.desc()),
+        "Проверка номера": select(Task.id).where(Task.number == number),
+        "Список приемки": select(Reception).order_by(Reception.date.desc()).limit(100),
+        "Приемка по статусу": select(Reception).where(Reception.status == "есть замечания")
+            .order_by(Reception.date.desc()).limit(100),
+    }
+
+
+def measure(engine, queries, repeats: int):
+    """План и медианное время выполнения каждого запроса"""
+    results = {}
+    with engine.connect() as conn:
+        for title, query in queries.items():
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql)]
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                conn.exec_driver_sql(sql).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[title] = (plan, statistics.median(timings))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк индексов базы данных")
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--history", type=int, default=3, help="Записей истории на задание")
+    parser.add_argument("--receptions", type=int, default=50000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+
+    try:
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            for indexes in COMPOSITE_INDEXES.values():
+                drop_indexes(conn, list(indexes))
+
+        print(f"⏳ Генерация данных: {args.tasks} заданий, {args.tasks * args.history} записей истории, "
+              f"{args.receptions} приемок")
+        # Все задания в одной таблице - как до выделения архива
+        fill_database(engine, args.tasks, args.history, args.receptions, archive=False)
+
+        queries = benchmark_queries(engine, args.tasks)
+        before = measure(engine, queries, args.repeats)
+
+        with engine.begin() as conn:
+            for table_name, indexes in COMPOSITE_INDEXES.items():
+                create_indexes(conn, table_name, indexes)
+            conn.exec_driver_sql("ANALYZE")
+        after = measure(engine, queries, args.repeats)
+
+        for title in queries:
+            plan_before, ms_before = before[title]
+            plan_after, ms_after = after[title]
+            print(f"\n📊 {title}: {ms_before:.2f} мс → {ms_after:.2f} мс")
+            print(f"   до:    {' | '.join(plan_before)}")
+            print(f"   после: {' | '.join(plan_after)}")
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест чтения: пропускная способность при разном числе клиентов.
+
+Сервер запускается отдельно, например:
+    uvicorn main:app --port 8000
+    python bench_load.py --url http://127.0.0.1:8000 --concurrency 1,4,16,64 --duration 5
+"""
+
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlparse
+
+ENDPOINTS = {
+    "tasks": "/api/tasks?limit=100",
+    "receptions": "/api/receptions",
+    "stats": "/api/tasks-stats",
+}
+
+
+def worker(host: str, port: int, path: str, deadline: float, latencies: list, errors: list):
+    """Один клиент: последовательные запросы по keep-alive соединению"""
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+    connection.close()
+
+
+def run(host: str, port: int, path: str, concurrency: int, duration: float):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=worker, args=(host, port, path, deadline, latencies, errors))
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="Список уровней конкурентности")
+    parser.add_argument("--duration", type=float, default=5.0, help="Секунд на каждый замер")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Какие эндпоинты нагружать")
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    for name in args.endpoints.split(","):
+        path = ENDPOINTS[name]
+        print(f"\n📊 {name}: GET {path}")
+        print(f"   {'клиентов':>8} {'запр/с':>9} {'p50 мс':>8} {'p95 мс':>8} {'ошибок':>7}")
+        for concurrency in levels:
+            latencies, errors, elapsed = run(url.hostname, url.port or 80, path, concurrency, args.duration)
+            throughput = len(latencies) / elapsed if elapsed else 0
+            print(f"   {concurrency:>8} {throughput:>9.1f} "
+                  f"{statistics.median(latencies) if latencies else 0:>8.1f} "
+                  f"{percentile(latencies, 0.95):>8.1f} {len(errors):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк сериализации списка заданий.
+
+Сравниваются:
+  - ORM + Pydantic: загрузка объектов Task, TasksResponse (from_attributes),
+    jsonable_encoder и json.dumps - прежний путь ответа get_tasks;
+  - ORM + model_dump_json: те же объекты, сериализация ядром Pydantic;
+  - кортежи + orjson: выборка колонок схемы и serialization.dumps - текущий путь.
+
+Запуск:
+    python bench_serialization.py --rows 10000,100000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from datagen import fill_database
+from models import Base, Task
+from schemas import TasksResponse
+from serialization import TASK_FIELDS, columns_for, dumps, rows_to_dicts
+
+# Колонки модели в порядке полей схемы
+TASK_COLUMNS = tuple(columns_for(Task, TASK_FIELDS))
+
+
+def orm_jsonable(session: Session, limit: int) -> bytes:
+    tasks = session.execute(select(Task).order_by(Task.id).limit(limit)).scalars().all()
+    response = TasksResponse(tasks=tasks, total=None, next_cursor=None)
+    return json.dumps(
+        jsonable_encoder(response), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def orm_pydantic(session: Session, limit: int) -> bytes:
+    tasks = session.execute(select(Task).order_by(Task.id).limit(limit)).scalars().all()
+    return TasksResponse(tasks=tasks, total=None, next_cursor=None).model_dump_json().encode("utf-8")
+
+
+def tuples_orjson(session: Session, limit: int) -> bytes:
+    rows = session.execute(select(*TASK_COLUMNS).order_by(Task.id).limit(limit)).all()
+    return dumps({"tasks": rows_to_dicts(rows), "total": None, "next_cursor": None})
+
+
+VARIANTS = {
+    "ORM + Pydantic + jsonable_encoder": orm_jsonable,
+    "ORM + model_dump_json": orm_pydantic,
+    "кортежи + orjson": tuples_orjson,
+}
+
+
+def measure(engine, variant, limit: int, repeats: int):
+    """Медианное время (мс) и результат последнего запуска"""
+    timings = []
+    body = b""
+    for _ in range(repeats):
+        with Session(engine) as session:
+            started = time.perf_counter()
+            body = variant(session, limit)
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализации списка заданий")
+    parser.add_argument("--rows", default="10000,100000", help="Размеры списка через запятую")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.rows.split(",")]
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+
+    try:
+        Base.metadata.create_all(bind=engine)
+        print(f"⏳ Генерация данных: {max(sizes)} заданий")
+        # Все задания в рабочей таблице - список читается из нее
+        fill_database(engine, max(sizes), 0, 0, archive=False)
+
+        for size in sizes:
+            print(f"\n📊 {size} строк")
+            reference = None
+            baseline = None
+            for title, variant in VARIANTS.items():
+                ms, body = measure(engine, variant, size, args.repeats)
+                baseline = baseline or ms
+                same = "✅" if reference is None or body == reference else "❌ вывод отличается"
+                reference = reference or body
+                print(f"   {title:<36} {ms:>9.1f} мс  x{baseline / ms:>5.1f}  {len(body) / 1024 / 1024:>6.1f} МБ  {same}")
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
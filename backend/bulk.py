@@ -0,0 +1,128 @@
+"""
+Массовые операции над заданиями на уровне множеств.
+
+Вместо загрузки ORM-объектов по одному изменения выполняются запросами
+UPDATE/DELETE ... WHERE id IN (...) RETURNING, а старые значения для истории
+читаются одним SELECT на пачку. Списки id делятся на пачки, чтобы не
+превысить ограничение SQLite на число параметров запроса.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from sqlalchemy import case, delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from models import ArchivedTask, Task, begin_write, log_task_changes
+from stats import StatsDelta, apply_stats_delta, count_change, count_task
+
+# Размер пачки id (лимит параметров SQLite - 999 в старых версиях)
+ID_CHUNK_SIZE = 500
+
+# Поля, которые можно менять массово
+BULK_FIELDS = ("status", "priority", "responsible")
+
+
+def chunked(ids: Sequence[int], size: int = ID_CHUNK_SIZE) -> Iterator[List[int]]:
+    unique_ids = list(dict.fromkeys(ids))
+    for start in range(0, len(unique_ids), size):
+        yield unique_ids[start:start + size]
+
+
+def update_tasks(db: Session, task_ids: Sequence[int], values: Dict[str, Any],
+                user: str = "Пользователь") -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Массовое изменение полей заданий в одной транзакции.
+    Возвращает (количество найденных заданий, список изменений), где изменение -
+    {"id": ..., "old": {поле: значение}, "new": {поле: значение}}
+    только по реально изменившимся полям. Счетчики статистики обновляются.
+    """
+    values = {field: value for field, value in values.items() if field in BULK_FIELDS}
+    columns = [getattr(Task, field) for field in values]
+    now = datetime.now()
+
+    begin_write(db)
+    found = 0
+    changes = []
+
+    for chunk in chunked(task_ids):
+        # Старые значения одним запросом на пачку
+        old_rows = db.execute(
+            select(Task.id, *columns).where(Task.id.in_(chunk)).with_for_update()
+        ).all()
+        found += len(old_rows)
+        if not values:
+            continue
+
+        differs = or_(*[column.is_distinct_from(values[field]) for field, column in zip(values, columns)])
+        assignments = dict(values, updated_date=now)
+        if values.get("status") == "готово":
+            assignments["completed_date"] = case(
+                (Task.status.is_distinct_from("готово"), now),
+                else_=Task.completed_date
+            )
+
+        updated_ids = set(db.execute(
+            update(Task)
+            .where(Task.id.in_(chunk), differs)
+            .values(**assignments)
+            .returning(Task.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+
+        for row in old_rows:
+            if row.id not in updated_ids:
+                continue
+            old = {field: getattr(row, field) for field in values if getattr(row, field) != values[field]}
+            changes.append({
+                "id": row.id,
+                "old": old,
+                "new": {field: values[field] for field in old}
+            })
+
+    delta = StatsDelta()
+    for change in changes:
+        for field, old_value in change["old"].items():
+            count_change(delta, field, old_value, change["new"][field])
+    apply_stats_delta(db, delta)
+
+    # Одна запись истории на измененное поле
+    log_task_changes(db, [
+        {
+            "task_id": change["id"],
+            "action": "Массовое обновление",
+            "field_name": field,
+            "old_value": old_value,
+            "new_value": change["new"][field],
+            "user": user,
+            "timestamp": now,
+        }
+        for change in changes
+        for field, old_value in change["old"].items()
+    ])
+    return found, changes
+
+
+def delete_tasks(db: Session, task_ids: Sequence[int]) -> List[Dict[str, Any]]:
+    """
+    Массовое удаление заданий из рабочей таблицы и архива; возвращает удаленные
+    строки (id, name, status, priority, archived - задание было в архиве)
+    """
+    begin_write(db)
+    deleted = []
+    delta = StatsDelta()
+    for chunk in chunked(task_ids):
+        for model in (Task, ArchivedTask):
+            rows = db.execute(
+                delete(model)
+                .where(model.id.in_(chunk))
+                .returning(model.id, model.name, model.status, model.priority)
+                .execution_options(synchronize_session=False)
+            ).all()
+            for row in rows:
+                # Счетчики ведутся только по рабочей таблице
+                if model is Task:
+                    count_task(delta, row.status, row.priority, -1)
+                deleted.append(dict(row._asdict(), archived=model is ArchivedTask))
+    apply_stats_delta(db, delta)
+    return deleted
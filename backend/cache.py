@@ -0,0 +1,331 @@
+"""
+Кэш ответов списков и статистики с инвалидацией по версиям таблиц.
+
+Ключ записи содержит нормализованные параметры запроса и текущие версии
+таблиц, от которых зависит ответ. Версия таблицы увеличивается после каждого
+коммита, изменившего таблицу (изменения отслеживаются событиями движка),
+поэтому устаревшие записи просто перестают находиться и вытесняются по LRU/TTL.
+В кэше хранится готовое JSON-тело, и при попадании сериализация не выполняется.
+Из того же ключа строится ETag для условных GET-запросов (If-None-Match -> 304).
+
+По умолчанию кэш живет в памяти процесса. Если задан SKLAD_CACHE_REDIS_URL,
+версии и записи хранятся в Redis и общие для всех рабочих процессов uvicorn.
+В production-режиме (server.py) без Redis записи у каждого процесса свои, а
+версии таблиц - в разделяемой памяти, общей для процессов после fork.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from fastapi.responses import Response
+from sqlalchemy import event
+
+CACHE_MAX_ENTRIES = int(os.getenv("SKLAD_CACHE_MAX_ENTRIES", "512"))
+CACHE_MAX_BYTES = int(os.getenv("SKLAD_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL = float(os.getenv("SKLAD_CACHE_TTL", "60"))
+CACHE_REDIS_URL = os.getenv("SKLAD_CACHE_REDIS_URL", "")
+
+
+# Ячеек версий в разделяемой памяти; совпадение ячеек у двух таблиц
+# только сбрасывает кэш чаще, но не приводит к устаревшим ответам
+SHARED_VERSION_SLOTS = 1024
+
+# Таблица текстового запроса записи (text(), exec_driver_sql), у которого нет объекта таблицы
+WRITE_TABLE_RE = re.compile(
+    r'^\s*(?:insert\s+(?:or\s+\w+\s+)?into|update(?:\s+or\s+\w+)?|delete\s+from)\s+["`\[]?(\w+)',
+    re.IGNORECASE
+)
+
+
+class SharedTableVersions:
+    """
+    Версии таблиц в разделяемой памяти. Создаются до fork рабочих процессов,
+    поэтому увеличение версии в одном процессе видно во всех.
+    """
+
+    def __init__(self, slots: int = SHARED_VERSION_SLOTS):
+        import multiprocessing
+
+        self.slots = slots
+        self._values = multiprocessing.RawArray("q", slots)
+        self._lock = multiprocessing.Lock()
+
+    def _slot(self, table: str) -> int:
+        return zlib.crc32(table.encode("utf-8")) % self.slots
+
+    def get(self, table: str, default: int = 0) -> int:
+        return self._values[self._slot(table)] or default
+
+    def increment(self, table: str):
+        slot = self._slot(table)
+        with self._lock:
+            self._values[slot] += 1
+
+
+class LocalCacheBackend:
+    """Версии таблиц и LRU-кэш с TTL и ограничением по памяти в пределах процесса"""
+
+    name = "local"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Эпоха отличает версии этого процесса от версий до перезапуска
+        self.epoch = uuid.uuid4().hex[:8]
+        self.evictions = 0
+        self._versions: "Dict[str, int] | SharedTableVersions" = {}
+        self._entries: "OrderedDict[Hashable, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def versions(self, tables: Iterable[str]) -> Tuple[str, ...]:
+        with self._lock:
+            return tuple(f"{self.epoch}.{self._versions.get(table, 0)}" for table in tables)
+
+    def bump(self, tables: Iterable[str]):
+        with self._lock:
+            for table in tables:
+                if isinstance(self._versions, SharedTableVersions):
+                    self._versions.increment(table)
+                else:
+                    self._versions[table] = self._versions.get(table, 0) + 1
+
+    def share_versions(self):
+        """Перенести версии в разделяемую память (до fork рабочих процессов)"""
+        with self._lock:
+            self._versions = SharedTableVersions()
+            self._entries.clear()
+            self._bytes = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, body = item
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: Hashable, body: bytes, ttl: float):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, body)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def size(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes}
+
+    def _remove(self, key: Hashable):
+        _, body = self._entries.pop(key)
+        self._bytes -= len(body)
+
+
+class RedisCacheBackend:
+    """Общий для рабочих процессов кэш в Redis (вытеснение - политикой maxmemory Redis)"""
+
+    name = "redis"
+    prefix = "sklad:cache:"
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.evictions = 0
+
+    def versions(self, tables: Iterable[str]) -> Tuple[str, ...]:
+        tables = list(tables)
+        values = self.client.mget([f"{self.prefix}version:{table}" for table in tables])
+        return tuple((value or b"0").decode() for value in values)
+
+    def bump(self, tables: Iterable[str]):
+        pipeline = self.client.pipeline()
+        for table in tables:
+            pipeline.incr(f"{self.prefix}version:{table}")
+        pipeline.execute()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        return self.client.get(self._key(key))
+
+    def set(self, key: Hashable, body: bytes, ttl: float):
+        self.client.set(self._key(key), body, px=int(ttl * 1000))
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}entry:*"):
+            self.client.delete(key)
+
+    def size(self) -> Dict[str, int]:
+        return {"entries": sum(1 for _ in self.client.scan_iter(f"{self.prefix}entry:*")), "bytes": 0}
+
+    def _key(self, key: Hashable) -> str:
+        return f"{self.prefix}entry:{key!r}"
+
+
+class ResponseCache:
+    """Кэш JSON-ответов: ключ = (пространство, параметры, версии таблиц)"""
+
+    def __init__(self, backend, ttl: float = CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def versions(self, tables: Iterable[str]) -> Tuple[str, ...]:
+        return self.backend.versions(tables)
+
+    def bump(self, tables: Iterable[str]):
+        self.backend.bump(tables)
+
+    def respond(self, namespace: str, tables: Tuple[str, ...], params: Dict,
+                compute: Callable[[], bytes], ttl: Optional[float] = None,
+                if_none_match: Optional[str] = None) -> Response:
+        """
+        Вернуть закэшированное тело ответа или вычислить и сохранить его.
+        Версии читаются до вычисления: если данные изменятся во время запроса,
+        запись сразу окажется устаревшей.
+
+        ETag строится из того же ключа, поэтому при совпадении If-None-Match
+        ответ 304 отдается без запроса к базе и сериализации. Ответы, зависящие
+        от текущего времени, передают ttl - он же задает интервал смены ETag.
+        """
+        versions = self.versions(tables)
+        if ttl is not None:
+            versions += (f"t{int(time.time() // ttl)}",)
+        key = (namespace, normalize_params(params), versions)
+        etag = make_etag(key)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if if_none_match and etag_matches(if_none_match, etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        body = self.backend.get(key)
+        if body is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            body = compute()
+            self.backend.set(key, body, self.ttl if ttl is None else ttl)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def clear(self):
+        self.backend.clear()
+
+    def metrics(self) -> Dict:
+        requests = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / requests, 4) if requests else 0.0,
+            "not_modified": self.not_modified,
+            "evictions": self.backend.evictions,
+            **self.backend.size()
+        }
+
+
+def normalize_params(params: Dict) -> Tuple:
+    """Параметры запроса в виде, не зависящем от порядка и регистра"""
+    normalized = []
+    for name, value in sorted(params.items()):
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip().lower() if name in ("sort_order",) else value.strip()
+        normalized.append((name, value))
+    return tuple(normalized)
+
+
+def make_etag(key: Hashable) -> str:
+    """Сильный ETag по ключу ответа (пространство, параметры, версии)"""
+    return '"' + hashlib.blake2b(repr(key).encode("utf-8"), digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Проверка заголовка If-None-Match (список тегов или *)"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+def _create_backend():
+    if CACHE_REDIS_URL:
+        return RedisCacheBackend(CACHE_REDIS_URL)
+    return LocalCacheBackend()
+
+
+response_cache = ResponseCache(_create_backend())
+
+_pending = threading.local()
+
+
+def track_table_changes(engine, session_factory, cache: ResponseCache = response_cache):
+    """
+    Увеличение версий таблиц после коммита.
+    Таблицы, в которые писали INSERT/UPDATE/DELETE, запоминаются на соединении,
+    при коммите соединения переносятся в список потока, а версии увеличиваются
+    уже после фиксации транзакции: в событии after_commit сессии или, для
+    записи через engine.begin()/Connection (миграции, генератор данных),
+    при возврате соединения в пул. Для текстовых запросов таблица берется из
+    текста INSERT/UPDATE/DELETE.
+    """
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _remember_table(conn, cursor, statement, parameters, context, executemany):
+        table = None
+        if context is not None and context.compiled is not None and (
+            context.isinsert or context.isupdate or context.isdelete
+        ):
+            table = getattr(context.compiled.statement, "table", None)
+        if table is not None:
+            name = table.name
+        else:
+            match = WRITE_TABLE_RE.match(statement)
+            if match is None:
+                return
+            name = match.group(1)
+        conn.info.setdefault("changed_tables", set()).add(name)
+
+    @event.listens_for(engine, "commit")
+    def _committing(conn):
+        tables = conn.info.pop("changed_tables", None)
+        if tables:
+            if not hasattr(_pending, "tables"):
+                _pending.tables = set()
+            _pending.tables.update(tables)
+
+    @event.listens_for(engine, "rollback")
+    def _rolled_back(conn):
+        conn.info.pop("changed_tables", None)
+
+    def _bump_pending(*args):
+        tables = getattr(_pending, "tables", None)
+        if tables:
+            _pending.tables = set()
+            cache.bump(sorted(tables))
+
+    event.listen(session_factory, "after_commit", _bump_pending)
+    event.listen(engine, "checkin", _bump_pending)
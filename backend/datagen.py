@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Генератор синтетических данных склада для бенчмарков и нагрузочных тестов.
+
+Задания, их история и приемка с реалистичными русскими наименованиями,
+фамилиями ответственных, обозначениями по чертежам и жизненным циклом
+статусов. Задания, завершенные раньше ARCHIVE_AFTER_DAYS дней, сразу
+попадают в архивные таблицы вместе с историей - как после работы
+планировщика. При одном и том же --seed данные совпадают.
+
+Строки пишутся пачками по BATCH_SIZE через executemany, каждая пачка - своя
+транзакция, поэтому объем до 10M заданий ограничен только диском и временем.
+Триггеры поиска и журнала изменений срабатывают как при обычной работе.
+
+Запуск:
+    python datagen.py --db bench.db --tasks 100000 --history 5 --receptions 50000
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from archive import ARCHIVE_AFTER_DAYS
+from history import history_rows
+from models import ArchivedTask, ArchivedTaskHistory, Reception, Task, TaskHistory, create_db_engine
+
+BATCH_SIZE = 10000
+
+# Жизненный цикл задания; "остановлено" - отклонение с любого шага
+LIFECYCLE = ["в разработке", "подготовлено", "отправлено", "выполняется", "готово"]
+STOPPED = "остановлено"
+STATUSES = LIFECYCLE + [STOPPED]
+PRIORITIES = ["низкий", "средний", "высокий", "срочный"]
+PRIORITY_WEIGHTS = [20, 50, 20, 10]
+RECEPTION_STATUSES = ["принят", "есть замечания", "проведен в НП"]
+RECEPTION_WEIGHTS = [70, 10, 20]
+
+PARTS = [
+    "Корпус", "Крышка", "Вал", "Шестерня", "Втулка", "Фланец", "Кронштейн", "Плита",
+    "Ось", "Муфта", "Штуцер", "Рычаг", "Пружина", "Стойка", "Ролик", "Диск",
+    "Планка", "Кольцо", "Основание", "Подшипник", "Шкив", "Звездочка", "Палец", "Гайка",
+]
+QUALIFIERS = [
+    "редуктора", "ведущий", "ведомый", "опорная", "распорная", "крепления", "подшипника",
+    "тормозной", "уплотнительное", "натяжной", "промежуточный", "станины", "привода",
+    "насоса", "конвейера", "шпинделя",
+]
+MATERIALS = ["сталь 45", "сталь 40Х", "12Х18Н10Т", "СЧ20", "Д16Т", "БрАЖ9-4", "капролон"]
+TREATMENTS = [
+    "Термообработка HRC 40-45", "Покрытие: цинкование", "Покрытие: оксидирование",
+    "Шлифовка посадочных мест", "Контроль ОТК обязателен", "Допуск по чертежу",
+]
+SURNAMES = [
+    "Иванов", "Петров", "Сидоров", "Кузнецов", "Смирнов", "Попов", "Васильев", "Соколов",
+    "Михайлов", "Новиков", "Федоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семенов",
+    "Егоров", "Павлов", "Козлов", "Степанов", "Николаев", "Орлов", "Андреев", "Макаров",
+]
+INITIALS = "АБВГДЕИКЛМНОПРСТ"
+DESIGNATION_PREFIXES = ["НЗ.КШ", "НЗ.РД", "ТМ.СТ", "КР.ПР", "ЛМ.КН"]
+
+CREATE, UPDATE, ARCHIVE = "Создано", "Обновлено", "Архивирован"
+USER = "Пользователь"
+
+
+def person(rnd: random.Random) -> str:
+    surname = rnd.choice(SURNAMES)
+    if rnd.random() < 0.3:
+        surname = surname + "а"
+    return f"{surname} {rnd.choice(INITIALS)}.{rnd.choice(INITIALS)}."
+
+
+def part_name(rnd: random.Random) -> str:
+    name = rnd.choice(PARTS)
+    if rnd.random() < 0.7:
+        name = f"{name} {rnd.choice(QUALIFIERS)}"
+    return name
+
+
+def designation(rnd: random.Random) -> str:
+    return (f"{rnd.choice(DESIGNATION_PREFIXES)}.{rnd.randint(1, 999):03d}."
+            f"{rnd.randint(10, 99)}.{rnd.randint(1, 999):03d}")
+
+
+def description(rnd: random.Random, name: str, drawing: str) -> str:
+    lines = [f"Изготовление: {name.lower()} по чертежу {drawing}", f"Материал: {rnd.choice(MATERIALS)}"]
+    lines.extend(rnd.sample(TREATMENTS, rnd.randint(0, 2)))
+    lines.append(f"Партия {rnd.choice([1, 2, 5, 10, 20, 50, 100])} шт.")
+    return "\n".join(lines)
+
+
+def reception_quantity(rnd: random.Random) -> Dict:
+    if rnd.random() < 0.9:
+        return {"quantity": rnd.choice([1, 2, 5, 10, 12, 20, 25, 50, 100, 250]), "unit": "шт."}
+    unit = rnd.choice(["кг", "м", "компл."])
+    return {"quantity": round(rnd.uniform(0.5, 500), 1) if unit != "компл." else rnd.randint(1, 10), "unit": unit}
+
+
+def task_rows(rnd: random.Random, task_id: int, now: datetime, days: int,
+              history_per_task: int) -> Tuple[Dict, List[Dict]]:
+    """Задание и его история (записи в формате log_task_changes, как пишет main.py)"""
+    created = now - timedelta(minutes=rnd.randint(0, days * 1440))
+    name = part_name(rnd)
+    responsible = person(rnd)
+    task = {
+        "id": task_id,
+        "number": f"{created.year}/{task_id:07d}",
+        "name": name,
+        "description": description(rnd, name, designation(rnd)),
+        "status": LIFECYCLE[0],
+        "priority": rnd.choices(PRIORITIES, PRIORITY_WEIGHTS)[0],
+        "responsible": responsible,
+        "due_date": created + timedelta(days=rnd.randint(3, 60)),
+        "attachments": "",
+        "created_date": created,
+        "updated_date": created,
+        "completed_date": None,
+        "archived": False,
+    }
+    history = [{"action": CREATE, "new_value": name, "timestamp": created}]
+
+    # Шаги статуса по жизненному циклу, затем правки других полей
+    steps = rnd.randint(0, len(LIFECYCLE) - 1)
+    stop = steps < len(LIFECYCLE) - 1 and rnd.random() < 0.05
+    edits = max(history_per_task - 1 - steps, 0)
+    moment = created
+    span = max((now - created).total_seconds(), 60)
+    changes = [("status", value) for value in LIFECYCLE[1:steps + 1]] + ([("status", STOPPED)] if stop else [])
+    for _ in range(edits):
+        field = rnd.choice(["responsible", "priority", "due_date"])
+        if field == "responsible":
+            changes.insert(rnd.randint(0, len(changes)), (field, person(rnd)))
+        elif field == "priority":
+            changes.insert(rnd.randint(0, len(changes)), (field, rnd.choices(PRIORITIES, PRIORITY_WEIGHTS)[0]))
+        else:
+            changes.insert(rnd.randint(0, len(changes)), (field, task["due_date"] + timedelta(days=rnd.randint(1, 14))))
+
+    for field, value in changes:
+        moment = moment + timedelta(seconds=rnd.uniform(0, span / (len(changes) + 1)))
+        old_value = task[field]
+        if old_value == value:
+            continue
+        task[field] = value
+        history.append({
+            "action": UPDATE,
+            "field_name": field,
+            "old_value": str(old_value) if old_value is not None else "",
+            "new_value": str(value),
+            "user": USER,
+            "timestamp": moment,
+            "can_revert": True,
+        })
+        if field == "status" and value == "готово":
+            task["completed_date"] = moment
+    task["updated_date"] = moment
+    return task, history
+
+
+def generate_tasks(rnd: random.Random, count: int, now: datetime, days: int,
+                   history_per_task: int) -> Iterator[Tuple[Dict, List[Dict]]]:
+    for task_id in range(1, count + 1):
+        yield task_rows(rnd, task_id, now, days, history_per_task)
+
+
+def _sync_task_sequence(conn, max_id: int):
+    """Следующий id рабочей таблицы - после всех заданий, включая архивные"""
+    if conn.dialect.name == "sqlite":
+        updated = conn.exec_driver_sql(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'tasks'", (max_id,)
+        ).rowcount
+        if not updated:
+            conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('tasks', ?)", (max_id,))
+    elif conn.dialect.name == "postgresql":
+        conn.exec_driver_sql(f"SELECT setval(pg_get_serial_sequence('tasks', 'id'), {max(max_id, 1)})")
+
+
+def fill_database(engine, tasks: int, history_per_task: int, receptions: int,
+                  seed: int = 42, days: int = 730, archive: bool = True, progress: bool = False):
+    """
+    Заполнение базы (схема уже создана) синтетическими данными.
+    archive=False - все задания в рабочей таблице (для схем без архива).
+    """
+    rnd = random.Random(seed)
+    now = datetime.now()
+    cutoff = now - timedelta(days=ARCHIVE_AFTER_DAYS)
+    started = time.perf_counter()
+
+    with engine.connect() as conn:
+        first_id = (conn.execute(select(func.max(Task.id))).scalar() or 0) + 1
+        if archive:
+            first_id = max(first_id, (conn.execute(select(func.max(ArchivedTask.id))).scalar() or 0) + 1)
+
+    generated = generate_tasks(rnd, tasks, now, days, history_per_task)
+    done = 0
+    while done < tasks:
+        hot, cold, hot_history, cold_history = [], [], [], []
+        for task, history in (next(generated) for _ in range(min(BATCH_SIZE, tasks - done))):
+            task["id"] += first_id - 1
+            archived = archive and task["completed_date"] is not None and task["completed_date"] < cutoff
+            for entry in history:
+                entry["task_id"] = task["id"]
+            if archived:
+                task["archived"] = True
+                task["archived_date"] = task["completed_date"] + timedelta(days=ARCHIVE_AFTER_DAYS)
+                history.append({"task_id": task["id"], "action": ARCHIVE, "new_value": task["name"],
+                                "timestamp": task["archived_date"]})
+                cold.append(task)
+                cold_history.extend(history)
+            else:
+                hot.append(task)
+                hot_history.extend(history)
+        done += len(hot) + len(cold)
+
+        with engine.begin() as conn:
+            for model, rows in ((Task, hot), (ArchivedTask, cold)):
+                if rows:
+                    conn.execute(insert(model.__table__), rows)
+            for model, entries in ((TaskHistory, hot_history), (ArchivedTaskHistory, cold_history)):
+                if entries:
+                    conn.execute(insert(model.__table__), history_rows(conn, entries, now))
+        if progress:
+            print(f"   задания: {done}/{tasks} ({time.perf_counter() - started:.0f} с)")
+
+    done = 0
+    while done < receptions:
+        rows = []
+        for i in range(done, min(done + BATCH_SIZE, receptions)):
+            date = now - timedelta(minutes=rnd.randint(0, days * 1440))
+            rows.append({
+                "date": date,
+                "order_number": f"{date.year}/{i + 1:06d}",
+                "designation": designation(rnd),
+                "name": part_name(rnd),
+                **reception_quantity(rnd),
+                "route_card_number": str(100000 + i),
+                "status": rnd.choices(RECEPTION_STATUSES, RECEPTION_WEIGHTS)[0],
+                "created_date": date,
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(Reception.__table__), rows)
+        done += len(rows)
+        if progress:
+            print(f"   приемка: {done}/{receptions} ({time.perf_counter() - started:.0f} с)")
+
+    with engine.begin() as conn:
+        if archive:
+            _sync_task_sequence(conn, first_id + tasks - 1)
+        if conn.dialect.has_table(conn, "task_counters"):
+            from stats import rebuild_task_stats
+            rebuild_task_stats(Session(bind=conn))
+        if conn.dialect.name == "sqlite":
+            conn.exec_driver_sql("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных склада")
+    parser.add_argument("--db", default="bench.db", help="Файл SQLite (или --url)")
+    parser.add_argument("--url", default=None, help="URL базы SQLAlchemy вместо --db")
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--history", type=int, default=5, help="Записей истории на задание (в среднем)")
+    parser.add_argument("--receptions", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=730, help="Глубина данных в днях")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from migrations import migrate
+    engine = create_db_engine(args.url or f"sqlite:///{args.db}")
+    migrate(engine)
+    print(f"⏳ Генерация: {args.tasks} заданий (~{args.tasks * args.history} записей истории), "
+          f"{args.receptions} приемок")
+    started = time.perf_counter()
+    fill_database(engine, args.tasks, args.history, args.receptions, args.seed, args.days, progress=True)
+    engine.dispose()
+    print(f"✅ Готово за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
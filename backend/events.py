@@ -0,0 +1,226 @@
+"""
+Push-уведомления об изменениях заданий и приемки (Server-Sent Events).
+
+Источник событий - журнал change_log (см. sync.py), который пишется триггерами
+на всех путях записи. Фоновый поток хаба читает новые записи журнала и рассылает
+компактные события подписчикам. После коммита сессии поток будится сразу, а
+изменения других процессов подхватываются периодическим опросом.
+
+У каждого подписчика своя ограниченная очередь. Если клиент не успевает
+читать и очередь переполнилась, он отключается событием dropped и
+переподключается с Last-Event-ID, не задерживая остальных.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, select
+
+from models import ChangeLog, SessionLocal
+from sync import changes_since
+
+# Максимум событий в очереди подписчика до его отключения
+EVENTS_QUEUE_SIZE = int(os.getenv("SKLAD_EVENTS_QUEUE_SIZE", "1000"))
+
+# Интервал опроса журнала (изменения других процессов), секунды
+EVENTS_POLL_INTERVAL = float(os.getenv("SKLAD_EVENTS_POLL_INTERVAL", "1.0"))
+
+# Интервал комментариев-пингов, чтобы прокси не закрывали простаивающее соединение
+KEEPALIVE_INTERVAL = 15
+
+# Сколько изменений читается из журнала за раз
+READ_BATCH_SIZE = 1000
+
+# Маркер отключения медленного подписчика
+DROPPED = object()
+
+
+@dataclass
+class EventFilter:
+    """Фильтр подписки; удаления проходят фильтры по полям, так как данных у них нет"""
+    entity: Optional[str] = None
+    ids: Optional[Set[int]] = None
+    status: Optional[str] = None
+    responsible: Optional[str] = None
+
+    def matches(self, change: Dict[str, Any]) -> bool:
+        if self.entity and change["entity"] != self.entity:
+            return False
+        if self.ids and change["id"] not in self.ids:
+            return False
+        data = change["data"]
+        if data is None:
+            return True
+        if self.status and data.get("status") != self.status:
+            return False
+        if self.responsible and self.responsible not in (data.get("responsible") or ""):
+            return False
+        return True
+
+
+class Subscriber:
+    def __init__(self, event_filter: EventFilter, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.filter = event_filter
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+
+class EventHub:
+    """Рассылка изменений из журнала подписчикам текущего процесса"""
+
+    def __init__(self, session_factory=SessionLocal, queue_size: int = EVENTS_QUEUE_SIZE,
+                 poll_interval: float = EVENTS_POLL_INTERVAL):
+        self.session_factory = session_factory
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.last_seq = 0
+        self.published = 0
+        self.dropped = 0
+        self._subscribers: Set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, event_filter: EventFilter, loop: asyncio.AbstractEventLoop) -> Subscriber:
+        """
+        Новый подписчик, события которого доставляются в цикл loop.
+        Читает базу, поэтому вызывается из пула потоков.
+        """
+        subscriber = Subscriber(event_filter, loop, self.queue_size)
+        with self._lock:
+            if not self._subscribers:
+                # Пока подписчиков не было, журнал не читался - начинаем с текущего номера
+                self.last_seq = self._current_seq()
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._poll, name="events", daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def wake(self):
+        """Проверить журнал немедленно (после коммита)"""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def replay(self, since: int, event_filter: EventFilter) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """
+        Изменения после since для переподключившегося клиента (Last-Event-ID).
+        Возвращает (события, последний номер, полный ли повтор).
+        """
+        db = self.session_factory()
+        try:
+            changes, next_since, has_more = changes_since(db, since, READ_BATCH_SIZE, compact=True)
+        finally:
+            db.close()
+        return [change for change in changes if event_filter.matches(change)], next_since, not has_more
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {
+            "subscribers": subscribers,
+            "last_seq": self.last_seq,
+            "published": self.published,
+            "dropped": self.dropped
+        }
+
+    def _current_seq(self) -> int:
+        db = self.session_factory()
+        try:
+            return db.execute(select(func.coalesce(func.max(ChangeLog.seq), 0))).scalar_one()
+        finally:
+            db.close()
+
+    def _poll(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._lock:
+                subscribers = list(self._subscribers)
+            if not subscribers:
+                continue
+            try:
+                changes = self._read_changes()
+            except Exception as e:
+                print(f"❌ Ошибка чтения журнала изменений: {e}")
+                continue
+            if not changes:
+                continue
+
+            self.published += len(changes)
+            loops = {}
+            for subscriber in subscribers:
+                loops.setdefault(subscriber.loop, []).append(subscriber)
+            for loop, loop_subscribers in loops.items():
+                try:
+                    loop.call_soon_threadsafe(self._deliver, loop_subscribers, changes)
+                except RuntimeError:
+                    # Цикл событий уже закрыт
+                    for subscriber in loop_subscribers:
+                        self.unsubscribe(subscriber)
+
+    def _read_changes(self) -> List[Dict[str, Any]]:
+        changes = []
+        db = self.session_factory()
+        try:
+            has_more = True
+            while has_more:
+                batch, self.last_seq, has_more = changes_since(db, self.last_seq, READ_BATCH_SIZE, compact=True)
+                changes.extend(batch)
+        finally:
+            db.close()
+        return changes
+
+    def _deliver(self, subscribers: List[Subscriber], changes: List[Dict[str, Any]]):
+        """Раскладка событий по очередям (выполняется в цикле событий подписчиков)"""
+        for subscriber in subscribers:
+            if subscriber.dropped:
+                continue
+            for change in changes:
+                if not subscriber.filter.matches(change):
+                    continue
+                try:
+                    subscriber.queue.put_nowait(change)
+                except asyncio.QueueFull:
+                    self._drop(subscriber)
+                    break
+
+    def _drop(self, subscriber: Subscriber):
+        subscriber.dropped = True
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(DROPPED)
+        self.unsubscribe(subscriber)
+        self.dropped += 1
+
+
+def format_event(change: Dict[str, Any]) -> str:
+    """Событие SSE: id - номер изменения для Last-Event-ID"""
+    data = json.dumps(change, ensure_ascii=False, separators=(",", ":"), default=str)
+    return f"id: {change['seq']}\nevent: change\ndata: {data}\n\n"
+
+
+event_hub = EventHub()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_event_hub(session):
+    event_hub.wake()
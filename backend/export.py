@@ -0,0 +1,108 @@
+"""
+Потоковая выгрузка заданий, приемки и истории в NDJSON, CSV и XLSX.
+
+Строки читаются пачками (yield_per - на PostgreSQL это серверный курсор) и
+сразу пишутся в ответ, поэтому расход памяти не зависит от размера таблицы.
+Выгрузка открывает собственную сессию: генератор ответа работает уже после
+выхода из обработчика запроса.
+
+XLSX - zip-архив, который можно собрать только целиком, поэтому книга пишется
+в режиме write_only во временный файл и затем отдается частями.
+"""
+
+import csv
+import io
+import tempfile
+from datetime import date, datetime
+from typing import Any, Iterator, List, Sequence
+
+from models import SessionLocal
+from serialization import dumps, rows_to_dicts
+
+# Строк в одной пачке чтения и записи
+EXPORT_BATCH_SIZE = 1000
+
+# Размер блока при отдаче временного файла XLSX
+FILE_CHUNK_SIZE = 1024 * 1024
+
+# Формат -> тип содержимого
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def iter_batches(statements: Sequence, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Any]]:
+    """Строки запросов (по очереди) пачками по batch_size в отдельной сессии"""
+    db = SessionLocal()
+    try:
+        for statement in statements:
+            result = db.execute(statement.execution_options(yield_per=batch_size))
+            for partition in result.partitions():
+                yield partition
+    finally:
+        db.close()
+
+
+def _text_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def ndjson_stream(batches: Iterator[List[Any]], fields: Sequence[str]) -> Iterator[bytes]:
+    """Одна JSON-запись на строку"""
+    for rows in batches:
+        yield b"".join(dumps(item) + b"\n" for item in rows_to_dicts(rows, fields))
+
+
+def csv_stream(batches: Iterator[List[Any]], fields: Sequence[str]) -> Iterator[bytes]:
+    """CSV с заголовком; BOM нужен, чтобы Excel открыл кириллицу в UTF-8"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(fields)
+    for rows in batches:
+        writer.writerows([_text_value(value) for value in row[:len(fields)]] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def xlsx_stream(batches: Iterator[List[Any]], fields: Sequence[str], title: str = "Выгрузка") -> Iterator[bytes]:
+    """Книга Excel; строки пишутся в режиме write_only без накопления в памяти"""
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(list(fields))
+    for rows in batches:
+        for row in rows:
+            sheet.append([
+                ILLEGAL_CHARACTERS_RE.sub("", value) if isinstance(value, str) else value
+                for value in row[:len(fields)]
+            ])
+
+    with tempfile.TemporaryFile() as target:
+        workbook.save(target)
+        target.seek(0)
+        while chunk := target.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+def export_stream(export_format: str, statements: Sequence, fields: Sequence[str], title: str) -> Iterator[bytes]:
+    """Генератор тела ответа в выбранном формате (строки запросов statements подряд)"""
+    batches = iter_batches(statements)
+    if export_format == "ndjson":
+        return ndjson_stream(batches, fields)
+    if export_format == "csv":
+        return csv_stream(batches, fields)
+    return xlsx_stream(batches, fields, title)
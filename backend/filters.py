@@ -0,0 +1,180 @@
+"""
+Фильтры списка заданий и сохраненные пользовательские фильтры.
+
+Параметры списка (статус, приоритет, поиск, сортировка...) собираются в
+TaskFilter: модель (рабочая таблица или архив), условия WHERE и сортировку.
+Условия не зависят от сессии, а "сейчас" для просроченных подставляется при
+выполнении запроса, поэтому собранный фильтр можно переиспользовать.
+
+Сохраненный фильтр (UserFilter.filter_data - JSON с параметрами
+GET /api/tasks) проверяется при сохранении и собирается один раз: собранные
+фильтры хранятся в LRU-кэше процесса по (id, filter_data). Количество
+заданий для всех фильтров считается одним запросом (SUM(CASE ...) по
+каждому фильтру за один проход таблицы).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import DateTime, and_, bindparam, case, func, select, true
+from sqlalchemy.orm import Session
+
+from models import ArchivedTask, Task, UserFilter
+from schemas import TaskFilterData
+from search import ranked_matches, search_condition
+
+# Собранных сохраненных фильтров в кэше процесса
+FILTER_CACHE_SIZE = int(os.getenv("SKLAD_FILTER_CACHE_SIZE", "256"))
+
+# Поля, по которым разрешена сортировка списка заданий
+TASK_SORT_FIELDS = {
+    "id", "number", "name", "status", "priority", "responsible",
+    "due_date", "created_date", "updated_date", "completed_date"
+}
+
+
+class FilterError(ValueError):
+    """Некорректное содержимое фильтра (сообщение - для ответа API)"""
+
+
+def task_conditions(db: Session, model, search: Optional[str] = None, status: Optional[str] = None,
+                    priority: Optional[str] = None, responsible: Optional[str] = None,
+                    overdue: Optional[bool] = None) -> List[Any]:
+    """Условия WHERE фильтров списка заданий (model - Task или ArchivedTask)"""
+    conditions = []
+    if search:
+        conditions.append(search_condition(db, model, search))
+    if status:
+        conditions.append(model.status == status)
+    if priority:
+        conditions.append(model.priority == priority)
+    if responsible:
+        conditions.append(model.responsible.contains(responsible))
+
+    # Просроченные: текущее время подставляется при каждом выполнении
+    if overdue:
+        now = bindparam("now", callable_=datetime.now, type_=DateTime, unique=True)
+        conditions.append(model.due_date < now)
+        conditions.append(model.status != "готово")
+    return conditions
+
+
+class TaskFilter:
+    """Собранный фильтр списка заданий"""
+
+    def __init__(self, db: Session, data: TaskFilterData):
+        self.data = data
+        self.archived = data.archived
+        self.model = ArchivedTask if data.archived else Task
+        # Ключ для кэша количества и ответов
+        self.key: Tuple[Hashable, ...] = tuple(sorted(data.model_dump().items()))
+
+        # sort_by=relevance с поиском - сначала лучшие совпадения (соединение с FTS)
+        self.matches = None
+        if data.search and data.sort_by == "relevance":
+            self.matches = ranked_matches(db, self.model, data.search)
+        self.conditions = task_conditions(
+            db, self.model,
+            None if self.matches is not None else data.search,
+            data.status, data.priority, data.responsible, data.overdue
+        )
+
+        if self.matches is not None:
+            self.sort_by, self.sort_order = "relevance", "asc"
+            self.sort_column = self.matches.c.rank
+        else:
+            self.sort_by = data.sort_by if data.sort_by in TASK_SORT_FIELDS else "created_date"
+            self.sort_order = "asc" if data.sort_order.lower() == "asc" else "desc"
+            self.sort_column = getattr(self.model, self.sort_by)
+
+    @property
+    def depends_on_clock(self) -> bool:
+        """Результат меняется со временем (просроченные)"""
+        return bool(self.data.overdue)
+
+    def where(self):
+        """Условие фильтра одним выражением (для подсчета)"""
+        conditions = list(self.conditions)
+        if self.matches is not None:
+            conditions.append(self.model.id.in_(select(self.matches.c.id)))
+        return and_(true(), *conditions)
+
+    def apply(self, query):
+        """Фильтр и соединение для релевантности в ORM-запросе по колонкам модели"""
+        if self.matches is not None:
+            query = query.join(self.matches, self.matches.c.id == self.model.id)
+        return query.filter(*self.conditions)
+
+
+def parse_filter_data(filter_data: str) -> TaskFilterData:
+    """Проверка JSON сохраненного фильтра"""
+    try:
+        return TaskFilterData.model_validate_json(filter_data)
+    except ValidationError as e:
+        problems = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'filter_data'}: {error['msg']}"
+            for error in e.errors()
+        )
+        raise FilterError(f"Некорректный фильтр: {problems}")
+
+
+class SavedFilterCache:
+    """LRU-кэш собранных сохраненных фильтров: (id, filter_data) -> TaskFilter"""
+
+    def __init__(self, max_size: int = FILTER_CACHE_SIZE):
+        self.max_size = max_size
+        self._items: "OrderedDict[Tuple[int, str], TaskFilter]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_filter: UserFilter) -> TaskFilter:
+        key = (user_filter.id, user_filter.filter_data)
+        with self._lock:
+            task_filter = self._items.get(key)
+            if task_filter is not None:
+                self._items.move_to_end(key)
+                return task_filter
+        task_filter = TaskFilter(db, parse_filter_data(user_filter.filter_data))
+        with self._lock:
+            self._items[key] = task_filter
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return task_filter
+
+    def discard(self, filter_id: int):
+        with self._lock:
+            for key in [key for key in self._items if key[0] == filter_id]:
+                del self._items[key]
+
+
+saved_filters = SavedFilterCache()
+
+
+def filter_counts(db: Session, user_filters: Sequence[UserFilter]) -> Dict[int, Optional[int]]:
+    """
+    Количество заданий по каждому фильтру: один запрос на таблицу
+    (рабочую или архив) с SUM(CASE WHEN условие ...) на фильтр.
+    Для некорректных фильтров - None.
+    """
+    counts: Dict[int, Optional[int]] = {}
+    by_model: Dict[Any, List[Tuple[int, TaskFilter]]] = {}
+    for user_filter in user_filters:
+        try:
+            task_filter = saved_filters.get(db, user_filter)
+        except FilterError:
+            counts[user_filter.id] = None
+            continue
+        by_model.setdefault(task_filter.model, []).append((user_filter.id, task_filter))
+
+    for model, compiled in by_model.items():
+        row = db.execute(
+            select(*[
+                func.coalesce(func.sum(case((task_filter.where(), 1), else_=0)), 0)
+                for _, task_filter in compiled
+            ]).select_from(model)
+        ).one()
+        counts.update({filter_id: count for (filter_id, _), count in zip(compiled, row)})
+    return counts
@@ -0,0 +1,352 @@
+"""
+Компактное хранение истории изменений заданий.
+
+Запись истории - изменение одного поля. Действие, поле и пользователь
+хранятся ссылками на словарь history_terms, пустые значения - как NULL, а
+текст details не хранится, если он получается из шаблона действия
+(HISTORY_TEMPLATES): при чтении он собирается прямо в SQL. Свой текст
+details сохраняется только у записей, которые не укладываются в шаблон.
+
+Старые неоткатываемые записи сжимаются (retention): подряд идущие изменения
+одного поля старше HISTORY_RETENTION_DAYS дней заменяются одной записью
+"было → стало", а цепочка, вернувшая поле к исходному значению, удаляется.
+Откатываемые записи и снимки заданий разрывают цепочку, поэтому значения
+"было"/"стало" соседних записей продолжают сходиться.
+"""
+
+import os
+import re
+import string
+import threading
+from datetime import datetime, timedelta
+from functools import reduce
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, event, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from bulk import chunked
+from models import ArchivedTaskHistory, HistoryTerm, SessionLocal, TaskHistory, TaskSnapshot, begin_write
+
+# Через сколько дней неоткатываемые записи истории сжимаются (0 - не сжимать)
+HISTORY_RETENTION_DAYS = int(os.getenv("SKLAD_HISTORY_RETENTION_DAYS", "90"))
+
+# Заданий в одной транзакции сжатия
+HISTORY_COMPACT_BATCH_SIZE = int(os.getenv("SKLAD_HISTORY_COMPACT_BATCH_SIZE", "500"))
+
+# Текст details по действию; {field}, {old}, {new} - поля записи
+HISTORY_TEMPLATES = {
+    "Создано": "Создано новое задание '{new}'",
+    "Обновлено": "Поле '{field}' изменено: '{old}' → '{new}'",
+    "Откат изменения": "Откат поля '{field}': '{old}' → '{new}'",
+    "Массовое обновление": "Изменения: {field}: '{old}' → '{new}'",
+    "Импортировано": "Задание импортировано из Excel файла '{new}'",
+    "Архивирован": "Автоматическое архивирование задания '{new}'",
+}
+
+def _template_pattern(template: str):
+    parts = []
+    for text, name, _, _ in string.Formatter().parse(template):
+        parts.append(re.escape(text))
+        if name:
+            parts.append(f"(?P<{name}>.*)")
+    return re.compile("^" + "".join(parts) + "$", re.DOTALL)
+
+
+TEMPLATE_PATTERNS = {action: _template_pattern(template) for action, template in HISTORY_TEMPLATES.items()}
+
+
+def _text(value: Any) -> Optional[str]:
+    """Значение поля истории как текст; пустое - None"""
+    if value is None or value == "":
+        return None
+    return str(value)
+
+
+def render_details(action: str, field_name: Optional[str], old_value: Optional[str],
+                   new_value: Optional[str]) -> str:
+    template = HISTORY_TEMPLATES.get(action)
+    if template is None:
+        return ""
+    return template.format(field=field_name or "", old=old_value or "", new=new_value or "")
+
+
+def compact_details(action: str, field_name: Optional[str], old_value: Optional[str],
+                    new_value: Optional[str], details: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (new_value, details) для хранения: details = None, если текст выводится из
+    шаблона. Значение {new}, которого нет в записи (старые записи создания,
+    импорта, архивирования), извлекается из текста.
+    """
+    if not details or details == render_details(action, field_name, old_value, new_value):
+        return new_value, None
+    pattern = TEMPLATE_PATTERNS.get(action)
+    match = pattern.match(details) if pattern else None
+    if match is None:
+        return new_value, details
+    parsed = match.groupdict()
+    if "new" in parsed and new_value is None:
+        new_value = _text(parsed["new"])
+    if details == render_details(action, field_name, old_value, new_value):
+        return new_value, None
+    return new_value, details
+
+
+# Словарь history_terms: база -> значение -> id. В кэш процесса попадают только
+# зафиксированные значения (новые - после коммита сессии, которая их добавила)
+_term_cache: Dict[str, Dict[str, int]] = {}
+_term_lock = threading.Lock()
+
+
+def _database(db) -> str:
+    """Адрес базы сессии или соединения - ключ кэша словаря"""
+    bind = db.get_bind() if isinstance(db, Session) else db
+    return str(bind.engine.url)
+
+
+def term_ids(db, values: Iterable[Optional[str]]) -> Dict[str, int]:
+    """
+    id значений словаря; недостающие добавляются в текущей транзакции.
+    db - сессия или соединение (в миграциях).
+    """
+    wanted = {value for value in values if value}
+    database = _database(db)
+    with _term_lock:
+        cache = _term_cache.setdefault(database, {})
+        ids = {value: cache[value] for value in wanted if value in cache}
+    missing = wanted - set(ids)
+    if not missing:
+        return ids
+
+    pending = db.info.setdefault("pending_terms", {}).setdefault(database, {})
+    found = dict(db.execute(
+        select(HistoryTerm.value, HistoryTerm.id).where(HistoryTerm.value.in_(missing))
+    ).all())
+    new = missing - set(found)
+    if new:
+        db.execute(insert(HistoryTerm.__table__), [{"value": value} for value in sorted(new)])
+        added = dict(db.execute(
+            select(HistoryTerm.value, HistoryTerm.id).where(HistoryTerm.value.in_(new))
+        ).all())
+        pending.update(added)
+        found.update(added)
+
+    committed = {value: term_id for value, term_id in found.items() if value not in pending}
+    with _term_lock:
+        cache.update(committed)
+    ids.update(found)
+    return ids
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_terms(session):
+    pending = session.info.pop("pending_terms", None)
+    if pending:
+        with _term_lock:
+            for database, terms in pending.items():
+                _term_cache.setdefault(database, {}).update(terms)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_terms(session):
+    session.info.pop("pending_terms", None)
+
+
+def history_rows(db, entries: Sequence[Dict[str, Any]], default_timestamp: datetime) -> List[Dict[str, Any]]:
+    """Строки для INSERT в таблицу истории из записей log_task_changes"""
+    prepared = []
+    for entry in entries:
+        action = entry["action"]
+        field_name = entry.get("field_name") or None
+        old_value = _text(entry.get("old_value"))
+        new_value, details = compact_details(
+            action, field_name, old_value, _text(entry.get("new_value")), entry.get("details")
+        )
+        prepared.append((entry, action, field_name, old_value, new_value, details))
+
+    terms = term_ids(db, [
+        value
+        for entry, action, field_name, *_ in prepared
+        for value in (action, field_name, entry.get("user", "Система"))
+    ])
+    return [
+        {
+            "task_id": entry["task_id"],
+            "action_id": terms[action],
+            "field_id": terms.get(field_name),
+            "user_id": terms.get(entry.get("user", "Система")),
+            "old_value": old_value,
+            "new_value": new_value,
+            "details": details,
+            "can_revert": entry.get("can_revert", False),
+            "timestamp": entry.get("timestamp", default_timestamp),
+        }
+        for entry, action, field_name, old_value, new_value, details in prepared
+    ]
+
+
+def _concat(*parts):
+    return reduce(lambda left, right: left.concat(right), parts)
+
+
+def history_columns(model) -> Tuple[Dict[str, Any], Any]:
+    """
+    Колонки записи истории в формате ответа (поля схемы TaskHistory) и
+    соединение с таблицей словаря, из которого они выбираются.
+    """
+    terms = HistoryTerm.__table__
+    action = terms.alias("action_term")
+    field = terms.alias("field_term")
+    user = terms.alias("user_term")
+    table = model.__table__
+    source = (
+        table.join(action, action.c.id == table.c.action_id)
+        .outerjoin(field, field.c.id == table.c.field_id)
+        .outerjoin(user, user.c.id == table.c.user_id)
+    )
+
+    values = {
+        "field": func.coalesce(field.c.value, ""),
+        "old": func.coalesce(table.c.old_value, ""),
+        "new": func.coalesce(table.c.new_value, ""),
+    }
+    rendered = {}
+    for action_name, template in HISTORY_TEMPLATES.items():
+        parts = []
+        for text, name, _, _ in string.Formatter().parse(template):
+            if text:
+                parts.append(literal(text))
+            if name:
+                parts.append(values[name])
+        rendered[action_name] = _concat(*parts)
+
+    columns = {
+        "id": table.c.id,
+        "task_id": table.c.task_id,
+        "action": action.c.value,
+        "details": func.coalesce(table.c.details, case(rendered, value=action.c.value, else_="")),
+        "field_name": values["field"],
+        "old_value": values["old"],
+        "new_value": values["new"],
+        "user": user.c.value,
+        "can_revert": table.c.can_revert,
+        "timestamp": table.c.timestamp,
+    }
+    return columns, source
+
+
+def history_select(model, fields: Sequence[str]):
+    """SELECT записей истории с полями fields (details собирается по шаблону)"""
+    columns, source = history_columns(model)
+    return select(*[columns[field].label(field) for field in fields]).select_from(source)
+
+
+def _merge_runs(rows: list, anchors: Sequence[int]) -> List[list]:
+    """
+    Отрезки подряд идущих неоткатываемых изменений одного поля (rows - записи
+    поля по времени). Откатываемая запись разрывает отрезок: она остается
+    как есть, и значения до и после нее должны сходиться. Снимок задания
+    (его history_id) тоже разрывает отрезок: проигрывание от снимка назад и
+    вперед должно находить те же записи по обе стороны от него.
+    """
+    runs, run = [], []
+    for row in rows:
+        if row.can_revert:
+            runs.append(run)
+            run = []
+            continue
+        if run:
+            low, high = sorted((run[-1].id, row.id))
+            if any(low <= anchor < high for anchor in anchors):
+                runs.append(run)
+                run = []
+        run.append(row)
+    runs.append(run)
+    return [run for run in runs if len(run) > 1]
+
+
+def compact_batch(db: Session, model, cutoff: datetime, batch_size: int = HISTORY_COMPACT_BATCH_SIZE,
+                  after_task_id: int = 0) -> Tuple[int, Optional[int]]:
+    """
+    Сжатие истории до batch_size заданий с id больше after_task_id: отрезки
+    подряд идущих неоткатываемых изменений одного поля старше cutoff.
+    Возвращает (количество удаленных записей, id последнего просмотренного
+    задания - начало следующей пачки, или None, если заданий больше нет).
+    """
+    begin_write(db)
+    old_entries = (
+        model.timestamp < cutoff,
+        model.field_id.isnot(None),
+    )
+    task_ids = db.execute(
+        select(model.task_id)
+        .where(*old_entries, model.can_revert == False, model.task_id > after_task_id)
+        .group_by(model.task_id, model.field_id)
+        .having(func.count(model.id) > 1)
+        .order_by(model.task_id)
+        .limit(batch_size)
+    ).scalars().all()
+    if not task_ids:
+        return 0, None
+    task_ids = sorted(set(task_ids))
+
+    # Откатываемые записи нужны как границы отрезков
+    fields: Dict[Tuple[int, int], list] = {}
+    for row in db.execute(
+        select(model.id, model.task_id, model.field_id, model.action_id, model.old_value, model.new_value,
+               model.can_revert)
+        .where(*old_entries, model.task_id.in_(task_ids))
+        .order_by(model.timestamp, model.id)
+    ):
+        fields.setdefault((row.task_id, row.field_id), []).append(row)
+    anchors: Dict[int, List[int]] = {}
+    for task_id, history_id in db.execute(
+        select(TaskSnapshot.task_id, TaskSnapshot.history_id).where(TaskSnapshot.task_id.in_(task_ids))
+    ):
+        anchors.setdefault(task_id, []).append(history_id)
+
+    # Текст объединенной записи собирается по шаблону ее действия
+    templated = set(term_ids(db, HISTORY_TEMPLATES).values())
+    removed, merged = [], []
+    for (task_id, _), rows in fields.items():
+        task_anchors = anchors.get(task_id, ())
+        for run in _merge_runs(rows, task_anchors):
+            first, last = run[0], run[-1]
+            # Запись, на которую ссылается снимок, не удаляется
+            if first.old_value == last.new_value and last.id not in task_anchors:
+                removed.extend(row.id for row in run)
+                continue
+            removed.extend(row.id for row in run[:-1])
+            values = {"old_value": first.old_value}
+            if last.action_id in templated:
+                values["details"] = None
+            merged.append((last.id, values))
+
+    for row_id, values in merged:
+        db.execute(update(model.__table__).where(model.id == row_id).values(**values))
+    for chunk in chunked(removed):
+        db.execute(delete(model.__table__).where(model.id.in_(chunk)))
+    return len(removed), task_ids[-1]
+
+
+def compact_history(days: int = HISTORY_RETENTION_DAYS, batch_size: int = HISTORY_COMPACT_BATCH_SIZE) -> int:
+    """Сжатие истории (рабочей и архивной) пачками; возвращает количество удаленных записей"""
+    if days <= 0:
+        return 0
+    cutoff = datetime.now() - timedelta(days=days)
+    count = 0
+    for model in (TaskHistory, ArchivedTaskHistory):
+        after_task_id = 0
+        while after_task_id is not None:
+            db = SessionLocal()
+            try:
+                removed, after_task_id = compact_batch(db, model, cutoff, batch_size, after_task_id)
+                db.commit()
+            except Exception as e:
+                print(f"❌ Ошибка сжатия истории: {e}")
+                db.rollback()
+                return count
+            finally:
+                db.close()
+            count += removed
+    return count
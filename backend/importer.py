@@ -0,0 +1,272 @@
+"""
+Пакетный импорт заданий из Excel.
+
+Строки читаются потоково (openpyxl в режиме read_only) и записываются
+пачками: каждая пачка вместе с записями истории - отдельная короткая
+транзакция записи (begin_write), поэтому импорт большого файла не держит
+блокировку базы и не задерживает других писателей. Занятость номеров
+проверяется внутри этой транзакции; номер, занятый параллельной записью,
+становится ошибкой строки, а не всего импорта.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from bulk import chunked
+from models import ArchivedTask, Task, begin_write, log_task_changes
+from stats import StatsDelta, apply_stats_delta, count_task
+
+# Колонки файла → поля задания
+COLUMN_FIELDS = {
+    "номер": "number",
+    "наименование": "name",
+    "описание": "description",
+    "статус": "status",
+}
+REQUIRED_COLUMNS = ["номер", "наименование"]
+
+DEFAULT_STATUS = "в разработке"
+DEFAULT_PRIORITY = "средний"
+BATCH_SIZE = 1000
+
+
+class ImportFormatError(ValueError):
+    """Файл не может быть импортирован целиком (формат, заголовок)"""
+
+
+class ImportCancelled(Exception):
+    """Импорт отменен пользователем; уже записанные пачки остаются в базе"""
+
+
+@dataclass
+class ImportRowError:
+    row: int                 # Номер строки в файле (как в Excel, с заголовком)
+    number: str
+    error: str
+
+
+@dataclass
+class ImportReport:
+    rows_parsed: int = 0
+    created: int = 0
+    errors: List[ImportRowError] = field(default_factory=list)
+
+    @property
+    def failed(self) -> int:
+        return len(self.errors)
+
+
+def _cell_text(value: Any) -> str:
+    """Значение ячейки в виде строки (пустая ячейка - пустая строка)"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:  # NaN из pandas
+            return ""
+        if value.is_integer():
+            value = int(value)
+    return str(value).strip()
+
+
+def _read_xlsx(fileobj) -> Iterator[Tuple[Any, ...]]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _read_xls(fileobj) -> Iterator[Tuple[Any, ...]]:
+    # Старый формат openpyxl не читает - остается pandas (целиком в памяти)
+    import pandas as pd
+
+    df = pd.read_excel(fileobj, header=None, dtype=object)
+    yield from df.itertuples(index=False, name=None)
+
+
+def read_rows(fileobj, filename: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Потоковое чтение строк файла: (номер строки, {поле: значение})"""
+    reader = _read_xls if filename.lower().endswith(".xls") else _read_xlsx
+    rows = reader(fileobj)
+
+    header = next(rows, None)
+    if header is None:
+        raise ImportFormatError("Файл не содержит данных")
+
+    columns = [_cell_text(name).lower() for name in header]
+    missing_columns = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing_columns:
+        raise ImportFormatError(f"Отсутствуют обязательные колонки: {', '.join(missing_columns)}")
+
+    positions = {
+        COLUMN_FIELDS[column]: index
+        for index, column in enumerate(columns)
+        if column in COLUMN_FIELDS
+    }
+
+    for row_number, values in enumerate(rows, start=2):
+        if not any(value is not None and _cell_text(value) for value in values):
+            continue  # пустые строки в конце листа
+        yield row_number, {
+            field_name: _cell_text(values[index]) if index < len(values) else ""
+            for field_name, index in positions.items()
+        }
+
+
+def _chunks(rows: Iterator, size: int) -> Iterator[List]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _validate_chunk(chunk, seen_numbers: set, report: ImportReport) -> List[Tuple[int, Dict[str, str]]]:
+    """Проверка пачки строк без обращения к базе; номера принятых строк добавляются в seen_numbers"""
+    valid = []
+    for row_number, data in chunk:
+        number = data.get("number", "")
+        if not number:
+            report.errors.append(ImportRowError(row_number, number, "не указан номер задания"))
+        elif not data.get("name"):
+            report.errors.append(ImportRowError(row_number, number, "не указано наименование"))
+        elif number in seen_numbers:
+            report.errors.append(ImportRowError(
+                row_number, number, f"задание с номером '{number}' уже существует"
+            ))
+        else:
+            seen_numbers.add(number)
+            valid.append((row_number, {
+                "number": number,
+                "name": data["name"],
+                "description": data.get("description", ""),
+                "status": data.get("status") or DEFAULT_STATUS,
+            }))
+    return valid
+
+
+def _existing_numbers(db: Session, numbers: List[str]) -> set:
+    """Номера пачки, уже занятые в базе (с учетом архива)"""
+    existing = set()
+    for chunk in chunked(numbers):
+        for model in (Task, ArchivedTask):
+            existing.update(db.execute(select(model.number).where(model.number.in_(chunk))).scalars())
+    return existing
+
+
+def _insert_tasks(db: Session, valid: List[Tuple[int, Dict[str, Any]]],
+                  report: ImportReport) -> List[Dict[str, Any]]:
+    """Вставка строк пачки; возвращает вставленные, отказы базы - ошибки строк"""
+    tasks = [task for _, task in valid]
+    try:
+        with db.begin_nested():
+            db.execute(insert(Task.__table__), tasks)
+        return tasks
+    except IntegrityError:
+        pass
+
+    # В PostgreSQL begin_write не блокирует таблицу, и номер мог занять
+    # параллельный запрос - тогда пачка записывается построчно
+    inserted = []
+    for row_number, task in valid:
+        try:
+            with db.begin_nested():
+                db.execute(insert(Task.__table__), [task])
+        except IntegrityError:
+            report.errors.append(ImportRowError(
+                row_number, task["number"], f"задание с номером '{task['number']}' уже существует"
+            ))
+        else:
+            inserted.append(task)
+    return inserted
+
+
+def _write_batch(db: Session, valid: List[Tuple[int, Dict[str, Any]]], filename: str, user: str,
+                 report: ImportReport) -> int:
+    """Запись пачки в текущей транзакции записи; возвращает число созданных заданий"""
+    existing = _existing_numbers(db, [task["number"] for _, task in valid])
+    for row_number, task in valid:
+        if task["number"] in existing:
+            report.errors.append(ImportRowError(
+                row_number, task["number"], f"задание с номером '{task['number']}' уже существует"
+            ))
+    valid = [(row_number, task) for row_number, task in valid if task["number"] not in existing]
+    if not valid:
+        return 0
+
+    now = datetime.now()
+    for _, task in valid:
+        task["created_date"] = now
+        task["updated_date"] = now
+
+    tasks = _insert_tasks(db, valid, report)
+    if not tasks:
+        return 0
+
+    # executemany без RETURNING, id новых заданий - запросом по номерам
+    task_ids = []
+    for chunk in chunked([task["number"] for task in tasks]):
+        task_ids.extend(db.execute(select(Task.id).where(Task.number.in_(chunk))).scalars())
+
+    log_task_changes(db, [
+        {
+            "task_id": task_id,
+            "action": "Импортировано",
+            "new_value": filename,
+            "user": user,
+            "timestamp": now,
+        }
+        for task_id in task_ids
+    ])
+
+    delta = StatsDelta()
+    for task in tasks:
+        count_task(delta, task["status"], DEFAULT_PRIORITY)
+    apply_stats_delta(db, delta)
+    return len(task_ids)
+
+
+def import_tasks(db: Session, fileobj, filename: str,
+                 batch_size: int = BATCH_SIZE, user: str = "Система",
+                 report: Optional[ImportReport] = None,
+                 is_cancelled: Optional[Callable[[], bool]] = None) -> ImportReport:
+    """
+    Импорт заданий из файла пачками, каждая пачка фиксируется отдельно.
+    Ошибки отдельных строк попадают в отчет; ошибка формата файла или базы
+    прерывает импорт, откатывая только текущую пачку. Переданный report
+    заполняется по ходу импорта (прогресс фоновой задачи), is_cancelled
+    проверяется перед каждой пачкой.
+    """
+    report = report if report is not None else ImportReport()
+    rows = read_rows(fileobj, filename)
+    # Номера, уже встреченные в файле (занятость в базе проверяется при записи пачки)
+    seen_numbers = set()
+
+    for chunk in _chunks(rows, batch_size):
+        if is_cancelled is not None and is_cancelled():
+            raise ImportCancelled()
+        report.rows_parsed += len(chunk)
+        valid = _validate_chunk(chunk, seen_numbers, report)
+        if not valid:
+            continue
+
+        try:
+            begin_write(db)
+            created = _write_batch(db, valid, filename, user, report)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        report.created += created
+
+    return report
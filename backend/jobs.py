@@ -0,0 +1,206 @@
+"""
+Фоновые задачи импорта.
+
+Загруженный файл сохраняется во временный файл, а импорт выполняется в пуле
+рабочих потоков со своей сессией базы данных, поэтому обработчик запроса
+сразу возвращает id задачи, а сервер продолжает обслуживать других клиентов.
+
+Состояние задач хранится в таблице import_jobs, а не в памяти процесса: при
+нескольких рабочих процессах (server.py) опрос прогресса, отчет и отмена
+работают через любой процесс. Импорт выполняет процесс, принявший файл; перед
+каждой пачкой он записывает прогресс и проверяет, не запрошена ли отмена.
+"""
+
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, select, update
+
+from importer import ImportCancelled, ImportFormatError, ImportReport, import_tasks
+from models import ImportJob, SessionLocal
+
+# Количество одновременно выполняемых импортов
+IMPORT_WORKERS = int(os.getenv("SKLAD_IMPORT_WORKERS", "2"))
+
+# Сколько завершенных задач хранить для просмотра отчета
+KEEP_FINISHED_JOBS = 100
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+FINISHED_STATES = {COMPLETED, CANCELLED, FAILED}
+
+
+def _progress(report: ImportReport) -> Dict[str, Any]:
+    return {"rows_parsed": report.rows_parsed, "rows_inserted": report.created, "rows_failed": report.failed}
+
+
+def _update_job(job_id: str, **values):
+    with SessionLocal() as db:
+        db.execute(update(ImportJob).where(ImportJob.id == job_id).values(**values))
+        db.commit()
+
+
+def fail_interrupted_jobs() -> int:
+    """Задачи, не завершенные до остановки сервера, - в ошибку (при подготовке базы)"""
+    with SessionLocal() as db:
+        count = db.execute(
+            update(ImportJob)
+            .where(ImportJob.status.not_in(FINISHED_STATES))
+            .values(status=FAILED, error="Импорт прерван остановкой сервера", finished_date=datetime.now())
+        ).rowcount
+        db.commit()
+    return count
+
+
+class ImportJobManager:
+    """Очередь задач импорта текущего процесса; состояние задач - в базе"""
+
+    def __init__(self, max_workers: int = IMPORT_WORKERS, keep_finished: int = KEEP_FINISHED_JOBS):
+        self.max_workers = max_workers
+        self.keep_finished = keep_finished
+        # Пул создается при первой задаче и заново после shutdown (перезапуск приложения в процессе)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stopping = threading.Event()
+        self._queued: set = set()    # id задач процесса, еще не начатых
+        self._lock = threading.Lock()
+
+    def submit(self, path: str, filename: str) -> ImportJob:
+        """Поставить файл в очередь импорта; файл удаляется после выполнения"""
+        job = ImportJob(
+            id=uuid.uuid4().hex, filename=filename, status=QUEUED,
+            rows_parsed=0, rows_inserted=0, rows_failed=0, error="", cancel_requested=False,
+            created_date=datetime.now()
+        )
+        with SessionLocal(expire_on_commit=False) as db:
+            db.add(job)
+            self._forget_old_jobs(db)
+            db.commit()
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="import")
+                self._stopping = threading.Event()
+            self._queued.add(job.id)
+            self._executor.submit(self._run, job.id, path, filename, self._stopping)
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        with SessionLocal() as db:
+            return db.get(ImportJob, job_id)
+
+    def list(self) -> List[ImportJob]:
+        with SessionLocal() as db:
+            return db.execute(
+                select(ImportJob).order_by(ImportJob.created_date.desc(), ImportJob.id)
+            ).scalars().all()
+
+    def cancel(self, job_id: str) -> Optional[ImportJob]:
+        """Запросить отмену; импорт (в любом процессе) останавливается перед следующей пачкой"""
+        with SessionLocal() as db:
+            db.execute(
+                update(ImportJob)
+                .where(ImportJob.id == job_id, ImportJob.status.not_in(FINISHED_STATES))
+                .values(cancel_requested=True)
+            )
+            db.commit()
+            return db.get(ImportJob, job_id)
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            queued, self._queued = list(self._queued), set()
+        if executor is None:
+            return
+        self._stopping.set()
+        executor.shutdown(wait=wait, cancel_futures=True)
+        # Задачи из очереди процесса уже не будут запущены
+        if queued:
+            with SessionLocal() as db:
+                db.execute(
+                    update(ImportJob)
+                    .where(ImportJob.id.in_(queued), ImportJob.status == QUEUED)
+                    .values(status=CANCELLED, finished_date=datetime.now())
+                )
+                db.commit()
+
+    def _forget_old_jobs(self, db):
+        kept = (
+            select(ImportJob.id)
+            .where(ImportJob.status.in_(FINISHED_STATES))
+            .order_by(ImportJob.created_date.desc())
+            .limit(self.keep_finished)
+        )
+        db.execute(delete(ImportJob).where(ImportJob.status.in_(FINISHED_STATES), ImportJob.id.not_in(kept)))
+
+    def _start(self, job_id: str) -> bool:
+        """queued -> running; False - отмена запрошена до начала или задача уже завершена"""
+        with SessionLocal() as db:
+            queued = (ImportJob.id == job_id, ImportJob.status == QUEUED)
+            started = db.execute(
+                update(ImportJob).where(*queued, ImportJob.cancel_requested == False).values(status=RUNNING)
+            ).rowcount
+            if not started:
+                db.execute(update(ImportJob).where(*queued).values(status=CANCELLED, finished_date=datetime.now()))
+            db.commit()
+        return bool(started)
+
+    def _is_cancelled(self, job_id: str, report: ImportReport, stopping: threading.Event) -> bool:
+        """Запись прогресса перед пачкой; True - отмена запрошена или процесс останавливается"""
+        with SessionLocal() as db:
+            cancel_requested = db.execute(
+                update(ImportJob)
+                .where(ImportJob.id == job_id)
+                .values(**_progress(report))
+                .returning(ImportJob.cancel_requested)
+            ).scalar()
+            db.commit()
+        return bool(cancel_requested) or stopping.is_set()
+
+    def _run(self, job_id: str, path: str, filename: str, stopping: threading.Event):
+        with self._lock:
+            self._queued.discard(job_id)
+        report = ImportReport()
+        db = SessionLocal()
+        try:
+            if not self._start(job_id):
+                return
+            with open(path, "rb") as fileobj:
+                import_tasks(
+                    db, fileobj, filename,
+                    report=report,
+                    is_cancelled=lambda: self._is_cancelled(job_id, report, stopping)
+                )
+            self._finish(job_id, report, COMPLETED)
+        except ImportCancelled:
+            self._finish(job_id, report, CANCELLED)
+        except ImportFormatError as e:
+            self._finish(job_id, report, FAILED, str(e))
+        except Exception as e:
+            print(f"❌ Ошибка импорта '{filename}': {e}")
+            self._finish(job_id, report, FAILED, f"Ошибка обработки файла: {e}")
+        finally:
+            db.close()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _finish(self, job_id: str, report: ImportReport, status: str, error: str = ""):
+        # report.created - задания из уже зафиксированных пачек, они остаются и при отмене
+        _update_job(
+            job_id, **_progress(report),
+            errors=json.dumps([asdict(row_error) for row_error in report.errors], ensure_ascii=False),
+            error=error, finished_date=datetime.now(), status=status
+        )
+
+
+import_jobs = ImportJobManager()
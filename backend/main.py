@@ -1,21 +1,51 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Header, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from anyio import to_thread
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
+import asyncio
+import json
 import os
-import uvicorn
+import shutil
+import tempfile
 
-from models import init_db, get_db, Task, Reception, TaskHistory, UserFilter, create_sample_data, log_task_change, archive_old_tasks
+from models import (
+    engine, SessionLocal, prepare_database, get_db, Task, Reception, TaskHistory, UserFilter,
+    ArchivedTask, ArchivedTaskHistory,
+    log_task_change, log_task_changes, begin_write
+)
 from schemas import (
-    TaskCreate, TaskUpdate, TaskBulkUpdate, Task as TaskSchema,
-    ReceptionCreate, Reception as ReceptionSchema,
-    TaskHistory as TaskHistorySchema,
-    UserFilterCreate, UserFilter as UserFilterSchema,
+    TaskCreate, TaskUpdate, TaskBulkUpdate, TaskRevert, TaskRestore, Task as TaskSchema, TasksResponse,
+    ReceptionCreate, Reception as ReceptionSchema, ReceptionBatch, ReceptionBatchResult, ReceptionTotal,
+    HistoryResponse,
+    TaskFilterData, UserFilterCreate, UserFilter as UserFilterSchema,
+    ImportResult, ImportRowError as ImportRowErrorSchema, ImportJob as ImportJobSchema,
+    SyncResponse,
     ArchiveResponse, ErrorResponse
 )
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CountCache, CursorError,
+    encode_cursor, decode_cursor, fetch_page
+)
+from search import SEARCH_INDEXES, rebuild_search_index, search_condition
+from filters import FilterError, TaskFilter, filter_counts, parse_filter_data, saved_filters, task_conditions
+from jobs import FINISHED_STATES, import_jobs
+from bulk import update_tasks, delete_tasks
+from stats import StatsDelta, count_task, count_change, apply_stats_delta, rebuild_task_stats, task_stats
+from cache import response_cache, track_table_changes
+from serialization import TASK_FIELDS, RECEPTION_FIELDS, HISTORY_FIELDS, columns_for, dumps, parse_fields, rows_to_dicts
+from sync import changes_since
+from export import EXPORT_FORMATS, export_stream
+from events import EventFilter, event_hub, format_event, DROPPED, KEEPALIVE_INTERVAL
+from archive import archive_old_tasks, archive_scheduler
+from history import compact_history, history_columns, history_select
+from metrics import METRICS_ENABLED, MetricsMiddleware, install_sql_metrics, registry, slow_query_log
+from receptions import RECEPTION_BATCH_MAX, ingest_receptions, reception_totals
+from revisions import RevisionError, RevisionNotFound, format_value, restore_tasks, revert_entries, task_states
 
 # Создание FastAPI приложения
 app = FastAPI(
@@ -33,6 +63,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Кэш общего количества заданий по набору фильтров
+task_count_cache = CountCache()
+
+# Метрики HTTP и SQL для /metrics (SKLAD_METRICS=0 - выключены)
+if METRICS_ENABLED:
+    install_sql_metrics(engine)
+    app.add_middleware(MetricsMiddleware)
+
+# Версии таблиц увеличиваются после каждого коммита, изменившего таблицу,
+# и сбрасывают закэшированные ответы списков и статистики
+track_table_changes(engine, SessionLocal)
+
+# Ответы, зависящие от текущего времени (число и список просроченных), кэшируются ненадолго
+CLOCK_CACHE_TTL = 5
+
+# Размер пула потоков для синхронных обработчиков (работа с БД)
+THREADPOOL_SIZE = int(os.getenv("SKLAD_THREADPOOL_SIZE", "40"))
+
+# Размер блока при сохранении загруженного файла
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Миграции и демо-данные при запуске процесса; в production-режиме (server.py)
+# база готовится один раз до запуска рабочих процессов, и здесь это выключено
+PREPARE_ON_STARTUP = os.getenv("SKLAD_PREPARE_ON_STARTUP", "1") != "0"
+
+# Готовность к приему запросов (/health/ready): от конца запуска до начала остановки
+app.state.ready = False
+
 # Статические файлы (фронтенд)
 if os.path.exists("../frontend"):
     app.mount("/static", StaticFiles(directory="../frontend"), name="static")
@@ -40,10 +98,21 @@ if os.path.exists("../frontend"):
 # Инициализация при запуске
 @app.on_event("startup")
 async def startup_event():
-    init_db()
-    create_sample_data()
+    # Обработчики с доступом к БД объявлены через def и выполняются в пуле потоков
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    if PREPARE_ON_STARTUP:
+        prepare_database()
+    archive_scheduler.start()
+    app.state.ready = True
     print("🚀 API сервер запущен!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.ready = False
+    import_jobs.shutdown()
+    event_hub.stop()
+    archive_scheduler.stop()
+
 # Главная страница - отдаем фронтенд
 @app.get("/")
 async def read_root():
@@ -51,72 +120,283 @@ async def read_root():
         return FileResponse("../frontend/index.html")
     return {"message": "Система управления складом API", "docs": "/docs"}
 
+# ПРОВЕРКИ СОСТОЯНИЯ (для балансировщика и оркестратора)
+@app.get("/health/live")
+async def liveness():
+    """Процесс жив и обрабатывает запросы (без обращения к базе)"""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+def readiness():
+    """Готовность: запуск завершен, база доступна, схема в актуальной версии"""
+    from migrations import MIGRATIONS, current_version
+
+    checks = {"startup": "ok" if app.state.ready else "starting"}
+    try:
+        version, latest = current_version(engine), max(version for version, *_ in MIGRATIONS)
+        checks["database"] = "ok"
+        checks["schema"] = "ok" if version >= latest else f"версия {version}, требуется {latest}"
+    except Exception as e:
+        checks["database"] = f"недоступна: {e}"
+    ready = all(value == "ok" for value in checks.values())
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "ready" if ready else "not ready", "checks": checks}
+    )
+
 # ЗАДАНИЯ
-@app.get("/api/tasks", response_model=List[TaskSchema])
-async def get_tasks(
+@app.get("/api/tasks", response_model=TasksResponse)
+def get_tasks(
     archived: bool = Query(False, description="Получить архивные задания"),
     search: Optional[str] = Query(None, description="Поиск по названию или описанию"),
     status: Optional[str] = Query(None, description="Фильтр по статусу"),
     priority: Optional[str] = Query(None, description="Фильтр по приоритету"),
     responsible: Optional[str] = Query(None, description="Фильтр по ответственному"),
     overdue: Optional[bool] = Query(None, description="Только просроченные задания"),
-    sort_by: str = Query("created_date", description="Поле для сортировки"),
+    sort_by: str = Query("created_date", description="Поле для сортировки (relevance - по релевантности поиска)"),
     sort_order: str = Query("desc", description="Порядок сортировки (asc/desc)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    with_total: bool = Query(False, description="Вернуть общее количество заданий"),
+    fields: Optional[str] = Query(None, description="Поля ответа через запятую (по умолчанию все)"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Получить список заданий"""
-    query = db.query(Task).filter(Task.archived == archived)
+    """Получить список заданий (постранично)"""
+    try:
+        selected = parse_fields(fields, TASK_FIELDS)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,  # имя status занято параметром фильтра
+            detail=str(e)
+        )
     
-    # Поиск
-    if search:
-        query = query.filter(
-            (Task.name.contains(search)) |
-            (Task.description.contains(search)) |
-            (Task.number.contains(search)) |
-            (Task.responsible.contains(search))
+    data = TaskFilterData(
+        archived=archived, search=search, status=status, priority=priority,
+        responsible=responsible, overdue=overdue, sort_by=sort_by, sort_order=sort_order
+    )
+    params = dict(data.model_dump(), limit=limit, cursor=cursor, with_total=with_total, fields=selected)
+    # Архивные задания читаются из отдельной таблицы tasks_archive
+    return response_cache.respond(
+        "tasks", _task_tables(archived), params,
+        lambda: dumps(_tasks_page(db, TaskFilter(db, data), limit, cursor, with_total, selected)),
+        ttl=CLOCK_CACHE_TTL if overdue else None,
+        if_none_match=if_none_match
+    )
+
+def _task_model(archived: bool):
+    """Рабочая таблица или архив"""
+    return ArchivedTask if archived else Task
+
+def _task_tables(archived: bool) -> Tuple[str, ...]:
+    return ("tasks_archive",) if archived else ("tasks",)
+
+def _tasks_page(
+    db: Session, task_filter: TaskFilter, limit: int, cursor: Optional[str], with_total: bool,
+    fields: Tuple[str, ...] = TASK_FIELDS
+) -> dict:
+    """Страница списка заданий по собранному фильтру (общая для списка и сохраненных фильтров)"""
+    # Выбираются только колонки ответа - без создания ORM-объектов и моделей Pydantic;
+    # фильтр archived оставлен для составных индексов рабочей таблицы
+    model = task_filter.model
+    query = db.query(*columns_for(model, fields)).filter(model.archived == task_filter.archived)
+    query = task_filter.apply(query)
+    
+    # Общее количество считается только по запросу и кэшируется
+    total = None
+    if with_total:
+        count_key = (task_filter.key, response_cache.versions(_task_tables(task_filter.archived)))
+        total = task_count_cache.get(count_key)
+        if total is None:
+            total = query.order_by(None).count()
+            task_count_cache.set(count_key, total)
+    
+    # Сортировка по (колонка, id) - основа курсора
+    matches = task_filter.matches
+    sort_by, sort_order, column = task_filter.sort_by, task_filter.sort_order, task_filter.sort_column
+    descending = sort_order == "desc"
+    
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, sort_by, sort_order, column)
+        except CursorError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    
+    # Колонка сортировки нужна для курсора, даже если ее нет среди полей ответа;
+    # при сортировке по релевантности rank выбирается последней колонкой
+    if matches is not None:
+        query = query.add_columns(matches.c.rank)
+    elif sort_by not in fields:
+        query = query.add_columns(column)
+    
+    # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+    rows = fetch_page(query, column, model.id, descending, limit, after)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        last_value = last.rank if matches is not None else getattr(last, sort_by)
+        next_cursor = encode_cursor(sort_by, sort_order, last_value, last.id)
+    
+    # Словарь в формате TasksResponse
+    return {"tasks": rows_to_dicts(rows, fields), "total": total, "next_cursor": next_cursor}
+
+# МАССОВЫЕ ОПЕРАЦИИ
+# Объявлены до маршрутов /api/tasks/{task_id}, иначе "bulk-update" разбирается как id
+@app.put("/api/tasks/bulk-update")
+def bulk_update_tasks(bulk_update: TaskBulkUpdate, db: Session = Depends(get_db)):
+    """Массовое обновление заданий"""
+    if not bulk_update.task_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Не указаны ID заданий для обновления"
         )
     
-    # Фильтры
-    if status:
-        query = query.filter(Task.status == status)
-    if priority:
-        query = query.filter(Task.priority == priority)
-    if responsible:
-        query = query.filter(Task.responsible.contains(responsible))
-    
-    # Фильтр просроченных заданий
-    if overdue:
-        query = query.filter(
-            Task.due_date < datetime.now(),
-            Task.status != "готово"
+    update_data = bulk_update.dict(exclude={'task_ids'}, exclude_unset=True)
+    found, changes = update_tasks(db, bulk_update.task_ids, update_data)
+    if not found:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задания не найдены"
+        )
+    
+    db.commit()
+    
+    updated_count = len(changes)
+    return {
+        "message": f"Обновлено заданий: {updated_count}",
+        "updated_count": updated_count
+    }
+
+@app.post("/api/tasks/bulk-revert")
+def bulk_revert_changes(revert: TaskRevert, db: Session = Depends(get_db)):
+    """Откатить несколько записей истории (любых заданий) в одной транзакции"""
+    if not revert.history_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Не указаны записи истории для отката"
+        )
+    
+    try:
+        changes = revert_entries(db, revert.history_ids)
+    except RevisionError as e:
+        raise _revision_error(db, e)
+    db.commit()
+    
+    return {
+        "message": f"Изменено заданий: {len(changes)}",
+        "updated_count": len(changes),
+        "task_ids": [change["id"] for change in changes]
+    }
+
+@app.post("/api/tasks/bulk-restore")
+def bulk_restore_tasks(restore: TaskRestore, db: Session = Depends(get_db)):
+    """Вернуть поля заданий к состоянию на момент timestamp в одной транзакции"""
+    if not restore.task_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Не указаны ID заданий для восстановления"
+        )
+    
+    try:
+        changes = restore_tasks(db, restore.task_ids, restore.timestamp)
+    except RevisionError as e:
+        raise _revision_error(db, e)
+    db.commit()
+    
+    return {
+        "message": f"Восстановлено заданий: {len(changes)}",
+        "updated_count": len(changes),
+        "task_ids": [change["id"] for change in changes]
+    }
+
+@app.delete("/api/tasks/bulk-delete")
+def bulk_delete_tasks(task_ids: List[int], db: Session = Depends(get_db)):
+    """Массовое удаление заданий"""
+    if not task_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Не указаны ID заданий для удаления"
+        )
+    
+    deleted = delete_tasks(db, task_ids)
+    if not deleted:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задания не найдены"
         )
     
-    # Сортировка
-    if hasattr(Task, sort_by):
-        column = getattr(Task, sort_by)
-        if sort_order.lower() == "asc":
-            query = query.order_by(column.asc())
-        else:
-            query = query.order_by(column.desc())
+    db.commit()
     
-    return query.all()
+    return {
+        "message": f"Удалено заданий: {len(deleted)}",
+        "deleted_count": len(deleted),
+        "deleted_tasks": [row["name"] for row in deleted]
+    }
 
 @app.get("/api/tasks/{task_id}", response_model=TaskSchema)
-async def get_task(task_id: int, db: Session = Depends(get_db)):
+def get_task(task_id: int, if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
     """Получить задание по ID"""
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
+    def compute() -> bytes:
+        task = _find_task(db, task_id)
+        if not task:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Задание не найдено"
+            )
+        return TaskSchema.model_validate(task).model_dump_json().encode()
+    
+    return response_cache.respond(
+        "task", ("tasks", "tasks_archive"), {"id": task_id}, compute, if_none_match=if_none_match
+    )
+
+@app.get("/api/tasks/{task_id}/state", response_model=TaskSchema)
+def get_task_state(task_id: int, timestamp: datetime, db: Session = Depends(get_db)):
+    """Состояние задания на момент timestamp (восстанавливается по истории)"""
+    states = task_states(db, [task_id], timestamp) or task_states(db, [task_id], timestamp, archived=True)
+    if task_id not in states:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Задание не найдено"
+            detail="Задание не найдено или еще не было создано"
         )
-    return task
+    return states[task_id]
+
+def _find_task(db: Session, task_id: int):
+    """Задание из рабочей таблицы или из архива"""
+    return (
+        db.query(Task).filter(Task.id == task_id).first()
+        or db.query(ArchivedTask).filter(ArchivedTask.id == task_id).first()
+    )
+
+def _get_active_task(db: Session, task_id: int) -> Task:
+    """Задание для изменения; архивные задания только для чтения"""
+    task = db.query(Task).filter(Task.id == task_id).first()
+    if task:
+        return task
+    if db.query(ArchivedTask.id).filter(ArchivedTask.id == task_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Задание в архиве и не может быть изменено"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Задание не найдено"
+    )
 
 @app.post("/api/tasks", response_model=TaskSchema)
-async def create_task(task: TaskCreate, db: Session = Depends(get_db)):
+def create_task(task: TaskCreate, db: Session = Depends(get_db)):
     """Создать новое задание"""
-    # Проверяем уникальность номера
-    existing_task = db.query(Task).filter(Task.number == task.number).first()
+    # Проверяем уникальность номера (в том числе среди архивных)
+    existing_task = (
+        db.query(Task.id).filter(Task.number == task.number).first()
+        or db.query(ArchivedTask.id).filter(ArchivedTask.number == task.number).first()
+    )
     if existing_task:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -125,27 +405,27 @@ async def create_task(task: TaskCreate, db: Session = Depends(get_db)):
     
     db_task = Task(**task.dict())
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    db.flush()  # получаем id задания до коммита
     
-    # Логируем создание
+    delta = StatsDelta()
+    count_task(delta, db_task.status, db_task.priority)
+    apply_stats_delta(db, delta)
+    
+    # Логируем создание в той же транзакции (текст details собирается по шаблону действия)
     log_task_change(
         db, db_task.id, 
         "Создано", 
-        f"Создано новое задание '{task.name}'"
+        new_value=task.name
     )
     
+    db.commit()
+    db.refresh(db_task)
     return db_task
 
 @app.put("/api/tasks/{task_id}", response_model=TaskSchema)
-async def update_task(task_id: int, task_update: TaskUpdate, db: Session = Depends(get_db)):
+def update_task(task_id: int, task_update: TaskUpdate, db: Session = Depends(get_db)):
     """Обновить задание"""
-    db_task = db.query(Task).filter(Task.id == task_id).first()
-    if not db_task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Задание не найдено"
-        )
+    db_task = _get_active_task(db, task_id)
     
     # Сохраняем старые значения для логирования
     old_values = {
@@ -168,30 +448,36 @@ async def update_task(task_id: int, task_update: TaskUpdate, db: Session = Depen
         db_task.completed_date = datetime.now()
     
     db_task.updated_date = datetime.now()
-    db.commit()
-    db.refresh(db_task)
     
-    # Логируем изменения
+    # Изменяются только задания рабочей таблицы - все они учтены в счетчиках
+    delta = StatsDelta()
     for field, new_value in update_data.items():
-        old_value = old_values.get(field)
-        if old_value != new_value:
-            log_task_change(
-                db, task_id,
-                "Обновлено",
-                f"Поле '{field}' изменено: '{old_value}' → '{new_value}'",
-                field_name=field,
-                old_value=str(old_value) if old_value is not None else "",
-                new_value=str(new_value) if new_value is not None else "",
-                user="Пользователь",
-                can_revert=True
-            )
+        count_change(delta, field, old_values.get(field), new_value)
+    apply_stats_delta(db, delta)
+    
+    # Логируем изменения одним INSERT и фиксируем вместе с заданием
+    log_task_changes(db, [
+        {
+            "task_id": task_id,
+            "action": "Обновлено",
+            "field_name": field,
+            "old_value": str(old_values.get(field)) if old_values.get(field) is not None else "",
+            "new_value": str(new_value) if new_value is not None else "",
+            "user": "Пользователь",
+            "can_revert": True
+        }
+        for field, new_value in update_data.items()
+        if old_values.get(field) != new_value
+    ])
     
+    db.commit()
+    db.refresh(db_task)
     return db_task
 
 @app.delete("/api/tasks/{task_id}")
-async def delete_task(task_id: int, db: Session = Depends(get_db)):
+def delete_task(task_id: int, db: Session = Depends(get_db)):
     """Удалить задание"""
-    db_task = db.query(Task).filter(Task.id == task_id).first()
+    db_task = _find_task(db, task_id)
     if not db_task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -199,142 +485,166 @@ async def delete_task(task_id: int, db: Session = Depends(get_db)):
         )
     
     task_name = db_task.name
+    # Счетчики ведутся только по рабочей таблице
+    if isinstance(db_task, Task):
+        delta = StatsDelta()
+        count_task(delta, db_task.status, db_task.priority, -1)
+        apply_stats_delta(db, delta)
     db.delete(db_task)
     db.commit()
     
     return {"message": f"Задание '{task_name}' удалено"}
 
-# МАССОВЫЕ ОПЕРАЦИИ
-@app.put("/api/tasks/bulk-update")
-async def bulk_update_tasks(bulk_update: TaskBulkUpdate, db: Session = Depends(get_db)):
-    """Массовое обновление заданий"""
-    if not bulk_update.task_ids:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Не указаны ID заданий для обновления"
-        )
-    
-    # Получаем задания
-    tasks = db.query(Task).filter(Task.id.in_(bulk_update.task_ids)).all()
-    if not tasks:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Задания не найдены"
-        )
-    
-    updated_count = 0
-    update_data = bulk_update.dict(exclude={'task_ids'}, exclude_unset=True)
-    
-    for task in tasks:
-        old_values = {}
-        changes = []
-        
-        for field, new_value in update_data.items():
-            if hasattr(task, field):
-                old_value = getattr(task, field)
-                old_values[field] = old_value
-                
-                if old_value != new_value:
-                    setattr(task, field, new_value)
-                    changes.append(f"{field}: '{old_value}' → '{new_value}'")
-                    
-                    # Если статус изменился на "готово", устанавливаем дату завершения
-                    if field == "status" and new_value == "готово" and old_value != "готово":
-                        task.completed_date = datetime.now()
-        
-        if changes:
-            task.updated_date = datetime.now()
-            updated_count += 1
-            
-            # Логируем изменения
-            log_task_change(
-                db, task.id,
-                "Массовое обновление",
-                f"Изменения: {', '.join(changes)}",
-                user="Пользователь"
-            )
-    
+# СТАТИСТИКА И СЧЕТЧИКИ
+@app.get("/api/tasks-stats")
+def get_tasks_stats(if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    """Получить статистику по заданиям"""
+    return response_cache.respond(
+        "tasks-stats", ("tasks", "task_counters"), {},
+        lambda: json.dumps(task_stats(db), ensure_ascii=False).encode(),
+        ttl=CLOCK_CACHE_TTL,
+        if_none_match=if_none_match
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/slow-queries")
+def get_slow_queries():
+    """Последние медленные SQL-запросы с планом выполнения"""
+    return slow_query_log()
+
+@app.get("/api/cache-stats")
+def get_cache_stats():
+    """Метрики кэша ответов: попадания, промахи, размер"""
+    return response_cache.metrics()
+
+@app.post("/api/tasks-stats/rebuild")
+def rebuild_tasks_stats(db: Session = Depends(get_db)):
+    """Пересчитать счетчики статистики по таблице заданий (проверка согласованности)"""
+    begin_write(db)
+    drift = rebuild_task_stats(db)
     db.commit()
-    
     return {
-        "message": f"Обновлено заданий: {updated_count}",
-        "updated_count": updated_count
+        "consistent": not drift,
+        "drift": drift,
+        "stats": task_stats(db)
     }
 
-@app.delete("/api/tasks/bulk-delete")
-async def bulk_delete_tasks(task_ids: List[int], db: Session = Depends(get_db)):
-    """Массовое удаление заданий"""
-    if not task_ids:
+@app.post("/api/search/rebuild")
+def rebuild_search(db: Session = Depends(get_db)):
+    """Перестроить полнотекстовые индексы по таблицам заданий и приемки"""
+    begin_write(db)
+    rebuilt = rebuild_search_index(db.connection())
+    db.commit()
+    # Индексы пишутся в обход ORM - кэш ответов с поиском сбрасывается явно
+    response_cache.bump([SEARCH_INDEXES[name]["content"] for name in rebuilt])
+    return {"rebuilt": rebuilt}
+
+# ПОЛЬЗОВАТЕЛЬСКИЕ ФИЛЬТРЫ
+@app.get("/api/filters", response_model=List[UserFilterSchema])
+def get_user_filters(if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    """Получить пользовательские фильтры с количеством заданий по каждому"""
+    def load_filters() -> List[UserFilter]:
+        return db.query(UserFilter).order_by(UserFilter.created_date.desc()).all()
+    
+    def compute() -> bytes:
+        user_filters = load_filters()
+        # Количество по всем фильтрам - одним запросом на таблицу
+        counts = filter_counts(db, user_filters)
+        return dumps([
+            UserFilterSchema.model_validate(user_filter)
+            .model_copy(update={"task_count": counts.get(user_filter.id)})
+            .model_dump(mode="json")
+            for user_filter in user_filters
+        ])
+    
+    # Количество пересчитывается только после изменения заданий или фильтров
+    return response_cache.respond(
+        "filters", ("user_filters", "tasks", "tasks_archive"), {}, compute,
+        ttl=CLOCK_CACHE_TTL if _filters_use_clock(db, load_filters) else None,
+        if_none_match=if_none_match
+    )
+
+# Зависят ли сохраненные фильтры от текущего времени - по версии таблицы фильтров,
+# чтобы ключ кэша (и ответ 304) строился без запросов к базе
+_filters_clock: Dict[str, Tuple[Tuple[str, ...], bool]] = {}
+
+def _filters_use_clock(db: Session, load_filters: Callable[[], List[UserFilter]]) -> bool:
+    versions = response_cache.versions(("user_filters",))
+    known = _filters_clock.get("state")
+    if known is not None and known[0] == versions:
+        return known[1]
+    value = any(_filter_uses_clock(db, f) for f in load_filters())
+    _filters_clock["state"] = (versions, value)
+    return value
+
+def _filter_uses_clock(db: Session, user_filter: UserFilter) -> bool:
+    try:
+        return saved_filters.get(db, user_filter).depends_on_clock
+    except FilterError:
+        return False
+
+@app.get("/api/filters/{filter_id}/tasks", response_model=TasksResponse)
+def get_filter_tasks(
+    filter_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    with_total: bool = Query(False, description="Вернуть общее количество заданий"),
+    fields: Optional[str] = Query(None, description="Поля ответа через запятую (по умолчанию все)"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Задания по сохраненному фильтру (постранично, как GET /api/tasks)"""
+    try:
+        selected = parse_fields(fields, TASK_FIELDS)
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Не указаны ID заданий для удаления"
+            detail=str(e)
         )
     
-    tasks = db.query(Task).filter(Task.id.in_(task_ids)).all()
-    if not tasks:
+    db_filter = db.query(UserFilter).filter(UserFilter.id == filter_id).first()
+    if not db_filter:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Задания не найдены"
+            detail="Фильтр не найден"
         )
     
-    deleted_count = len(tasks)
-    task_names = [task.name for task in tasks]
-    
-    for task in tasks:
-        db.delete(task)
-    
-    db.commit()
-    
-    return {
-        "message": f"Удалено заданий: {deleted_count}",
-        "deleted_count": deleted_count,
-        "deleted_tasks": task_names
-    }
-
-# СТАТИСТИКА И СЧЕТЧИКИ
-@app.get("/api/tasks-stats")
-async def get_tasks_stats(db: Session = Depends(get_db)):
-    """Получить статистику по заданиям"""
-    from sqlalchemy import func
-    
-    # Общая статистика
-    total_tasks = db.query(Task).filter(Task.archived == False).count()
-    
-    # По статусам
-    status_stats = db.query(
-        Task.status,
-        func.count(Task.id).label('count')
-    ).filter(Task.archived == False).group_by(Task.status).all()
-    
-    # По приоритетам
-    priority_stats = db.query(
-        Task.priority,
-        func.count(Task.id).label('count')
-    ).filter(Task.archived == False).group_by(Task.priority).all()
-    
-    # Просроченные задания
-    overdue_count = db.query(Task).filter(
-        Task.archived == False,
-        Task.due_date < datetime.now(),
-        Task.status != "готово"
-    ).count()
+    # Фильтр проверяется и собирается один раз, затем берется из кэша
+    try:
+        task_filter = saved_filters.get(db, db_filter)
+    except FilterError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    return {
-        "total_tasks": total_tasks,
-        "overdue_count": overdue_count,
-        "status_stats": {stat.status: stat.count for stat in status_stats},
-        "priority_stats": {stat.priority: stat.count for stat in priority_stats}
-    }
-
-# ПОЛЬЗОВАТЕЛЬСКИЕ ФИЛЬТРЫ
-@app.get("/api/filters", response_model=List[UserFilterSchema])
-async def get_user_filters(db: Session = Depends(get_db)):
-    """Получить пользовательские фильтры"""
-    return db.query(UserFilter).order_by(UserFilter.created_date.desc()).all()
+    params = dict(
+        filter_id=filter_id, filter_data=db_filter.filter_data,
+        limit=limit, cursor=cursor, with_total=with_total, fields=selected
+    )
+    return response_cache.respond(
+        "filter-tasks", _task_tables(task_filter.archived), params,
+        lambda: dumps(_tasks_page(db, task_filter, limit, cursor, with_total, selected)),
+        ttl=CLOCK_CACHE_TTL if task_filter.depends_on_clock else None,
+        if_none_match=if_none_match
+    )
 
 @app.post("/api/filters", response_model=UserFilterSchema)
-async def create_user_filter(filter_data: UserFilterCreate, db: Session = Depends(get_db)):
+def create_user_filter(filter_data: UserFilterCreate, db: Session = Depends(get_db)):
     """Создать пользовательский фильтр"""
+    # Содержимое фильтра проверяется при сохранении
+    try:
+        parse_filter_data(filter_data.filter_data)
+    except FilterError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
     db_filter = UserFilter(**filter_data.dict())
     db.add(db_filter)
     db.commit()
@@ -342,7 +652,7 @@ async def create_user_filter(filter_data: UserFilterCreate, db: Session = Depend
     return db_filter
 
 @app.delete("/api/filters/{filter_id}")
-async def delete_user_filter(filter_id: int, db: Session = Depends(get_db)):
+def delete_user_filter(filter_id: int, db: Session = Depends(get_db)):
     """Удалить пользовательский фильтр"""
     db_filter = db.query(UserFilter).filter(UserFilter.id == filter_id).first()
     if not db_filter:
@@ -354,121 +664,333 @@ async def delete_user_filter(filter_id: int, db: Session = Depends(get_db)):
     filter_name = db_filter.name
     db.delete(db_filter)
     db.commit()
+    saved_filters.discard(filter_id)
     
     return {"message": f"Фильтр '{filter_name}' удален"}
 
 # ОТКАТ ИЗМЕНЕНИЙ
+def _revision_error(db: Session, error: RevisionError) -> HTTPException:
+    """Отмена транзакции отката и ответ с причиной"""
+    db.rollback()
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND if isinstance(error, RevisionNotFound) else status.HTTP_400_BAD_REQUEST,
+        detail=str(error)
+    )
+
 @app.post("/api/tasks/{task_id}/revert/{history_id}")
-async def revert_task_change(task_id: int, history_id: int, db: Session = Depends(get_db)):
+def revert_task_change(task_id: int, history_id: int, db: Session = Depends(get_db)):
     """Откатить изменение задания"""
-    # Проверяем существование задания
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Задание не найдено"
-        )
-    
-    # Проверяем существование записи истории
-    history = db.query(TaskHistory).filter(
-        TaskHistory.id == history_id,
-        TaskHistory.task_id == task_id,
-        TaskHistory.can_revert == True
-    ).first()
+    # Значение приводится к типу поля, откат записывается в историю
+    try:
+        changes = revert_entries(db, [history_id], task_id=task_id)
+    except RevisionError as e:
+        raise _revision_error(db, e)
+    db.commit()
     
-    if not history:
+    # Пустой список - поле уже имеет значение до изменения
+    reverted = changes[0]["new"] if changes else {}
+    return {
+        "message": "Изменение успешно отменено" if changes else "Значение поля не изменилось",
+        "reverted_field": next(iter(reverted), None),
+        "reverted_to": next((format_value(value) for value in reverted.values()), None)
+    }
+
+# ПРИЕМКА
+@app.get("/api/receptions", response_model=List[ReceptionSchema])
+def get_receptions(
+    search: Optional[str] = Query(None, description="Поиск"),
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    fields: Optional[str] = Query(None, description="Поля ответа через запятую (по умолчанию все)"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Получить список приемок"""
+    try:
+        selected = parse_fields(fields, RECEPTION_FIELDS)
+    except ValueError as e:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Запись истории не найдена или не может быть отменена"
+            status_code=400,  # имя status занято параметром фильтра
+            detail=str(e)
         )
     
-    # Откатываем изменение
-    if history.field_name and hasattr(task, history.field_name):
-        old_value = getattr(task, history.field_name)
-        setattr(task, history.field_name, history.old_value)
-        task.updated_date = datetime.now()
+    def compute() -> bytes:
+        query = db.query(*columns_for(Reception, selected)).order_by(Reception.date.desc())
         
-        # Логируем откат
-        log_task_change(
-            db, task_id,
-            "Откат изменения",
-            f"Откат поля '{history.field_name}': '{old_value}' → '{history.old_value}'",
-            field_name=history.field_name,
-            old_value=old_value,
-            new_value=history.old_value,
-            user="Пользователь"
-        )
+        # Поиск
+        if search:
+            query = query.filter(search_condition(db, Reception, search))
         
-        db.commit()
-        db.refresh(task)
+        # Фильтр по статусу
+        if status:
+            query = query.filter(Reception.status == status)
         
-        return {
-            "message": "Изменение успешно отменено",
-            "reverted_field": history.field_name,
-            "reverted_to": history.old_value
-        }
+        return dumps(rows_to_dicts(query.all(), selected))
     
-    raise HTTPException(
-        status_code=status.HTTP_400_BAD_REQUEST,
-        detail="Не удалось отменить изменение"
+    return response_cache.respond(
+        "receptions", ("reception",), {"search": search, "status": status, "fields": selected}, compute,
+        if_none_match=if_none_match
     )
 
-# ПРИЕМКА
-@app.get("/api/receptions", response_model=List[ReceptionSchema])
-async def get_receptions(
-    search: Optional[str] = Query(None, description="Поиск"),
+@app.get("/api/receptions/totals", response_model=List[ReceptionTotal])
+def get_reception_totals(
+    group_by: str = Query("designation", pattern="^(designation|name|order_number|status)$",
+                          description="Колонка группировки"),
     status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Получить список приемок"""
-    query = db.query(Reception).order_by(Reception.date.desc())
-    
-    # Поиск
-    if search:
-        query = query.filter(
-            (Reception.name.contains(search)) |
-            (Reception.order_number.contains(search)) |
-            (Reception.designation.contains(search)) |
-            (Reception.route_card_number.contains(search))
+    """Итоги приемки: количество записей и сумма количества по группе и единице"""
+    return response_cache.respond(
+        "reception-totals", ("reception",), {"group_by": group_by, "status": status},
+        lambda: dumps(reception_totals(db, group_by, status)),
+        if_none_match=if_none_match
+    )
+
+def _ingest_receptions(db: Session, items: List[ReceptionCreate]) -> Tuple[List[int], int]:
+    """Прием позиций одной транзакцией; гонка одинаковых ключей (PostgreSQL) - повтор"""
+    values = [item.model_dump() for item in items]
+    try:
+        ids, created = ingest_receptions(db, values)
+        db.commit()
+    except IntegrityError:
+        # Тот же ключ только что принят параллельным запросом - теперь он найдется
+        db.rollback()
+        ids, created = ingest_receptions(db, values)
+        db.commit()
+    return ids, created
+
+@app.post("/api/receptions", response_model=ReceptionSchema)
+def create_reception(reception: ReceptionCreate, db: Session = Depends(get_db)):
+    """Создать запись о приемке (повтор с тем же idempotency_key возвращает созданную запись)"""
+    ids, _ = _ingest_receptions(db, [reception])
+    return db.get(Reception, ids[0])
+
+@app.post("/api/receptions/batch", response_model=ReceptionBatchResult)
+def create_receptions_batch(batch: ReceptionBatch, db: Session = Depends(get_db)):
+    """Пакет сканов приемки одной транзакцией с защитой от повторов по idempotency_key"""
+    if len(batch.items) > RECEPTION_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Не больше {RECEPTION_BATCH_MAX} позиций в пакете"
+        )
+    ids, created = _ingest_receptions(db, batch.items)
+    return ReceptionBatchResult(
+        message=f"Принято позиций: {created}, повторов: {len(ids) - created}",
+        created_count=created,
+        duplicate_count=len(ids) - created,
+        ids=ids
+    )
+
+# СИНХРОНИЗАЦИЯ
+@app.get("/api/sync", response_model=SyncResponse)
+def sync_changes(
+    since: int = Query(0, ge=0, description="Номер последнего полученного изменения"),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Максимум изменений в ответе"),
+    db: Session = Depends(get_db)
+):
+    """Изменения заданий и приемки после номера since (upsert и удаления по порядку)"""
+    changes, next_since, has_more = changes_since(db, since, limit)
+    return SyncResponse(changes=changes, next_since=next_since, has_more=has_more)
+
+@app.get("/api/events")
+async def stream_events(
+    request: Request,
+    entity: Optional[str] = Query(None, description="task или reception"),
+    ids: Optional[str] = Query(None, description="ID записей через запятую"),
+    status: Optional[str] = Query(None, description="Только задания с этим статусом"),
+    responsible: Optional[str] = Query(None, description="Только задания ответственного"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """Поток изменений (Server-Sent Events); переподключение с Last-Event-ID досылает пропущенное"""
+    try:
+        id_filter = {int(value) for value in ids.split(",") if value.strip()} if ids else None
+    except ValueError:
+        raise HTTPException(
+            status_code=400,  # имя status занято параметром фильтра
+            detail="Некорректный список ID"
         )
+    event_filter = EventFilter(entity=entity, ids=id_filter, status=status, responsible=responsible)
+    subscriber = await to_thread.run_sync(event_hub.subscribe, event_filter, asyncio.get_running_loop())
     
-    # Фильтр по статусу
-    if status:
-        query = query.filter(Reception.status == status)
+    async def stream():
+        sent_seq = 0
+        try:
+            yield "retry: 3000\n\n"
+            if last_event_id is not None:
+                changes, sent_seq, complete = await to_thread.run_sync(event_hub.replay, last_event_id, event_filter)
+                for change in changes:
+                    yield format_event(change)
+                if not complete:
+                    # Пропущено слишком много - клиенту проще перезагрузить данные
+                    yield "event: resync\ndata: {}\n\n"
+            
+            while True:
+                try:
+                    change = await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if change is DROPPED:
+                    yield "event: dropped\ndata: {}\n\n"
+                    break
+                if change["seq"] <= sent_seq:
+                    continue
+                yield format_event(change)
+        finally:
+            event_hub.unsubscribe(subscriber)
     
-    return query.all()
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@app.post("/api/receptions", response_model=ReceptionSchema)
-async def create_reception(reception: ReceptionCreate, db: Session = Depends(get_db)):
-    """Создать запись о приемке"""
-    db_reception = Reception(**reception.dict())
-    db.add(db_reception)
-    db.commit()
-    db.refresh(db_reception)
-    return db_reception
+@app.get("/api/events/stats")
+def get_events_stats():
+    """Подписчики и счетчики рассылки изменений"""
+    return event_hub.stats()
 
-# ИСТОРИЯ
-@app.get("/api/tasks/{task_id}/history", response_model=List[TaskHistorySchema])
-async def get_task_history(task_id: int, db: Session = Depends(get_db)):
-    """Получить историю изменений задания"""
-    # Проверяем существование задания
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
+# ВЫГРУЗКА
+EXPORT_FORMAT_PATTERN = "^(" + "|".join(EXPORT_FORMATS) + ")$"
+
+def _export_fields(fields: Optional[str], allowed) -> Tuple[str, ...]:
+    try:
+        return parse_fields(fields, allowed)
+    except ValueError as e:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Задание не найдено"
+            status_code=400,  # имя status занято параметром фильтра
+            detail=str(e)
         )
+
+def _export_response(export_format: str, statements, fields, name: str) -> StreamingResponse:
+    filename = f"{name}-{datetime.now():%Y%m%d-%H%M%S}.{export_format}"
+    return StreamingResponse(
+        export_stream(export_format, statements, fields, name),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/api/export/tasks")
+def export_tasks(
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN, description="ndjson, csv или xlsx"),
+    archived: Optional[bool] = Query(None, description="true - только архив, false - только активные, по умолчанию все"),
+    search: Optional[str] = Query(None, description="Поиск по названию или описанию"),
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    priority: Optional[str] = Query(None, description="Фильтр по приоритету"),
+    responsible: Optional[str] = Query(None, description="Фильтр по ответственному"),
+    overdue: Optional[bool] = Query(None, description="Только просроченные задания"),
+    fields: Optional[str] = Query(None, description="Поля через запятую (по умолчанию все)"),
+    db: Session = Depends(get_db)
+):
+    """Потоковая выгрузка заданий с фильтрами списка"""
+    selected = _export_fields(fields, TASK_FIELDS)
+    # Без фильтра archived выгружаются рабочая таблица, затем архив
+    statements = []
+    for model in [Task, ArchivedTask] if archived is None else [_task_model(archived)]:
+        query = db.query(*columns_for(model, selected)).filter(
+            *task_conditions(db, model, search, status, priority, responsible, overdue)
+        )
+        statements.append(query.order_by(model.id).statement)
+    return _export_response(format, statements, selected, "tasks")
+
+@app.get("/api/export/receptions")
+def export_receptions(
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN, description="ndjson, csv или xlsx"),
+    search: Optional[str] = Query(None, description="Поиск"),
+    status: Optional[str] = Query(None, description="Фильтр по статусу"),
+    fields: Optional[str] = Query(None, description="Поля через запятую (по умолчанию все)"),
+    db: Session = Depends(get_db)
+):
+    """Потоковая выгрузка приемки"""
+    selected = _export_fields(fields, RECEPTION_FIELDS)
+    query = db.query(*columns_for(Reception, selected))
+    if search:
+        query = query.filter(search_condition(db, Reception, search))
+    if status:
+        query = query.filter(Reception.status == status)
+    return _export_response(format, [query.order_by(Reception.id).statement], selected, "receptions")
+
+@app.get("/api/export/history")
+def export_history(
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN, description="ndjson, csv или xlsx"),
+    task_id: Optional[int] = Query(None, description="Только история задания"),
+    fields: Optional[str] = Query(None, description="Поля через запятую (по умолчанию все)"),
+    db: Session = Depends(get_db)
+):
+    """Потоковая выгрузка истории изменений (рабочей и архивной)"""
+    selected = _export_fields(fields, HISTORY_FIELDS)
+    statements = []
+    for model in (TaskHistory, ArchivedTaskHistory):
+        statement = history_select(model, selected)
+        if task_id is not None:
+            statement = statement.where(model.task_id == task_id)
+        statements.append(statement.order_by(model.id))
+    return _export_response(format, statements, selected, "history")
+
+# ИСТОРИЯ
+@app.get("/api/tasks/{task_id}/history", response_model=HistoryResponse)
+def get_task_history(
+    task_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Получить историю изменений задания (постранично, сначала новые записи)"""
+    def compute() -> bytes:
+        # Проверяем существование задания; история архивного - в архивной таблице
+        task = _find_task(db, task_id)
+        if not task:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Задание не найдено"
+            )
+        
+        model = ArchivedTaskHistory if isinstance(task, ArchivedTask) else TaskHistory
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor, "timestamp", "desc", model.timestamp)
+            except CursorError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+        
+        # Действие, поле и пользователь - из словаря, details - по шаблону действия
+        columns, source = history_columns(model)
+        query = db.query(
+            *[columns[field].label(field) for field in HISTORY_FIELDS]
+        ).select_from(source).filter(model.task_id == task_id)
+        rows = fetch_page(query, model.timestamp, model.id, True, limit, after)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor("timestamp", "desc", rows[-1].timestamp, rows[-1].id)
+        
+        return dumps({"history": rows_to_dicts(rows, HISTORY_FIELDS), "next_cursor": next_cursor})
     
-    history = db.query(TaskHistory).filter(
-        TaskHistory.task_id == task_id
-    ).order_by(TaskHistory.timestamp.desc()).all()
-    
-    return history
+    return response_cache.respond(
+        "task-history", ("tasks", "task_history", "tasks_archive", "task_history_archive"),
+        {"id": task_id, "limit": limit, "cursor": cursor}, compute,
+        if_none_match=if_none_match
+    )
+
+@app.post("/api/history/compact")
+def compact_task_history():
+    """Сжать старые неоткатываемые записи истории сейчас (не дожидаясь планировщика)"""
+    removed = compact_history()
+    return {
+        "message": f"Удалено записей истории: {removed}",
+        "removed_count": removed
+    }
 
 # АРХИВАЦИЯ
 @app.post("/api/tasks/archive", response_model=ArchiveResponse)
-async def archive_tasks():
-    """Архивировать старые готовые задания"""
+def archive_tasks():
+    """Архивировать старые готовые задания сейчас (не дожидаясь планировщика)"""
     count = archive_old_tasks()
     return ArchiveResponse(
         archived_count=count,
@@ -476,85 +998,86 @@ async def archive_tasks():
     )
 
 # ИМПОРТ EXCEL
-@app.post("/api/tasks/import")
-async def import_tasks_excel(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """Импорт заданий из Excel файла"""
+def _import_job_schema(job) -> ImportJobSchema:
+    return ImportJobSchema(
+        id=job.id,
+        filename=job.filename,
+        status=job.status,
+        rows_parsed=job.rows_parsed,
+        rows_inserted=job.rows_inserted,
+        rows_failed=job.rows_failed,
+        error=job.error,
+        created_date=job.created_date,
+        finished_date=job.finished_date
+    )
+
+def _get_import_job(job_id: str):
+    job = import_jobs.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задача импорта не найдена"
+        )
+    return job
+
+@app.post("/api/tasks/import", response_model=ImportJobSchema, status_code=status.HTTP_202_ACCEPTED)
+def import_tasks_excel(file: UploadFile = File(...)):
+    """Поставить импорт заданий из Excel файла в очередь"""
     if not file.filename.endswith(('.xlsx', '.xls')):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Поддерживаются только Excel файлы (.xlsx, .xls)"
         )
     
-    try:
-        import pandas as pd
-        from io import BytesIO
-        
-        # Читаем Excel файл
-        contents = await file.read()
-        df = pd.read_excel(BytesIO(contents))
-        
-        # Ожидаемые колонки
-        required_columns = ['номер', 'наименование']
-        
-        # Проверяем наличие обязательных колонок
-        df_columns_lower = [col.lower() for col in df.columns]
-        missing_columns = [col for col in required_columns if col not in df_columns_lower]
-        
-        if missing_columns:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Отсутствуют обязательные колонки: {', '.join(missing_columns)}"
-            )
-        
-        created_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                # Создаем задание
-                task_data = {
-                    "number": str(row.get('номер', f"AUTO-{index}")),
-                    "name": str(row.get('наименование', '')),
-                    "description": str(row.get('описание', '')),
-                    "status": str(row.get('статус', 'в разработке'))
-                }
-                
-                # Проверяем уникальность номера
-                existing = db.query(Task).filter(Task.number == task_data["number"]).first()
-                if existing:
-                    errors.append(f"Строка {index + 2}: задание с номером '{task_data['number']}' уже существует")
-                    continue
-                
-                db_task = Task(**task_data)
-                db.add(db_task)
-                db.commit()
-                db.refresh(db_task)
-                
-                log_task_change(
-                    db, db_task.id,
-                    "Импортировано",
-                    f"Задание импортировано из Excel файла '{file.filename}'"
-                )
-                
-                created_count += 1
-                
-            except Exception as e:
-                errors.append(f"Строка {index + 2}: {str(e)}")
-                continue
-        
-        return {
-            "message": f"Импорт завершен",
-            "created": created_count,
-            "errors": errors
-        }
-        
-    except Exception as e:
+    # Файл загрузки живет только до конца запроса - копируем его для фоновой задачи
+    # (копирование блокирующее, поэтому обработчик синхронный и выполняется в пуле потоков)
+    fd, path = tempfile.mkstemp(prefix="import-", suffix=os.path.splitext(file.filename)[1])
+    with os.fdopen(fd, "wb") as target:
+        shutil.copyfileobj(file.file, target, UPLOAD_CHUNK_SIZE)
+    
+    job = import_jobs.submit(path, file.filename)
+    return _import_job_schema(job)
+
+@app.get("/api/import-jobs", response_model=List[ImportJobSchema])
+def get_import_jobs():
+    """Список задач импорта"""
+    return [_import_job_schema(job) for job in import_jobs.list()]
+
+@app.get("/api/import-jobs/{job_id}", response_model=ImportJobSchema)
+def get_import_job(job_id: str):
+    """Состояние и прогресс задачи импорта"""
+    return _import_job_schema(_get_import_job(job_id))
+
+@app.post("/api/import-jobs/{job_id}/cancel", response_model=ImportJobSchema)
+def cancel_import_job(job_id: str):
+    """Отменить задачу импорта"""
+    _get_import_job(job_id)
+    return _import_job_schema(import_jobs.cancel(job_id))
+
+@app.get("/api/import-jobs/{job_id}/report", response_model=ImportResult)
+def get_import_job_report(job_id: str):
+    """Итоговый отчет задачи импорта с ошибками по строкам"""
+    job = _get_import_job(job_id)
+    if job.status not in FINISHED_STATES:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка обработки файла: {str(e)}"
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Импорт еще выполняется"
         )
+    
+    messages = {
+        "completed": "Импорт завершен",
+        "cancelled": "Импорт отменен",
+        "failed": job.error or "Ошибка импорта",
+    }
+    return ImportResult(
+        message=messages[job.status],
+        created=job.rows_inserted,
+        failed=job.rows_failed,
+        errors=[ImportRowErrorSchema(**error) for error in json.loads(job.errors or "[]")]
+    )
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
@@ -0,0 +1,511 @@
+"""
+Встроенные метрики в формате Prometheus и журнал медленных запросов.
+
+Промежуточный слой ASGI измеряет время ответа по шаблону маршрута и коду
+статуса. События движка SQLAlchemy считают SQL-запросы, время в базе,
+коммиты и откаты - в целом и на каждый HTTP-запрос (счетчики запроса лежат
+в contextvar и видны в потоке обработчика), поэтому N+1 и коммит на каждую
+строку видны как большое число запросов или коммитов на один вызов.
+Запросы дольше SLOW_QUERY_MS попадают в журнал вместе с планом
+(EXPLAIN QUERY PLAN в SQLite, EXPLAIN в PostgreSQL).
+
+Накладные расходы - два вызова perf_counter на SQL-запрос и обновление
+счетчиков под общей блокировкой; план выполнения снимается только для
+медленных запросов. GET /metrics отдает текстовый формат Prometheus,
+GET /api/slow-queries - последние медленные запросы.
+Без внешних зависимостей (prometheus_client не нужен).
+
+При запуске нескольких процессов (server.py) счетчики и гистограммы у каждого
+процесса свои, поэтому процессы записывают снимки значений в общий каталог
+(SharedMetricsDir), а /metrics в любом процессе складывает снимки всех.
+Журнал медленных запросов остается у каждого процесса свой.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+# Метрики включены (0 - промежуточный слой и события движка не устанавливаются)
+METRICS_ENABLED = os.getenv("SKLAD_METRICS", "1") != "0"
+
+# Порог медленного запроса, мс
+SLOW_QUERY_MS = float(os.getenv("SKLAD_SLOW_QUERY_MS", "200"))
+
+# Сколько последних медленных запросов хранить
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SKLAD_SLOW_QUERY_LOG_SIZE", "100"))
+
+# Снимать план медленных запросов
+SLOW_QUERY_EXPLAIN = os.getenv("SKLAD_SLOW_QUERY_EXPLAIN", "1") != "0"
+
+# Границы корзин гистограмм
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000)
+
+# Длина текста запроса в журнале медленных
+MAX_STATEMENT_LENGTH = 2000
+
+# Как часто рабочий процесс записывает свои метрики в общий каталог, с
+METRICS_FLUSH_INTERVAL = float(os.getenv("SKLAD_METRICS_FLUSH_INTERVAL", "5"))
+
+
+class Counter:
+    """Счетчик с метками"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def export(self) -> list:
+        return [[list(labels), value] for labels, value in self._values.items()]
+
+    def combine(self, exports: Iterable[list]) -> Dict[Tuple[str, ...], float]:
+        """Сумма снимков export() нескольких процессов"""
+        values: Dict[Tuple[str, ...], float] = {}
+        for exported in exports:
+            for labels, value in exported:
+                key = tuple(labels)
+                values[key] = values.get(key, 0) + value
+        return values
+
+    def samples(self, values: Optional[Dict] = None) -> Iterable[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        for labels, value in sorted((self._values if values is None else values).items()):
+            yield self.name, tuple(zip(self.labels, labels)), value
+
+
+class Histogram:
+    """Гистограмма с накопительными корзинами (как в Prometheus)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()):
+        item = self._values.get(labels)
+        if item is None:
+            # Счетчики корзин (последняя - +Inf), сумма
+            item = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        item[0][bisect_left(self.buckets, value)] += 1
+        item[1] += value
+
+    def export(self) -> list:
+        return [[list(labels), [list(counts), total]] for labels, (counts, total) in self._values.items()]
+
+    def combine(self, exports: Iterable[list]) -> Dict[Tuple[str, ...], List]:
+        """Сумма снимков export() нескольких процессов по корзинам"""
+        values: Dict[Tuple[str, ...], List] = {}
+        for exported in exports:
+            for labels, (counts, total) in exported:
+                item = values.setdefault(tuple(labels), [[0] * (len(self.buckets) + 1), 0.0])
+                item[0] = [left + right for left, right in zip(item[0], counts)]
+                item[1] += total
+        return values
+
+    def samples(self, values: Optional[Dict] = None) -> Iterable[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        for labels, (counts, total) in sorted((self._values if values is None else values).items()):
+            pairs = tuple(zip(self.labels, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_number(bound)
+                yield f"{self.name}_bucket", pairs + (("le", le),), cumulative
+            yield f"{self.name}_sum", pairs, total
+            yield f"{self.name}_count", pairs, cumulative
+
+
+def _format_number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class SharedMetricsDir:
+    """
+    Снимки метрик рабочих процессов в общем каталоге: файл <pid>.json на процесс.
+    Файл заменяется целиком (os.replace), поэтому читатель не видит его
+    наполовину записанным. Файлы завершившихся процессов остаются, чтобы
+    сумма счетчиков не уменьшалась после перезапуска процесса; из них
+    удаляются только текущие значения (gauge) вроде состояния пула.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, pid: int) -> Path:
+        return self.directory / f"{pid}.json"
+
+    def _save(self, path: Path, snapshot: Dict[str, Any]):
+        temp = path.with_suffix(".tmp")
+        temp.write_text(json.dumps(snapshot, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp, path)
+
+    def clear(self):
+        """Удалить снимки прошлого запуска"""
+        for path in list(self.directory.glob("*.json")) + list(self.directory.glob("*.tmp")):
+            path.unlink(missing_ok=True)
+
+    def write(self, snapshot: Dict[str, Any]):
+        self._save(self._path(os.getpid()), snapshot)
+
+    def read(self) -> List[Dict[str, Any]]:
+        snapshots = []
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                # Файл удален между glob и чтением
+                continue
+        return snapshots
+
+    def mark_dead(self, pid: int):
+        """Процесс завершился: счетчики остаются в сумме, текущие значения - нет"""
+        path = self._path(pid)
+        try:
+            snapshot = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        snapshot["gauges"] = []
+        self._save(path, snapshot)
+
+
+class Registry:
+    """Набор метрик и вывод в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._metrics: List[Any] = []
+        self._collectors: List[Any] = []
+        # Общий каталог метрик процессов (share); None - метрики только этого процесса
+        self.shared: Optional[SharedMetricsDir] = None
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        """Функция, возвращающая [(имя, тип, описание, [(метки, значение)])] в момент выдачи"""
+        self._collectors.append(collect)
+        return collect
+
+    def share(self, directory: str):
+        """
+        Складывать метрики процессов через общий каталог (до fork рабочих процессов).
+        Значения главного процесса обнуляются, иначе каждый процесс унаследует их.
+        """
+        shared = SharedMetricsDir(directory)
+        shared.clear()
+        with self.lock:
+            for metric in self._metrics:
+                metric._values.clear()
+            self.shared = shared
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Значения этого процесса в виде, пригодном для JSON"""
+        with self.lock:
+            metrics = {metric.name: metric.export() for metric in self._metrics}
+        gauges = [
+            [name, kind, help_text, [[[list(pair) for pair in labels], value] for labels, value in values]]
+            for collect in self._collectors
+            for name, kind, help_text, values in collect()
+        ]
+        return {"metrics": metrics, "gauges": gauges}
+
+    def flush(self):
+        """Записать снимок процесса в общий каталог"""
+        if self.shared is None:
+            return
+        try:
+            self.shared.write(self.snapshot())
+        except OSError as e:
+            print(f"⚠️ Не удалось записать метрики процесса: {e}")
+
+    def _local_families(self) -> list:
+        with self.lock:
+            families = [
+                (metric.name, metric.kind, metric.help_text, list(metric.samples()))
+                for metric in self._metrics
+            ]
+        for collect in self._collectors:
+            for name, kind, help_text, values in collect():
+                families.append((name, kind, help_text, [(name, labels, value) for labels, value in values]))
+        return families
+
+    def _shared_families(self) -> list:
+        """Сумма снимков всех процессов; свой снимок записывается перед чтением"""
+        self.flush()
+        snapshots = self.shared.read()
+        families = []
+        for metric in self._metrics:
+            values = metric.combine(snapshot["metrics"].get(metric.name, []) for snapshot in snapshots)
+            families.append((metric.name, metric.kind, metric.help_text, list(metric.samples(values))))
+
+        gauges: Dict[str, Tuple[str, str, Dict]] = {}
+        for snapshot in snapshots:
+            for name, kind, help_text, values in snapshot["gauges"]:
+                summed = gauges.setdefault(name, (kind, help_text, {}))[2]
+                for labels, value in values:
+                    key = tuple(tuple(pair) for pair in labels)
+                    summed[key] = summed.get(key, 0) + value
+        for name, (kind, help_text, values) in gauges.items():
+            families.append((name, kind, help_text, [(name, labels, value) for labels, value in values.items()]))
+        return families
+
+    def render(self) -> str:
+        lines = []
+        families = self._local_families() if self.shared is None else self._shared_families()
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample, labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(str(label))}"' for key, label in labels)
+                lines.append(f"{sample}{{{label_text}}} {_format_number(value)}" if label_text
+                             else f"{sample} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_duration = registry.histogram(
+    "sklad_http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route", "status")
+)
+request_statements = registry.histogram(
+    "sklad_db_statements_per_request", "SQL-запросов на HTTP-запрос", ("route",), STATEMENT_BUCKETS
+)
+request_commits = registry.histogram(
+    "sklad_db_commits_per_request", "Коммитов на HTTP-запрос", ("route",), STATEMENT_BUCKETS
+)
+request_db_time = registry.histogram(
+    "sklad_db_time_per_request_seconds", "Время в базе на HTTP-запрос", ("route",)
+)
+statements_total = registry.counter(
+    "sklad_db_statements_total", "Выполнено SQL-запросов", ("operation",)
+)
+statement_seconds = registry.counter(
+    "sklad_db_statement_seconds_total", "Суммарное время SQL-запросов", ("operation",)
+)
+commits_total = registry.counter(
+    "sklad_db_commits_total", "Коммиты транзакций (каждый - запись журнала на диск)"
+)
+rollbacks_total = registry.counter("sklad_db_rollbacks_total", "Откаты транзакций")
+slow_queries_total = registry.counter("sklad_db_slow_queries_total", "Запросы дольше порога SKLAD_SLOW_QUERY_MS")
+pool_checkouts_total = registry.counter("sklad_db_pool_checkouts_total", "Выдачи соединений из пула")
+pool_connects_total = registry.counter("sklad_db_pool_connects_total", "Новые соединения с базой")
+
+
+def start_flush_thread(interval: float = METRICS_FLUSH_INTERVAL):
+    """Рабочий процесс: периодически записывать свои метрики в общий каталог"""
+    if registry.shared is None or interval <= 0:
+        return
+
+    def run():
+        while True:
+            time.sleep(interval)
+            registry.flush()
+
+    threading.Thread(target=run, name="metrics-flush", daemon=True).start()
+
+
+class RequestStats:
+    """Счетчики базы в рамках одного HTTP-запроса"""
+
+    __slots__ = ("statements", "commits", "db_time", "route")
+
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+        self.db_time = 0.0
+        self.route = ""
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("sklad_request_stats", default=None)
+
+slow_queries: "deque[Dict[str, Any]]" = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    return word if word in ("select", "insert", "update", "delete", "with") else "other"
+
+
+def _explain(conn, statement: str, parameters, executemany: bool) -> Optional[List[str]]:
+    """План медленного запроса тем же соединением (мимо событий движка)"""
+    if executemany or _operation(statement) in ("other", "insert"):
+        return None
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif dialect == "postgresql":
+        prefix = "EXPLAIN "
+    else:
+        return None
+    try:
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    except Exception as e:
+        return [f"план недоступен: {e}"]
+    # SQLite: (id, parent, notused, detail); PostgreSQL: (строка плана,)
+    return [str(row[-1]) for row in rows]
+
+
+def install_sql_metrics(engine):
+    """События движка: время и количество запросов, коммиты, пул, медленные запросы"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        operation = _operation(statement)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_time += elapsed
+        with registry.lock:
+            statements_total.inc((operation,))
+            statement_seconds.inc((operation,), elapsed)
+
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            entry = {
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "duration_ms": round(elapsed * 1000, 1),
+                "route": stats.route if stats is not None else "",
+                "statement": statement[:MAX_STATEMENT_LENGTH],
+                "parameters": repr(parameters)[:MAX_STATEMENT_LENGTH],
+                "plan": _explain(conn, statement, parameters, executemany) if SLOW_QUERY_EXPLAIN else None,
+            }
+            with registry.lock:
+                slow_queries_total.inc()
+                slow_queries.append(entry)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    @event.listens_for(engine, "commit")
+    def _commit(conn):
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.commits += 1
+        with registry.lock:
+            commits_total.inc()
+
+    @event.listens_for(engine, "rollback")
+    def _rollback(conn):
+        with registry.lock:
+            rollbacks_total.inc()
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        with registry.lock:
+            pool_checkouts_total.inc()
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        with registry.lock:
+            pool_connects_total.inc()
+
+    @registry.collector
+    def _pool_state():
+        pool = engine.pool
+        values = []
+        for name, help_text, read in (
+            ("sklad_db_pool_size", "Размер пула соединений", lambda: pool.size()),
+            ("sklad_db_pool_checked_out", "Соединения, выданные из пула", lambda: pool.checkedout()),
+            ("sklad_db_pool_checked_in", "Свободные соединения в пуле", lambda: pool.checkedin()),
+            # QueuePool считает overflow от -pool_size, пока пул не заполнен
+            ("sklad_db_pool_overflow", "Соединения сверх размера пула", lambda: max(pool.overflow(), 0)),
+        ):
+            try:
+                values.append((name, "gauge", help_text, [((), read())]))
+            except AttributeError:
+                # У StaticPool/NullPool части счетчиков нет
+                continue
+        return values
+
+
+class MetricsMiddleware:
+    """ASGI-слой: время ответа и счетчики базы по маршруту и статусу"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                stats.route = _route(scope)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            # Шаблон маршрута (/api/tasks/{task_id}), чтобы число рядов не росло с id
+            route = stats.route or _route(scope)
+            with registry.lock:
+                http_duration.observe(elapsed, (scope["method"], route, str(status_code)))
+                request_statements.observe(stats.statements, (route,))
+                request_commits.observe(stats.commits, (route,))
+                request_db_time.observe(stats.db_time, (route,))
+
+
+def _route(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def slow_query_log() -> List[Dict[str, Any]]:
+    """Медленные запросы, новые сначала"""
+    with registry.lock:
+        return list(reversed(slow_queries))
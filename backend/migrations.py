@@ -0,0 +1,553 @@
+"""
+Версионные миграции схемы базы данных.
+
+Каждая миграция выполняется в отдельной транзакции и записывается в таблицу
+schema_migrations, поэтому при старте применяются только недостающие шаги.
+Шаги пишутся идемпотентно (checkfirst), чтобы базы, созданные старой версией
+через create_all, проходили миграции без ошибок.
+
+Примененная миграция не меняется. Таблицы описаны внутри миграций такими,
+какими они были на момент шага, а не по текущим моделям: новая база и база
+старой версии проходят одни и те же шаги, а изменение модели оформляется
+новой миграцией. По той же причине данные переносятся копией логики той
+версии (шаблоны истории, подсчет счетчиков, разбор количества), а не вызовами
+текущих модулей.
+"""
+
+import re
+import string
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, Index, Integer, MetaData, Numeric, String, Table, Text,
+    delete, func, insert, inspect, literal, select
+)
+from sqlalchemy.schema import CreateTable
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_date", DateTime, default=datetime.now),
+)
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = []
+
+
+def migration(version: int, description: str):
+    """Регистрация шага миграции"""
+    def decorator(upgrade: Callable):
+        MIGRATIONS.append((version, description, upgrade))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return upgrade
+    return decorator
+
+
+def create_indexes(conn, table_name: str, indexes: Dict[str, Sequence[str]]):
+    """Создание индексов по описанию {имя: колонки} (если их еще нет)"""
+    table = Table(table_name, MetaData(), autoload_with=conn)
+    for name, columns in indexes.items():
+        Index(name, *[table.c[column] for column in columns]).create(conn, checkfirst=True)
+
+
+def drop_indexes(conn, names: Sequence[str]):
+    """Удаление индексов по именам (если они есть)"""
+    for name in names:
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+
+def replace_table(conn, table, fill: Callable):
+    """
+    Замена таблицы версией по описанию table: рядом создается новая
+    таблица, fill(новая_таблица) переносит в нее строки, старая удаляется, а
+    новая получает ее имя. Индексы из описания создаются заново; триггеры
+    удаляются вместе со старой таблицей.
+    """
+    rebuilt = table.to_metadata(MetaData(), name=f"{table.name}_new")
+    conn.execute(CreateTable(rebuilt))
+    fill(rebuilt)
+    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+    conn.exec_driver_sql(f"ALTER TABLE {rebuilt.name} RENAME TO {table.name}")
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+    if conn.dialect.name == "postgresql":
+        # Последовательность id продолжает перенесенные значения
+        conn.exec_driver_sql(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+            f"FROM {table.name}"
+        )
+
+
+def rebuild_sqlite_table(conn, table):
+    """
+    Пересоздание таблицы SQLite по описанию table с переносом строк
+    (ALTER TABLE в SQLite не меняет определение первичного ключа).
+    """
+    columns = ", ".join(column.name for column in table.columns)
+    replace_table(conn, table, lambda rebuilt: conn.exec_driver_sql(
+        f"INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {table.name}"
+    ))
+
+
+# Описания таблиц на момент миграций
+
+def _task_columns() -> List[Column]:
+    """Колонки задания (рабочая таблица и архив, с миграции 1)"""
+    return [
+        Column("id", Integer, primary_key=True, index=True),
+        Column("number", String, unique=True, nullable=False),
+        Column("name", String, nullable=False),
+        Column("description", Text),
+        Column("status", String),
+        Column("priority", String),
+        Column("responsible", String),
+        Column("due_date", DateTime),
+        Column("attachments", Text),
+        Column("created_date", DateTime),
+        Column("updated_date", DateTime),
+        Column("completed_date", DateTime),
+        Column("archived", Boolean),
+    ]
+
+
+def _reception_columns() -> List[Column]:
+    """Колонки приемки до миграции 9 (количество - строка)"""
+    return [
+        Column("id", Integer, primary_key=True, index=True),
+        Column("date", DateTime),
+        Column("order_number", String, nullable=False),
+        Column("designation", String, nullable=False),
+        Column("name", String, nullable=False),
+        Column("quantity", String, nullable=False),
+        Column("route_card_number", String, nullable=False),
+        Column("status", String),
+        Column("created_date", DateTime),
+    ]
+
+
+def _legacy_history_table(name: str, metadata: MetaData = None) -> Table:
+    """Таблица истории в формате до миграции 7 (строки действия, поля, пользователя)"""
+    return Table(
+        name, metadata if metadata is not None else MetaData(),
+        Column("id", Integer, primary_key=True, index=True),
+        Column("task_id", Integer, nullable=False),
+        Column("action", String, nullable=False),
+        Column("details", Text, nullable=False),
+        Column("old_value", Text),
+        Column("new_value", Text),
+        Column("field_name", String),
+        Column("user", String),
+        Column("timestamp", DateTime),
+        Column("can_revert", Boolean),
+    )
+
+
+def _compact_history_table(name: str) -> Table:
+    """Таблица истории в компактном формате миграции 7 (см. history.py)"""
+    table = Table(
+        name, MetaData(),
+        Column("id", Integer, primary_key=True, index=True),
+        Column("task_id", Integer, nullable=False),
+        Column("action_id", Integer, nullable=False),
+        Column("field_id", Integer),
+        Column("user_id", Integer),
+        Column("old_value", Text),
+        Column("new_value", Text),
+        Column("details", Text),
+        Column("timestamp", DateTime),
+        Column("can_revert", Boolean),
+    )
+    Index(f"ix_{name}_task_timestamp", table.c.task_id, table.c.timestamp)
+    return table
+
+
+def _history_terms_table() -> Table:
+    return Table(
+        "history_terms", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("value", String, nullable=False, unique=True),
+    )
+
+
+# Строк истории в одной пачке при переводе в компактный формат
+HISTORY_UPGRADE_BATCH_SIZE = 5000
+
+# Шаблоны details на момент миграции 7 (копия history.HISTORY_TEMPLATES той версии)
+UPGRADE_HISTORY_TEMPLATES = {
+    "Создано": "Создано новое задание '{new}'",
+    "Обновлено": "Поле '{field}' изменено: '{old}' → '{new}'",
+    "Откат изменения": "Откат поля '{field}': '{old}' → '{new}'",
+    "Массовое обновление": "Изменения: {field}: '{old}' → '{new}'",
+    "Импортировано": "Задание импортировано из Excel файла '{new}'",
+    "Архивирован": "Автоматическое архивирование задания '{new}'",
+}
+
+
+def _template_pattern(template: str):
+    parts = []
+    for text, name, _, _ in string.Formatter().parse(template):
+        parts.append(re.escape(text))
+        if name:
+            parts.append(f"(?P<{name}>.*)")
+    return re.compile("^" + "".join(parts) + "$", re.DOTALL)
+
+
+UPGRADE_HISTORY_PATTERNS = {
+    action: _template_pattern(template) for action, template in UPGRADE_HISTORY_TEMPLATES.items()
+}
+
+
+def _render_details(action: str, field_name: Optional[str], old_value: Optional[str],
+                    new_value: Optional[str]) -> str:
+    template = UPGRADE_HISTORY_TEMPLATES.get(action)
+    if template is None:
+        return ""
+    return template.format(field=field_name or "", old=old_value or "", new=new_value or "")
+
+
+def _compact_details(action: str, field_name: Optional[str], old_value: Optional[str],
+                     new_value: Optional[str], details: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(new_value, details) записи в компактном формате; {new} старых записей извлекается из текста"""
+    if not details or details == _render_details(action, field_name, old_value, new_value):
+        return new_value, None
+    pattern = UPGRADE_HISTORY_PATTERNS.get(action)
+    match = pattern.match(details) if pattern else None
+    if match is None:
+        return new_value, details
+    parsed = match.groupdict()
+    if "new" in parsed and new_value is None:
+        new_value = parsed["new"] or None
+    if details == _render_details(action, field_name, old_value, new_value):
+        return new_value, None
+    return new_value, details
+
+
+def _term_ids(conn, terms, values: Iterable[Optional[str]]) -> Dict[str, int]:
+    """id значений словаря history_terms; недостающие добавляются"""
+    wanted = {value for value in values if value}
+    if not wanted:
+        return {}
+    found = dict(conn.execute(select(terms.c.value, terms.c.id).where(terms.c.value.in_(wanted))).all())
+    new = wanted - set(found)
+    if new:
+        conn.execute(insert(terms), [{"value": value} for value in sorted(new)])
+        found.update(conn.execute(select(terms.c.value, terms.c.id).where(terms.c.value.in_(new))).all())
+    return found
+
+
+def upgrade_history_table(conn, name: str):
+    """Перевод таблицы истории в компактный формат, если она еще в старом"""
+    terms_table = _history_terms_table()
+    terms_table.create(conn, checkfirst=True)
+    if "action_id" in {column["name"] for column in inspect(conn).get_columns(name)}:
+        return
+    legacy = _legacy_history_table(name)
+
+    def fill(rebuilt):
+        result = conn.execute(select(legacy).execution_options(yield_per=HISTORY_UPGRADE_BATCH_SIZE))
+        for rows in result.partitions():
+            terms = _term_ids(
+                conn, terms_table, [value for row in rows for value in (row.action, row.field_name, row.user)]
+            )
+            batch = []
+            for row in rows:
+                old_value = row.old_value or None
+                new_value, details = _compact_details(
+                    row.action, row.field_name or None, old_value, row.new_value or None, row.details
+                )
+                batch.append({
+                    "id": row.id,
+                    "task_id": row.task_id,
+                    "action_id": terms[row.action],
+                    "field_id": terms.get(row.field_name),
+                    "user_id": terms.get(row.user),
+                    "old_value": old_value,
+                    "new_value": new_value,
+                    "details": details,
+                    "timestamp": row.timestamp,
+                    "can_revert": row.can_revert,
+                })
+            conn.execute(insert(rebuilt), batch)
+
+    replace_table(conn, _compact_history_table(name), fill)
+
+
+# Индексы, добавленные миграцией 2: таблица -> {имя: колонки} (используется и бенчмарком)
+COMPOSITE_INDEXES = {
+    "tasks": {
+        "ix_tasks_archived_created": ("archived", "created_date"),
+        "ix_tasks_archived_status_created": ("archived", "status", "created_date"),
+        "ix_tasks_archived_priority_created": ("archived", "priority", "created_date"),
+        "ix_tasks_archived_due_status": ("archived", "due_date", "status"),
+    },
+    "task_history": {"ix_task_history_task_timestamp": ("task_id", "timestamp")},
+    "reception": {
+        "ix_reception_date": ("date",),
+        "ix_reception_status_date": ("status", "date"),
+    },
+}
+
+
+@migration(1, "Базовая схема")
+def _base_schema(conn):
+    metadata = MetaData()
+    Table("tasks", metadata, *_task_columns())
+    Table("reception", metadata, *_reception_columns())
+    _legacy_history_table("task_history", metadata)
+    Table(
+        "user_filters", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("name", String, nullable=False),
+        Column("filter_data", Text, nullable=False),
+        Column("user", String),
+        Column("created_date", DateTime),
+    )
+    metadata.create_all(bind=conn)
+
+
+@migration(2, "Составные индексы для списков заданий, истории и приемки")
+def _composite_indexes(conn):
+    for table_name, indexes in COMPOSITE_INDEXES.items():
+        create_indexes(conn, table_name, indexes)
+
+
+@migration(3, "Полнотекстовый индекс FTS5 для заданий и приемки")
+def _search_index(conn):
+    from search import install_search_index
+    install_search_index(conn)
+
+
+@migration(4, "Счетчики статистики заданий")
+def _task_counters(conn):
+    counters = Table(
+        "task_counters", MetaData(),
+        Column("kind", String, primary_key=True),
+        Column("key", String, primary_key=True),
+        Column("count", Integer, nullable=False),
+    )
+    counters.create(conn, checkfirst=True)
+    # Заполнение по активным заданиям; пустой статус или приоритет - ключ ""
+    tasks = Table("tasks", MetaData(), *_task_columns())
+    conn.execute(delete(counters))
+    for kind in ("status", "priority"):
+        key = func.coalesce(tasks.c[kind], "")
+        conn.execute(insert(counters).from_select(
+            ["kind", "key", "count"],
+            select(literal(kind), key, func.count()).where(tasks.c.archived == False).group_by(key)
+        ))
+
+
+@migration(5, "Журнал изменений для дельта-синхронизации")
+def _change_log(conn):
+    from sync import install_change_log
+    Table(
+        "change_log", MetaData(),
+        Column("seq", Integer, primary_key=True, autoincrement=True),
+        Column("entity", String, nullable=False),
+        Column("entity_id", Integer, nullable=False),
+        Column("op", String, nullable=False),
+        Column("changed_at", DateTime),
+        Index("ix_change_log_entity", "entity", "entity_id"),
+        sqlite_autoincrement=True,
+    ).create(conn, checkfirst=True)
+    install_change_log(conn)
+
+
+@migration(6, "Архивные таблицы заданий и истории")
+def _task_archive(conn):
+    from search import install_search_index
+    from sync import install_change_log
+    metadata = MetaData()
+    tasks = Table(
+        "tasks", metadata, *_task_columns(),
+        *[Index(name, *columns) for name, columns in COMPOSITE_INDEXES["tasks"].items()],
+        sqlite_autoincrement=True,
+    )
+    history = _legacy_history_table("task_history", metadata)
+    tasks_archive = Table(
+        "tasks_archive", metadata,
+        Column("archived_date", DateTime),
+        *_task_columns(),
+        Index("ix_tasks_archive_created", "created_date"),
+        Index("ix_tasks_archive_status_created", "status", "created_date"),
+    )
+    history_archive = _legacy_history_table("task_history_archive", metadata)
+    Index("ix_task_history_archive_task_timestamp", history_archive.c.task_id, history_archive.c.timestamp)
+    for table in (tasks_archive, history_archive):
+        table.create(conn, checkfirst=True)
+
+    if conn.dialect.name == "sqlite":
+        # id перенесенных в архив заданий не должны выдаваться новым заданиям
+        table_sql = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tasks'"
+        ).scalar()
+        if "AUTOINCREMENT" not in table_sql.upper():
+            rebuild_sqlite_table(conn, tasks)
+        # Триггер удаления теперь отличает перенос в архив от удаления
+        conn.exec_driver_sql("DROP TRIGGER IF EXISTS tasks_change_log_ad")
+    install_search_index(conn)
+    install_change_log(conn)
+
+    # Задания, архивированные до появления архивных таблиц: сначала вставка
+    # в архив, затем удаление (так триггер журнала видит перенос, а не удаление)
+    archived_ids = select(tasks.c.id).where(tasks.c.archived == True)
+    task_columns = [column.name for column in tasks.columns if column.name != "archived"]
+    conn.execute(insert(tasks_archive).from_select(
+        task_columns + ["archived", "archived_date"],
+        select(*[tasks.c[name] for name in task_columns], literal(True), literal(datetime.now()))
+        .where(tasks.c.archived == True)
+    ))
+    conn.execute(insert(history_archive).from_select(
+        [column.name for column in history.columns],
+        select(history).where(history.c.task_id.in_(archived_ids))
+    ))
+    conn.execute(delete(history).where(history.c.task_id.in_(archived_ids)))
+    conn.execute(delete(tasks).where(tasks.c.archived == True))
+
+
+@migration(7, "Компактная история изменений (словарь history_terms)")
+def _compact_history(conn):
+    for name in ("task_history", "task_history_archive"):
+        upgrade_history_table(conn, name)
+
+
+@migration(8, "Снимки заданий для восстановления на момент времени")
+def _task_snapshots(conn):
+    Table(
+        "task_snapshots", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("task_id", Integer, nullable=False),
+        Column("history_id", Integer, nullable=False),
+        Column("timestamp", DateTime, nullable=False),
+        Column("data", Text, nullable=False),
+        Index("ix_task_snapshots_task_history", "task_id", "history_id"),
+    ).create(conn, checkfirst=True)
+
+
+# Строк приемки в одной пачке при переводе количества в число
+RECEPTION_UPGRADE_BATCH_SIZE = 5000
+
+# Разбор количества на момент миграции 9 (копия receptions.parse_quantity той версии)
+UPGRADE_DEFAULT_UNIT = "шт."
+UPGRADE_UNIT_ALIASES = {
+    "": UPGRADE_DEFAULT_UNIT,
+    "шт": UPGRADE_DEFAULT_UNIT,
+    "штук": UPGRADE_DEFAULT_UNIT,
+    "штуки": UPGRADE_DEFAULT_UNIT,
+    "штука": UPGRADE_DEFAULT_UNIT,
+    "pcs": UPGRADE_DEFAULT_UNIT,
+    "кг.": "кг",
+    "м.": "м",
+    "л.": "л",
+    "компл": "компл.",
+}
+UPGRADE_QUANTITY_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*(.*?)\s*$")
+
+
+def _parse_quantity(text: Optional[str]) -> Tuple[Optional[float], str]:
+    """"25 шт." -> (25.0, "шт."); нераспознанный текст -> (None, текст)"""
+    match = UPGRADE_QUANTITY_RE.match(text or "")
+    if not match:
+        return None, (text or "").strip() or UPGRADE_DEFAULT_UNIT
+    unit = match.group(2).strip()
+    return float(match.group(1).replace(",", ".")), UPGRADE_UNIT_ALIASES.get(unit.lower(), unit)
+
+
+@migration(9, "Числовое количество и единица в приемке, ключ идемпотентности")
+def _reception_quantity(conn):
+    from search import install_search_index
+    from sync import install_change_log
+    if "unit" in {column["name"] for column in inspect(conn).get_columns("reception")}:
+        return
+    legacy = Table("reception", MetaData(), *_reception_columns())
+    columns = [column.name for column in legacy.columns if column.name != "quantity"]
+    new_columns = []
+    for column in _reception_columns():
+        if column.name == "quantity":
+            new_columns += [Column("quantity", Numeric(14, 3, asdecimal=False)), Column("unit", String, nullable=False)]
+        else:
+            new_columns.append(column)
+    table = Table(
+        "reception", MetaData(), *new_columns,
+        Column("idempotency_key", String),
+        *[Index(name, *index_columns) for name, index_columns in COMPOSITE_INDEXES["reception"].items()],
+        Index("ux_reception_idempotency_key", "idempotency_key", unique=True),
+    )
+
+    unparsed = 0
+
+    def fill(rebuilt):
+        nonlocal unparsed
+        result = conn.execute(select(legacy).execution_options(yield_per=RECEPTION_UPGRADE_BATCH_SIZE))
+        for rows in result.partitions():
+            batch = []
+            for row in rows:
+                quantity, unit = _parse_quantity(row.quantity)
+                unparsed += quantity is None
+                batch.append({**{name: row._mapping[name] for name in columns}, "quantity": quantity, "unit": unit})
+            conn.execute(insert(rebuilt), batch)
+
+    replace_table(conn, table, fill)
+    # Триггеры поиска и журнала изменений удалены вместе со старой таблицей;
+    # записи получают новые номера в журнале, и клиенты синхронизации перечитают их
+    conn.exec_driver_sql(
+        "DELETE FROM change_log WHERE entity = 'reception' AND entity_id IN (SELECT id FROM reception)"
+    )
+    install_search_index(conn)
+    install_change_log(conn)
+    if unparsed:
+        print(f"⚠️ Приемка: количество не распознано в {unparsed} записях (оставлено текстом в unit)")
+
+
+@migration(10, "Задачи импорта в базе (общие для рабочих процессов)")
+def _import_jobs(conn):
+    Table(
+        "import_jobs", MetaData(),
+        Column("id", String, primary_key=True),
+        Column("filename", String, nullable=False),
+        Column("status", String, nullable=False),
+        Column("rows_parsed", Integer, nullable=False),
+        Column("rows_inserted", Integer, nullable=False),
+        Column("rows_failed", Integer, nullable=False),
+        Column("errors", Text),
+        Column("error", Text, nullable=False),
+        Column("cancel_requested", Boolean, nullable=False),
+        Column("created_date", DateTime),
+        Column("finished_date", DateTime),
+        Index("ix_import_jobs_created", "created_date"),
+    ).create(conn, checkfirst=True)
+
+
+def current_version(engine) -> int:
+    """Номер последней примененной миграции (0 - схема пустая)"""
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        versions = conn.execute(select(schema_migrations.c.version)).scalars().all()
+    return max(versions, default=0)
+
+
+def migrate(engine) -> int:
+    """Применить недостающие миграции; возвращает количество примененных шагов"""
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    count = 0
+    for version, description, upgrade in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            upgrade(conn)
+            conn.execute(insert(schema_migrations).values(
+                version=version,
+                description=description,
+                applied_date=datetime.now()
+            ))
+        print(f"🗄️ Применена миграция {version}: {description}")
+        count += 1
+
+    return count
@@ -0,0 +1,128 @@
+"""
+Курсорная (keyset) пагинация списков и кэш общего количества записей
+"""
+
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Время жизни закэшированного количества записей (секунды)
+COUNT_CACHE_TTL = 30
+
+
+class CursorError(ValueError):
+    """Некорректный или устаревший курсор"""
+
+
+def encode_cursor(sort_by: str, sort_order: str, value: Any, row_id: int) -> str:
+    """Упаковка позиции (значение колонки сортировки, id) в непрозрачную строку"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort_by, sort_order, value, row_id], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str, column) -> Tuple[Any, int]:
+    """Распаковка курсора; курсор должен соответствовать текущей сортировке"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort_by, cursor_order, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise CursorError("Некорректный курсор")
+
+    if cursor_sort_by != sort_by or cursor_order != sort_order or not isinstance(row_id, int):
+        raise CursorError("Курсор не соответствует параметрам сортировки")
+
+    if value is not None and column.type.python_type is datetime:
+        try:
+            value = datetime.fromisoformat(value)
+        except (ValueError, TypeError):
+            raise CursorError("Некорректный курсор")
+
+    return value, row_id
+
+
+def order_clauses(column, id_column, descending: bool):
+    """
+    Порядок сортировки с явным положением NULL, одинаковый для SQLite и PostgreSQL:
+    при возрастании NULL идут первыми, при убывании - последними.
+    """
+    if descending:
+        return [column.desc().nulls_last(), id_column.desc()]
+    return [column.asc().nulls_first(), id_column.asc()]
+
+
+def _after_value(column, id_column, value: Any, row_id: int, descending: bool):
+    """
+    Условие "строки после (value, id)" среди строк с непустым значением колонки.
+    Записано как диапазон по колонке, чтобы база шла по индексу от позиции курсора.
+    """
+    if descending:
+        return and_(column <= value, or_(column < value, id_column < row_id))
+    return and_(column >= value, or_(column > value, id_column > row_id))
+
+
+def fetch_page(query, column, id_column, descending: bool, limit: int,
+               after: Optional[Tuple[Any, int]] = None):
+    """
+    Выборка до limit + 1 строк, следующих за позицией after = (значение, id).
+
+    Строки с NULL в колонке сортировки образуют отдельный отрезок (в начале при
+    возрастании, в конце при убывании), поэтому переход через границу отрезка
+    выполняется вторым запросом - так каждый запрос остается диапазонным.
+    """
+    order = order_clauses(column, id_column, descending)
+    if after is None:
+        return query.order_by(*order).limit(limit + 1).all()
+
+    value, row_id = after
+    id_order = id_column.desc() if descending else id_column.asc()
+    if value is None:
+        id_after = id_column < row_id if descending else id_column > row_id
+        rows = query.filter(column.is_(None), id_after).order_by(id_order).limit(limit + 1).all()
+        if descending or len(rows) > limit:
+            return rows
+        rest = query.filter(column.isnot(None)).order_by(*order)
+    else:
+        rows = query.filter(
+            _after_value(column, id_column, value, row_id, descending)
+        ).order_by(*order).limit(limit + 1).all()
+        if not descending or len(rows) > limit:
+            return rows
+        rest = query.filter(column.is_(None)).order_by(id_order)
+
+    return rows + rest.limit(limit + 1 - len(rows)).all()
+
+
+class CountCache:
+    """Небольшой кэш количества записей с ограниченным временем жизни"""
+
+    def __init__(self, ttl: float = COUNT_CACHE_TTL, max_size: int = 256):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items: Dict[Hashable, Tuple[float, int]] = {}
+
+    def get(self, key: Hashable) -> Optional[int]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            self._items.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: int):
+        if len(self._items) >= self.max_size:
+            self._items.clear()
+        self._items[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self):
+        self._items.clear()
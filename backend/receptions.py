@@ -0,0 +1,130 @@
+"""
+Приемка: числовое количество с единицей измерения и пакетный прием сканов.
+
+Количество хранится числом (quantity) и единицей (unit), поэтому его можно
+суммировать в SQL. Строковые значения вида "25 шт." от старых клиентов
+разбираются parse_quantity (миграция 9 хранит копию разбора своей версии).
+
+Пакет сканов записывается одной транзакцией: позиции со знакомым ключом
+идемпотентности (idempotency_key) не создаются повторно, а возвращают id
+уже принятой записи, поэтому повтор отправки сканером не дает дублей.
+"""
+
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from bulk import chunked
+from models import Reception, begin_write
+
+# Максимум позиций в одном пакете сканов
+RECEPTION_BATCH_MAX = int(os.getenv("SKLAD_RECEPTION_BATCH_MAX", "5000"))
+
+DEFAULT_UNIT = "шт."
+
+# Написания единиц, приводимые к одному виду
+UNIT_ALIASES = {
+    "": DEFAULT_UNIT,
+    "шт": DEFAULT_UNIT,
+    "штук": DEFAULT_UNIT,
+    "штуки": DEFAULT_UNIT,
+    "штука": DEFAULT_UNIT,
+    "pcs": DEFAULT_UNIT,
+    "кг.": "кг",
+    "м.": "м",
+    "л.": "л",
+    "компл": "компл.",
+}
+
+QUANTITY_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*(.*?)\s*$")
+
+
+def normalize_unit(unit: Optional[str]) -> str:
+    unit = (unit or "").strip()
+    return UNIT_ALIASES.get(unit.lower(), unit)
+
+
+def parse_quantity(text: Optional[str]) -> Tuple[Optional[float], str]:
+    """
+    "25 шт." -> (25.0, "шт."), "2,5 кг" -> (2.5, "кг").
+    Нераспознанный текст: (None, исходный текст) - количество неизвестно,
+    а текст сохраняется в единице, чтобы не потерять его.
+    """
+    match = QUANTITY_RE.match(text or "")
+    if not match:
+        return None, (text or "").strip() or DEFAULT_UNIT
+    return float(match.group(1).replace(",", ".")), normalize_unit(match.group(2))
+
+
+def ingest_receptions(db: Session, items: Sequence[Dict[str, Any]]) -> Tuple[List[int], int]:
+    """
+    Прием позиций в текущей транзакции (фиксирует вызывающий код).
+    Возвращает (id по порядку позиций, количество созданных записей); для
+    повторов по idempotency_key - id существующей записи, в том числе если
+    ключ повторяется внутри пакета.
+    """
+    begin_write(db)
+    keys = list(dict.fromkeys(item["idempotency_key"] for item in items if item.get("idempotency_key")))
+    known: Dict[str, int] = {}
+    for chunk in chunked(keys):
+        known.update(db.execute(
+            select(Reception.idempotency_key, Reception.id).where(Reception.idempotency_key.in_(chunk))
+        ).all())
+
+    now = datetime.now()
+    rows: List[Dict[str, Any]] = []
+    # Позиции запроса, которые получат id новых строк: номер строки -> позиции
+    targets: List[List[int]] = []
+    pending: Dict[str, int] = {}
+    ids: List[Optional[int]] = [None] * len(items)
+    for position, item in enumerate(items):
+        key = item.get("idempotency_key") or None
+        if key in known:
+            ids[position] = known[key]
+            continue
+        if key in pending:
+            targets[pending[key]].append(position)
+            continue
+        if key:
+            pending[key] = len(rows)
+        row = {column: item.get(column) for column in (
+            "order_number", "designation", "name", "quantity", "route_card_number"
+        )}
+        row.update(
+            unit=normalize_unit(item.get("unit")),
+            status=item.get("status") or "принят",
+            date=item.get("date") or now,
+            created_date=now,
+            idempotency_key=key,
+        )
+        rows.append(row)
+        targets.append([position])
+
+    if rows:
+        new_ids = db.execute(
+            insert(Reception).returning(Reception.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        for new_id, positions in zip(new_ids, targets):
+            for position in positions:
+                ids[position] = new_id
+    return ids, len(rows)
+
+
+def reception_totals(db: Session, group_by: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Итоги приемки по колонке group_by и единице: записей и сумма количества"""
+    column = getattr(Reception, group_by)
+    query = (
+        select(column, Reception.unit, func.count(Reception.id), func.sum(Reception.quantity))
+        .group_by(column, Reception.unit)
+        .order_by(column, Reception.unit)
+    )
+    if status:
+        query = query.where(Reception.status == status)
+    return [
+        {"key": value, "unit": unit, "count": count, "quantity": float(total or 0)}
+        for value, unit, count, total in db.execute(query)
+    ]
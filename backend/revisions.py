@@ -0,0 +1,365 @@
+"""
+Состояние заданий на момент времени и пакетный откат изменений.
+
+Поля задания восстанавливаются по истории. Если есть снимок (task_snapshots),
+сделанный не позже нужного момента, изменения полей проигрываются от него
+вперед (new_value); иначе - назад (old_value) от ближайшего более позднего
+снимка или от текущего состояния. Снимки делает фоновый планировщик для
+заданий, у которых после последнего снимка накопилось SNAPSHOT_EVERY
+изменений, поэтому проигрывается не больше одного такого интервала.
+
+История хранит значения текстом; перед записью в задание они приводятся к
+типу колонки (due_date - datetime, пустое значение - None). Откат нескольких
+записей и восстановление заданий на момент времени выполняются в одной
+транзакции: чтение текущих значений и запись истории - одним запросом
+на пачку заданий.
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from bulk import ID_CHUNK_SIZE, chunked
+from history import history_columns
+from models import (
+    ArchivedTask, ArchivedTaskHistory, SessionLocal, Task, TaskHistory, TaskSnapshot,
+    begin_write, log_task_changes
+)
+from serialization import dumps
+from stats import StatsDelta, apply_stats_delta, count_change
+
+# Через сколько изменений полей задания делается новый снимок (0 - не делать)
+SNAPSHOT_EVERY = int(os.getenv("SKLAD_SNAPSHOT_EVERY", "50"))
+
+# Заданий в одной транзакции создания снимков
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SKLAD_SNAPSHOT_BATCH_SIZE", "500"))
+
+# Поля, изменения которых пишутся в историю и восстанавливаются
+TRACKED_FIELDS = ("name", "description", "status", "priority", "responsible", "due_date", "attachments")
+
+TASK_COLUMNS = {column.name: column for column in Task.__table__.columns}
+
+# Пустые значения в истории ("None" - записи, сделанные через str(None))
+EMPTY_VALUES = ("", "None")
+
+
+class RevisionError(ValueError):
+    """Откат или восстановление невозможно (сообщение - для ответа API)"""
+
+
+class RevisionNotFound(RevisionError):
+    """Задание или запись истории не найдены"""
+
+
+def parse_value(field: str, value: Any) -> Any:
+    """Значение поля задания из истории или снимка, приведенное к типу колонки"""
+    column = TASK_COLUMNS[field]
+    python_type = column.type.python_type
+    if python_type is str:
+        return "" if value is None else str(value)
+    if value is None or value in EMPTY_VALUES:
+        return None
+    if isinstance(value, python_type):
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is bool:
+        return value in ("True", "true", "1", 1)
+    return python_type(value)
+
+
+def format_value(value: Any) -> str:
+    """Значение поля для записи в историю (так же, как при обновлении задания)"""
+    return str(value) if value is not None else ""
+
+
+def _history_entries(model, *conditions):
+    """Изменения полей: (id, task_id, field_name, old_value, new_value)"""
+    columns, source = history_columns(model)
+    table = model.__table__
+    return (
+        select(table.c.id, table.c.task_id, columns["field_name"].label("field_name"),
+               columns["old_value"].label("old_value"), columns["new_value"].label("new_value"))
+        .select_from(source)
+        .where(table.c.field_id.isnot(None), *conditions)
+    )
+
+
+def _nearest_snapshots(task_ids: Sequence[int], before: bool, as_of: datetime):
+    """Подзапрос (task_id, history_id): последний снимок не позже as_of или первый после него"""
+    if before:
+        bound = func.max(TaskSnapshot.history_id)
+        condition = TaskSnapshot.timestamp <= as_of
+    else:
+        bound = func.min(TaskSnapshot.history_id)
+        condition = TaskSnapshot.timestamp > as_of
+    return (
+        select(TaskSnapshot.task_id, bound.label("history_id"))
+        .where(TaskSnapshot.task_id.in_(task_ids), condition)
+        .group_by(TaskSnapshot.task_id)
+        .subquery()
+    )
+
+
+def _load_snapshots(db: Session, nearest) -> Dict[int, Dict[str, Any]]:
+    rows = db.execute(
+        select(TaskSnapshot.task_id, TaskSnapshot.data)
+        .join(nearest, and_(
+            nearest.c.task_id == TaskSnapshot.task_id,
+            nearest.c.history_id == TaskSnapshot.history_id
+        ))
+    )
+    return {
+        row.task_id: {
+            field: parse_value(field, value)
+            for field, value in json.loads(row.data).items() if field in TASK_COLUMNS
+        }
+        for row in rows
+    }
+
+
+def task_states(db: Session, task_ids: Sequence[int], as_of: datetime,
+                archived: bool = False) -> Dict[int, Dict[str, Any]]:
+    """
+    Состояние заданий на момент as_of: {id: {колонка: значение}}.
+    Задания, которых нет или которые созданы позже as_of, в результат не входят.
+    Поля вне TRACKED_FIELDS берутся из снимка или текущего состояния как есть.
+    """
+    if as_of.tzinfo is not None:
+        # Время в базе хранится локальным, без часового пояса
+        as_of = as_of.astimezone().replace(tzinfo=None)
+    model, history_model = (ArchivedTask, ArchivedTaskHistory) if archived else (Task, TaskHistory)
+    states = {}
+    # id пачки входят в запрос дважды - пачка вдвое меньше обычной
+    for chunk in chunked(task_ids, ID_CHUNK_SIZE // 2):
+        current = {
+            row.id: row._asdict()
+            for row in db.execute(
+                select(*[model.__table__.c[name] for name in TASK_COLUMNS]).where(model.id.in_(chunk))
+            )
+        }
+        chunk = [
+            task_id for task_id in chunk
+            if task_id in current and (current[task_id]["created_date"] or as_of) <= as_of
+        ]
+        if not chunk:
+            continue
+        replay: Dict[int, List[Tuple[str, Any]]] = {task_id: [] for task_id in chunk}
+
+        # Вперед (new_value) от снимка не позже as_of
+        before = _nearest_snapshots(chunk, True, as_of)
+        snapshots = _load_snapshots(db, before)
+        for task_id, data in snapshots.items():
+            states[task_id] = dict(current[task_id], **data)
+        if snapshots:
+            for row in db.execute(
+                _history_entries(history_model, history_model.id > before.c.history_id,
+                                 history_model.timestamp <= as_of)
+                .join(before, before.c.task_id == history_model.task_id)
+                .order_by(history_model.id)
+            ):
+                replay[row.task_id].append((row.field_name, row.new_value))
+
+        # Назад (old_value) от ближайшего более позднего снимка или от текущего состояния
+        rest = [task_id for task_id in chunk if task_id not in snapshots]
+        if rest:
+            after = _nearest_snapshots(rest, False, as_of)
+            snapshots = _load_snapshots(db, after)
+            for task_id in rest:
+                states[task_id] = dict(current[task_id], **snapshots.get(task_id, {}))
+            for row in db.execute(
+                _history_entries(
+                    history_model,
+                    history_model.task_id.in_(rest),
+                    history_model.timestamp > as_of,
+                    or_(after.c.history_id.is_(None), history_model.id <= after.c.history_id)
+                )
+                .outerjoin(after, after.c.task_id == history_model.task_id)
+                .order_by(history_model.id.desc())
+            ):
+                replay[row.task_id].append((row.field_name, row.old_value))
+
+        for task_id, values in replay.items():
+            for field, value in values:
+                if field in TRACKED_FIELDS:
+                    states[task_id][field] = parse_value(field, value)
+    return states
+
+
+def _missing_task(db: Session, task_id: int) -> "RevisionError":
+    """Ошибка для задания, которого нет среди рабочих"""
+    if db.execute(select(ArchivedTask.id).where(ArchivedTask.id == task_id)).scalar() is not None:
+        return RevisionError(f"Задание {task_id} в архиве и не может быть изменено")
+    return RevisionNotFound(f"Задание {task_id} не найдено")
+
+
+def apply_values(db: Session, values: Dict[int, Dict[str, Any]],
+                 user: str = "Пользователь") -> List[Dict[str, Any]]:
+    """
+    Запись значений полей в рабочие задания (уже приведенных к типам) с
+    обновлением счетчиков и записью "Откат изменения" в историю.
+    Возвращает изменения {"id", "old", "new"} только по отличающимся полям.
+    RevisionError, если задания нет или оно в архиве.
+    """
+    now = datetime.now()
+    changes = []
+    for chunk in chunked(list(values)):
+        fields = sorted({field for task_id in chunk for field in values[task_id]})
+        current = {
+            row.id: row
+            for row in db.execute(
+                select(Task.id, *[Task.__table__.c[field] for field in fields]).where(Task.id.in_(chunk))
+            )
+        }
+        missing = [task_id for task_id in chunk if task_id not in current]
+        if missing:
+            raise _missing_task(db, missing[0])
+
+        for task_id in chunk:
+            row = current[task_id]
+            old = {field: getattr(row, field) for field, value in values[task_id].items() if getattr(row, field) != value}
+            if old:
+                changes.append({"id": task_id, "old": old, "new": {field: values[task_id][field] for field in old}})
+
+    if not changes:
+        return changes
+    # UPDATE по первичному ключу; строки с одинаковым набором полей - одним запросом
+    db.execute(
+        update(Task).execution_options(synchronize_session=False),
+        [dict(change["new"], id=change["id"], updated_date=now) for change in changes]
+    )
+
+    delta = StatsDelta()
+    for change in changes:
+        for field, old_value in change["old"].items():
+            count_change(delta, field, old_value, change["new"][field])
+    apply_stats_delta(db, delta)
+
+    log_task_changes(db, [
+        {
+            "task_id": change["id"],
+            "action": "Откат изменения",
+            "field_name": field,
+            "old_value": format_value(old_value),
+            "new_value": format_value(change["new"][field]),
+            "user": user,
+            "timestamp": now,
+        }
+        for change in changes
+        for field, old_value in change["old"].items()
+    ])
+    return changes
+
+
+def revert_entries(db: Session, history_ids: Sequence[int], user: str = "Пользователь",
+                   task_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Откат записей истории в одной транзакции. Для нескольких записей одного
+    поля задания поле возвращается к значению до самой ранней из них.
+    task_id - записи должны относиться к этому заданию.
+    """
+    begin_write(db)
+    conditions = [TaskHistory.can_revert == True]
+    if task_id is not None:
+        conditions.append(TaskHistory.task_id == task_id)
+    targets: Dict[int, Dict[str, Tuple[int, Any]]] = {}
+    found = set()
+    for chunk in chunked(history_ids):
+        for row in db.execute(_history_entries(TaskHistory, TaskHistory.id.in_(chunk), *conditions)):
+            found.add(row.id)
+            if row.field_name not in TRACKED_FIELDS:
+                raise RevisionError(f"Поле '{row.field_name}' не может быть восстановлено")
+            fields = targets.setdefault(row.task_id, {})
+            if row.field_name not in fields or row.id < fields[row.field_name][0]:
+                fields[row.field_name] = (row.id, parse_value(row.field_name, row.old_value))
+
+    missing = [history_id for history_id in dict.fromkeys(history_ids) if history_id not in found]
+    if missing:
+        if task_id is not None and db.execute(select(Task.id).where(Task.id == task_id)).scalar() is None:
+            raise _missing_task(db, task_id)
+        raise RevisionNotFound(f"Запись истории {missing[0]} не найдена или не может быть отменена")
+    return apply_values(db, {
+        task_id: {field: value for field, (_, value) in fields.items()}
+        for task_id, fields in targets.items()
+    }, user)
+
+
+def restore_tasks(db: Session, task_ids: Sequence[int], as_of: datetime,
+                  user: str = "Пользователь") -> List[Dict[str, Any]]:
+    """Возврат полей заданий к состоянию на момент as_of в одной транзакции"""
+    begin_write(db)
+    states = task_states(db, task_ids, as_of)
+    missing = [task_id for task_id in dict.fromkeys(task_ids) if task_id not in states]
+    if missing:
+        if db.execute(select(Task.id).where(Task.id == missing[0])).scalar() is not None:
+            raise RevisionError(f"Задание {missing[0]} создано позже {as_of}")
+        raise _missing_task(db, missing[0])
+    return apply_values(db, {
+        task_id: {field: state[field] for field in TRACKED_FIELDS}
+        for task_id, state in states.items()
+    }, user)
+
+
+def snapshot_batch(db: Session, every: int = SNAPSHOT_EVERY, batch_size: int = SNAPSHOT_BATCH_SIZE) -> int:
+    """Снимки до batch_size заданий, у которых после последнего снимка every и больше изменений"""
+    begin_write(db)
+    last = (
+        select(TaskSnapshot.task_id, func.max(TaskSnapshot.history_id).label("history_id"))
+        .group_by(TaskSnapshot.task_id)
+        .subquery()
+    )
+    due = db.execute(
+        select(TaskHistory.task_id, func.max(TaskHistory.id).label("history_id"))
+        .join(Task, Task.id == TaskHistory.task_id)
+        .outerjoin(last, last.c.task_id == TaskHistory.task_id)
+        .where(TaskHistory.field_id.isnot(None), TaskHistory.id > func.coalesce(last.c.history_id, 0))
+        .group_by(TaskHistory.task_id)
+        .having(func.count(TaskHistory.id) >= every)
+        .limit(batch_size)
+    ).all()
+    if not due:
+        return 0
+
+    history_ids = dict(due)
+    timestamps = dict(db.execute(
+        select(TaskHistory.id, TaskHistory.timestamp).where(TaskHistory.id.in_(list(history_ids.values())))
+    ).all())
+    rows = db.execute(
+        select(*[Task.__table__.c[name] for name in TASK_COLUMNS if name != "id"], Task.id)
+        .where(Task.id.in_(list(history_ids)))
+    )
+    db.execute(insert(TaskSnapshot.__table__), [
+        {
+            "task_id": row.id,
+            "history_id": history_ids[row.id],
+            "timestamp": timestamps[history_ids[row.id]],
+            "data": dumps({name: value for name, value in row._asdict().items() if name != "id"}).decode(),
+        }
+        for row in rows
+    ])
+    return len(due)
+
+
+def snapshot_tasks(every: int = SNAPSHOT_EVERY, batch_size: int = SNAPSHOT_BATCH_SIZE) -> int:
+    """Снимки всех заданий с накопившимися изменениями пачками; возвращает количество"""
+    if every <= 0:
+        return 0
+    count = 0
+    while True:
+        db = SessionLocal()
+        try:
+            taken = snapshot_batch(db, every, batch_size)
+            db.commit()
+        except Exception as e:
+            print(f"❌ Ошибка создания снимков заданий: {e}")
+            db.rollback()
+            return count
+        finally:
+            db.close()
+        count += taken
+        if taken < batch_size:
+            return count
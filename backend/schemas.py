@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
 # Схемы для заданий
 class TaskBase(BaseModel):
@@ -31,6 +31,13 @@ class TaskBulkUpdate(BaseModel):
     priority: Optional[str] = None
     responsible: Optional[str] = None
 
+class TaskRevert(BaseModel):
+    history_ids: List[int]
+
+class TaskRestore(BaseModel):
+    task_ids: List[int]
+    timestamp: datetime
+
 class Task(TaskBase):
     id: int
     created_date: datetime
@@ -46,12 +53,33 @@ class ReceptionBase(BaseModel):
     order_number: str
     designation: str
     name: str
-    quantity: str
+    quantity: Optional[float] = None
+    unit: str = "шт."
     route_card_number: str
     status: Optional[str] = "принят"
 
 class ReceptionCreate(ReceptionBase):
-    pass
+    quantity: Optional[float] = Field(default=None, gt=0)         # None - текст количества не распознан
+    idempotency_key: Optional[str] = Field(None, max_length=200)  # Ключ повтора (например, id сканера и номер скана)
+    date: Optional[datetime] = None                               # Время скана (по умолчанию - время приема)
+
+    @model_validator(mode="before")
+    @classmethod
+    def split_quantity(cls, data: Any) -> Any:
+        """
+        Количество строкой, как раньше ("25 шт."), разбирается на число и единицу.
+        Нераспознанный текст ("много") и нулевое количество ("0 шт.") не отклоняются:
+        количество - None, а исходный текст сохраняется в единице, как при миграции
+        старых записей.
+        """
+        if isinstance(data, dict) and isinstance(data.get("quantity"), str):
+            from receptions import parse_quantity
+            quantity, unit = parse_quantity(data["quantity"])
+            if quantity is None or quantity <= 0:
+                data = {**data, "quantity": None, "unit": data["quantity"].strip() or unit}
+            else:
+                data = {**data, "quantity": quantity, "unit": data.get("unit") or unit}
+        return data
 
 class Reception(ReceptionBase):
     id: int
@@ -61,6 +89,21 @@ class Reception(ReceptionBase):
     class Config:
         from_attributes = True
 
+class ReceptionBatch(BaseModel):
+    items: List[ReceptionCreate]
+
+class ReceptionBatchResult(BaseModel):
+    message: str
+    created_count: int
+    duplicate_count: int
+    ids: List[int]                       # id по порядку позиций (для повторов - уже принятой записи)
+
+class ReceptionTotal(BaseModel):
+    key: Optional[str]                   # Значение колонки группировки
+    unit: str
+    count: int
+    quantity: float
+
 # Схемы для истории
 class TaskHistoryBase(BaseModel):
     task_id: int
@@ -79,7 +122,25 @@ class TaskHistory(TaskHistoryBase):
     class Config:
         from_attributes = True
 
+class HistoryResponse(BaseModel):
+    history: List[TaskHistory]
+    next_cursor: Optional[str] = None    # None - страниц больше нет
+
 # Схемы для фильтров
+class TaskFilterData(BaseModel):
+    """Содержимое filter_data: параметры GET /api/tasks"""
+    archived: bool = False
+    search: Optional[str] = None
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    responsible: Optional[str] = None
+    overdue: Optional[bool] = None
+    sort_by: str = "created_date"
+    sort_order: str = "desc"
+
+    class Config:
+        extra = "forbid"
+
 class UserFilterBase(BaseModel):
     name: str
     filter_data: str
@@ -91,6 +152,7 @@ class UserFilterCreate(UserFilterBase):
 class UserFilter(UserFilterBase):
     id: int
     created_date: datetime
+    task_count: Optional[int] = None     # Заданий по фильтру (None - фильтр некорректен)
     
     class Config:
         from_attributes = True
@@ -98,7 +160,8 @@ class UserFilter(UserFilterBase):
 # Схемы ответов
 class TasksResponse(BaseModel):
     tasks: List[Task]
-    total: int
+    total: Optional[int] = None          # Заполняется при with_total=true
+    next_cursor: Optional[str] = None    # None - страниц больше нет
 
 class ReceptionsResponse(BaseModel):
     receptions: List[Reception]
@@ -108,5 +171,39 @@ class ArchiveResponse(BaseModel):
     archived_count: int
     message: str
 
+class ImportRowError(BaseModel):
+    row: int
+    number: str
+    error: str
+
+class ImportResult(BaseModel):
+    message: str
+    created: int
+    failed: int
+    errors: List[ImportRowError]
+
+class ImportJob(BaseModel):
+    id: str
+    filename: str
+    status: str                          # queued / running / completed / cancelled / failed
+    rows_parsed: int
+    rows_inserted: int
+    rows_failed: int
+    error: str = ""
+    created_date: datetime
+    finished_date: Optional[datetime] = None
+
+class SyncChange(BaseModel):
+    seq: int
+    entity: str                          # task / reception
+    id: int
+    op: str                              # upsert / delete
+    data: Optional[Dict[str, Any]] = None  # Текущее состояние записи для upsert
+
+class SyncResponse(BaseModel):
+    changes: List[SyncChange]
+    next_since: int                      # Передать в since следующего запроса
+    has_more: bool
+
 class ErrorResponse(BaseModel):
     detail: str 
\ No newline at end of file
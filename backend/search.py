@@ -0,0 +1,193 @@
+"""
+Полнотекстовый поиск по заданиям и приемке (SQLite FTS5).
+
+Индексы tasks_fts, tasks_archive_fts и reception_fts хранят только токены
+(external content) и синхронизируются триггерами базы, поэтому любые пути
+записи - создание, редактирование, массовые операции, импорт, перенос в
+архив - обновляют индекс автоматически.
+Токенизатор unicode61 приводит кириллицу к нижнему регистру, а поисковые слова
+обрезаются до основы и ищутся по префиксу ("корпуса" → "корпус*").
+На других СУБД поиск выполняется через ILIKE по тем же полям.
+"""
+
+import re
+from typing import List, Optional
+
+from sqlalchemy import Column, Float, Integer, MetaData, Table, inspect, literal_column, or_, select, true
+
+from models import ArchivedTask, Task, Reception
+
+search_metadata = MetaData()
+
+# Поля индекса и веса bm25 (порядок совпадает с порядком колонок)
+SEARCH_INDEXES = {
+    "tasks_fts": {
+        "content": "tasks",
+        "columns": ["name", "description", "number", "responsible"],
+        "weights": [10.0, 1.0, 5.0, 2.0],
+    },
+    "tasks_archive_fts": {
+        "content": "tasks_archive",
+        "columns": ["name", "description", "number", "responsible"],
+        "weights": [10.0, 1.0, 5.0, 2.0],
+    },
+    "reception_fts": {
+        "content": "reception",
+        "columns": ["name", "order_number", "designation", "route_card_number"],
+        "weights": [10.0, 5.0, 5.0, 2.0],
+    },
+}
+
+MODEL_INDEXES = {
+    Task: "tasks_fts",
+    ArchivedTask: "tasks_archive_fts",
+    Reception: "reception_fts",
+}
+
+# Таблицы FTS для построения запросов (создаются миграцией, не create_all)
+fts_tables = {
+    name: Table(
+        name, search_metadata,
+        Column("rowid", Integer, primary_key=True),
+        Column("rank", Float),
+        *[Column(column) for column in spec["columns"]]
+    )
+    for name, spec in SEARCH_INDEXES.items()
+}
+
+# Окончания для облегченного стемминга русских слов (сначала длинные)
+RUSSIAN_ENDINGS = sorted([
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ией",
+    "ия", "ие", "ий", "ый", "ой", "ая", "яя", "ое", "ее", "ые", "ых", "их",
+    "ом", "ем", "ам", "ям", "ах", "ях", "ов", "ев", "ей", "ою", "ею", "ую", "юю",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+], key=len, reverse=True)
+
+MIN_STEM_LENGTH = 3
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+CYRILLIC_RE = re.compile(r"^[а-яё]+$")
+
+
+def install_search_index(conn):
+    """
+    Создание FTS-таблиц, триггеров синхронизации и первичное заполнение.
+    Индексы таблиц, которых еще нет, создаются миграцией, добавляющей таблицу.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+
+    existing = set(inspect(conn).get_table_names())
+    for name, spec in SEARCH_INDEXES.items():
+        content = spec["content"]
+        if content not in existing:
+            continue
+        columns = ", ".join(spec["columns"])
+        new_values = ", ".join(f"new.{column}" for column in spec["columns"])
+        old_values = ", ".join(f"old.{column}" for column in spec["columns"])
+        weights = ", ".join(str(weight) for weight in spec["weights"])
+
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5("
+            f"{columns}, content='{content}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {name}_ai AFTER INSERT ON {content} BEGIN "
+            f"INSERT INTO {name}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {name}_ad AFTER DELETE ON {content} BEGIN "
+            f"INSERT INTO {name}({name}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {name}_au AFTER UPDATE OF {columns} ON {content} BEGIN "
+            f"INSERT INTO {name}({name}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {name}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        )
+        conn.exec_driver_sql(f"INSERT INTO {name}({name}, rank) VALUES ('rank', 'bm25({weights})')")
+        conn.exec_driver_sql(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+
+
+def rebuild_search_index(conn) -> List[str]:
+    """
+    Полная перестройка индексов из основных таблиц (обслуживание: после правки
+    базы в обход триггеров или сбоя). Возвращает имена перестроенных индексов.
+    """
+    if conn.dialect.name != "sqlite":
+        return []
+    existing = set(inspect(conn).get_table_names())
+    rebuilt = []
+    for name in SEARCH_INDEXES:
+        if name in existing:
+            conn.exec_driver_sql(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+            rebuilt.append(name)
+    return rebuilt
+
+
+def stem(word: str) -> str:
+    """Отсечение типового окончания у русского слова"""
+    if not CYRILLIC_RE.match(word):
+        return word
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def search_terms(text: str) -> List[str]:
+    """Разбиение поисковой строки на основы слов в нижнем регистре"""
+    return [stem(token.lower().replace("ё", "е")) for token in TOKEN_RE.findall(text or "")]
+
+
+def build_match_query(text: str) -> Optional[str]:
+    """
+    Запрос FTS5: все слова обязательны, каждое ищется по префиксу.
+    Слова берутся в кавычки, поэтому спецсимволы FTS из ввода не интерпретируются.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _use_fts(db) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def _like_condition(model, text: str):
+    columns = SEARCH_INDEXES[MODEL_INDEXES[model]]["columns"]
+    return or_(*[getattr(model, column).ilike(f"%{text}%") for column in columns])
+
+
+def _match(fts, match_query: str):
+    return literal_column(fts.name).op("MATCH")(match_query)
+
+
+def search_condition(db, model, text: str):
+    """Условие фильтрации модели по поисковой строке"""
+    if not _use_fts(db):
+        return _like_condition(model, text)
+    match_query = build_match_query(text)
+    if match_query is None:
+        return true()
+    fts = fts_tables[MODEL_INDEXES[model]]
+    return model.id.in_(select(fts.c.rowid).where(_match(fts, match_query)))
+
+
+def ranked_matches(db, model, text: str):
+    """
+    Подзапрос (id, rank) совпадений для сортировки по релевантности;
+    меньший rank - лучшее совпадение. None, если ранжирование недоступно.
+    """
+    if not _use_fts(db):
+        return None
+    match_query = build_match_query(text)
+    if match_query is None:
+        return None
+    fts = fts_tables[MODEL_INDEXES[model]]
+    return (
+        select(fts.c.rowid.label("id"), fts.c.rank.label("rank"))
+        .where(_match(fts, match_query))
+        .subquery("matches")
+    )
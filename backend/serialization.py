@@ -0,0 +1,85 @@
+"""
+Быстрая сериализация больших списков и выбор полей ответа (fields=).
+
+Вместо загрузки ORM-объектов и построения Pydantic-модели на каждую строку
+выбираются только колонки схемы ответа (кортежи), а словари кодируются
+orjson. Порядок и формат полей совпадают с выводом схемы schemas.Task,
+поэтому ответ байт в байт такой же, как у model_dump_json.
+Параметр fields= сужает и SELECT, и ответ до перечисленных полей.
+Без установленного orjson используется стандартный json.
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson указан в requirements.txt
+    orjson = None
+
+from schemas import Reception as ReceptionSchema, Task as TaskSchema, TaskHistory as TaskHistorySchema
+
+# Поля ответа в порядке схемы
+TASK_FIELDS = tuple(TaskSchema.model_fields)
+
+RECEPTION_FIELDS = tuple(ReceptionSchema.model_fields)
+HISTORY_FIELDS = tuple(TaskHistorySchema.model_fields)
+
+# Поля, которые схемы отдают дробным числом: SQLite возвращает целые значения
+# NUMERIC как int, а Pydantic (POST, /api/sync) выводит их как 100.0
+FLOAT_FIELDS = frozenset(
+    name
+    for schema in (TaskSchema, ReceptionSchema, TaskHistorySchema)
+    for name, field in schema.model_fields.items()
+    if field.annotation in (float, Optional[float])
+)
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON в UTF-8 без пробелов (формат совпадает с Pydantic)"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Tuple[str, ...]:
+    """
+    Поля из параметра fields= (через запятую) в порядке схемы; id включается всегда.
+    Пустой параметр - все поля. Неизвестное поле - ValueError.
+    """
+    if not fields:
+        return tuple(allowed)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(
+            f"Неизвестные поля: {', '.join(sorted(unknown))}. Доступные поля: {', '.join(allowed)}"
+        )
+    requested.add("id")
+    return tuple(field for field in allowed if field in requested)
+
+
+def columns_for(model, fields: Sequence[str]) -> list:
+    return [getattr(model, field) for field in fields]
+
+
+def rows_to_dicts(rows: Iterable[Sequence[Any]], fields: Sequence[str] = TASK_FIELDS) -> List[Dict[str, Any]]:
+    """Строки-кортежи в словари; лишние колонки в конце строки (например, rank) отбрасываются"""
+    floats = [field for field in fields if field in FLOAT_FIELDS]
+    if not floats:
+        return [dict(zip(fields, row)) for row in rows]
+    items = []
+    for row in rows:
+        item = dict(zip(fields, row))
+        for field in floats:
+            if item[field] is not None:
+                item[field] = float(item[field])
+        items.append(item)
+    return items
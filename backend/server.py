@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Production-запуск: несколько рабочих процессов uvicorn с предзагруженным приложением.
+
+Главный процесс один раз готовит базу (миграции и, по желанию, демо-данные),
+импортирует приложение и открывает сокет, затем создает рабочие процессы
+через fork: код приложения уже загружен, и процесс сразу начинает принимать
+соединения с общего сокета. Пул соединений движка закрывается до fork - у
+каждого процесса свой. Упавший процесс перезапускается; SIGTERM/SIGINT -
+плавная остановка всех процессов.
+
+Что общее и что нет:
+- версии таблиц кэша ответов - в разделяемой памяти (см. cache.py), запись в
+  любом процессе сбрасывает кэш во всех; с SKLAD_CACHE_REDIS_URL - в Redis;
+- события SSE каждый процесс читает из журнала изменений в базе;
+- метрики /metrics - сумма по всем процессам: процессы записывают снимки в
+  общий каталог SKLAD_METRICS_DIR (по умолчанию - временный), см. metrics.py;
+- фоновое архивирование выполняет только первый процесс;
+- задачи импорта хранятся в базе (см. jobs.py): прогресс, отчет и отмена
+  доступны через любой процесс, импорт выполняет процесс, принявший файл;
+- журнал /api/slow-queries - у каждого процесса свой.
+
+Без fork (Windows) версии кэша, метрики и архивирование не разделить между
+процессами, поэтому запускается один процесс uvicorn.
+
+Запуск:
+    python server.py --workers 4 --port 8000
+    SKLAD_WORKERS=4 python start.py --prod
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+WORKERS = int(os.getenv("SKLAD_WORKERS", str(os.cpu_count() or 1)))
+HOST = os.getenv("SKLAD_HOST", "0.0.0.0")
+PORT = int(os.getenv("SKLAD_PORT", "8000"))
+
+# Каталог снимков метрик рабочих процессов (пусто - временный, удаляется при остановке)
+METRICS_DIR = os.getenv("SKLAD_METRICS_DIR", "")
+
+# Пауза перед перезапуском упавшего процесса (защита от цикла падений)
+RESTART_DELAY = 1.0
+
+
+def prepare(sample_data: bool):
+    """Миграции и демо-данные - один раз, до запуска рабочих процессов"""
+    from models import engine, prepare_database
+
+    started = time.perf_counter()
+    prepare_database(sample_data)
+    # Соединения главного процесса не должны достаться рабочим после fork
+    engine.dispose()
+    print(f"🗄️ База готова за {(time.perf_counter() - started) * 1000:.0f} мс")
+
+
+def _worker(config, sock, index: int):
+    """Рабочий процесс после fork: свой цикл событий на общем сокете"""
+    import uvicorn
+    from archive import archive_scheduler
+    from metrics import registry, start_flush_thread
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, signal.SIG_DFL)
+    if index:
+        archive_scheduler.interval = 0
+    start_flush_thread()
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    finally:
+        # Последние значения процесса остаются в сумме /metrics
+        registry.flush()
+
+
+def serve(host: str = HOST, port: int = PORT, workers: int = WORKERS, sample_data: bool = False,
+          log_level: str = "info"):
+    started = time.perf_counter()
+    # Рабочие процессы не повторяют подготовку базы при запуске
+    os.environ["SKLAD_PREPARE_ON_STARTUP"] = "0"
+    prepare(sample_data)
+
+    import uvicorn
+
+    if not hasattr(os, "fork"):
+        # Процессы uvicorn не делят версии кэша, и архивирование шло бы в каждом
+        if workers > 1:
+            print(f"⚠️ Без fork несколько процессов не поддерживаются, вместо {workers} запускается один")
+        print("🚀 Запуск uvicorn в одном процессе")
+        uvicorn.run("main:app", host=host, port=port, log_level=log_level)
+        return
+
+    import main
+    from cache import LocalCacheBackend, response_cache
+    from metrics import METRICS_ENABLED, registry
+    from models import engine
+
+    if isinstance(response_cache.backend, LocalCacheBackend):
+        response_cache.backend.share_versions()
+    metrics_dir = None
+    if METRICS_ENABLED:
+        metrics_dir = METRICS_DIR or tempfile.mkdtemp(prefix="sklad-metrics-")
+        registry.share(metrics_dir)
+    engine.dispose()
+
+    config = uvicorn.Config(main.app, host=host, port=port, log_level=log_level, access_log=False)
+    sock = config.bind_socket()
+    print(f"🚀 Приложение загружено за {(time.perf_counter() - started) * 1000:.0f} мс, "
+          f"рабочих процессов: {workers}")
+
+    children = {}
+    stopping = False
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _worker(config, sock, index)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, wait_status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None:
+            continue
+        if registry.shared is not None:
+            registry.shared.mark_dead(pid)
+        if stopping:
+            continue
+        code = -os.WTERMSIG(wait_status) if os.WIFSIGNALED(wait_status) else os.WEXITSTATUS(wait_status)
+        print(f"⚠️ Рабочий процесс {pid} завершился (код {code}), перезапуск")
+        time.sleep(RESTART_DELAY)
+        if not stopping:
+            spawn(index)
+
+    sock.close()
+    if metrics_dir and not METRICS_DIR:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+    print("👋 Сервер остановлен")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Production-запуск API сервера")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Рабочих процессов (SKLAD_WORKERS)")
+    parser.add_argument("--sample-data", action="store_true", help="Создать демо-данные в пустой базе")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    serve(args.host, args.port, max(args.workers, 1), args.sample_data, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
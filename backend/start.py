@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 """
 Запуск API сервера для системы управления складом
+
+    python start.py          # разработка: один процесс с автоперезагрузкой
+    python start.py --prod   # production: несколько рабочих процессов (см. server.py)
 """
 
+import argparse
 import os
 import sys
 import uvicorn
@@ -14,17 +18,28 @@ sys.path.insert(0, str(current_dir))
 
 def main():
     """Запуск сервера"""
+    parser = argparse.ArgumentParser(description="Запуск API сервера")
+    parser.add_argument("--prod", action="store_true", help="Production-режим: рабочие процессы без перезагрузки")
+    parser.add_argument("--workers", type=int, default=None, help="Рабочих процессов в production-режиме")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
     print("🚀 Запуск системы управления складом...")
     print("📁 Проект: Sklad Management System")
-    print("🌐 API документация: http://localhost:8000/docs")
-    print("📦 Фронтенд: http://localhost:8000")
+    print(f"🌐 API документация: http://localhost:{args.port}/docs")
+    print(f"📦 Фронтенд: http://localhost:{args.port}")
     print("=" * 50)
     
     try:
+        if args.prod:
+            from server import WORKERS, serve
+            serve(port=args.port, workers=max(args.workers or WORKERS, 1))
+            return
+
         uvicorn.run(
             "main:app",
             host="0.0.0.0",
-            port=8000,
+            port=args.port,
             reload=True,
             log_level="info",
             reload_dirs=[str(current_dir)],
@@ -35,4 +50,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,131 @@
+"""
+Статистика заданий, поддерживаемая инкрементально.
+
+Количество активных заданий по статусам и приоритетам хранится в таблице
+task_counters и меняется на каждом пути записи в той же транзакции, что и
+сами задания, поэтому чтение статистики не зависит от размера таблицы.
+Количество просроченных зависит от текущего времени и считается по индексу
+(archived, due_date, status) - просматриваются только просроченные строки.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import Task, TaskCounter
+
+StatsDelta = Counter
+
+COUNTED_FIELDS = ("status", "priority")
+
+# INSERT ... ON CONFLICT DO UPDATE (SQLite 3.24+ и PostgreSQL)
+UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _key(value: Optional[str]) -> str:
+    return value if value is not None else ""
+
+
+def count_task(delta: StatsDelta, status: Optional[str], priority: Optional[str], sign: int = 1):
+    """Учесть появление (sign=1) или исчезновение (sign=-1) активного задания"""
+    delta[("status", _key(status))] += sign
+    delta[("priority", _key(priority))] += sign
+
+
+def count_change(delta: StatsDelta, field: str, old_value: Optional[str], new_value: Optional[str]):
+    """Учесть изменение статуса или приоритета активного задания"""
+    if field in COUNTED_FIELDS and old_value != new_value:
+        delta[(field, _key(old_value))] -= 1
+        delta[(field, _key(new_value))] += 1
+
+
+def apply_stats_delta(db: Session, delta: StatsDelta):
+    """
+    Применить накопленные изменения счетчиков в текущей транзакции.
+    Одним upsert (INSERT ... ON CONFLICT DO UPDATE): два писателя, впервые
+    заводящие счетчик нового статуса, не сталкиваются по первичному ключу, как
+    при UPDATE с последующим INSERT в READ COMMITTED PostgreSQL. Строки идут в
+    одном порядке, поэтому параллельные транзакции блокируют их без взаимоблокировок.
+    """
+    rows = [
+        {"kind": kind, "key": key, "count": change}
+        for (kind, key), change in sorted(delta.items())
+        if change
+    ]
+    if not rows:
+        return
+    table = TaskCounter.__table__
+    statement = UPSERT_INSERTS[db.get_bind().dialect.name](table)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[table.c.kind, table.c.key],
+            set_={"count": table.c.count + statement.excluded.count}
+        ),
+        rows
+    )
+
+
+def _count_from_tasks(db: Session) -> StatsDelta:
+    counts = StatsDelta()
+    for field in COUNTED_FIELDS:
+        column = getattr(Task, field)
+        # archived == False всегда истинно, но ведет по индексам ix_tasks_archived_*
+        rows = db.execute(
+            select(column, func.count(Task.id)).where(Task.archived == False).group_by(column)
+        ).all()
+        for value, count in rows:
+            counts[(field, _key(value))] += count
+    return counts
+
+
+def rebuild_task_stats(db: Session) -> Dict[str, int]:
+    """
+    Полный пересчет счетчиков по таблице заданий (в текущей транзакции).
+    Возвращает расхождения {"kind:key": исправление}; пустой словарь - счетчики верны.
+    """
+    actual = _count_from_tasks(db)
+    stored = StatsDelta({
+        (counter.kind, counter.key): counter.count
+        for counter in db.execute(select(TaskCounter)).scalars()
+    })
+
+    drift = {
+        f"{kind}:{key}": actual[(kind, key)] - stored[(kind, key)]
+        for kind, key in set(actual) | set(stored)
+        if actual[(kind, key)] != stored[(kind, key)]
+    }
+
+    db.execute(delete(TaskCounter.__table__))
+    rows = [{"kind": kind, "key": key, "count": count} for (kind, key), count in actual.items() if count]
+    if rows:
+        db.execute(insert(TaskCounter.__table__), rows)
+    return drift
+
+
+def overdue_count(db: Session, now: Optional[datetime] = None) -> int:
+    return db.execute(
+        select(func.count(Task.id)).where(
+            Task.archived == False,  # префикс индекса ix_tasks_archived_due_status
+            Task.due_date < (now or datetime.now()),
+            Task.status != "готово"
+        )
+    ).scalar_one()
+
+
+def task_stats(db: Session) -> dict:
+    """Статистика по активным заданиям из счетчиков"""
+    status_stats, priority_stats = {}, {}
+    for counter in db.execute(select(TaskCounter).where(TaskCounter.count != 0)).scalars():
+        target = status_stats if counter.kind == "status" else priority_stats
+        target[counter.key] = counter.count
+
+    return {
+        "total_tasks": sum(status_stats.values()),
+        "overdue_count": overdue_count(db),
+        "status_stats": status_stats,
+        "priority_stats": priority_stats
+    }
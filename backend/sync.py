@@ -0,0 +1,183 @@
+"""
+Дельта-синхронизация заданий и приемки: "изменения после номера N".
+
+Каждая вставка, изменение (в том числе архивация) и удаление задания или
+приемки записывается триггером базы в журнал change_log с монотонно растущим
+номером seq, в той же транзакции, что и само изменение. Перенос задания в
+архивную таблицу - это upsert (задание читается из архива), а не удаление. Для каждой записи в
+журнале хранится только последнее изменение, поэтому журнал не растет от
+повторных правок, а ответ - это простой просмотр по seq.
+
+Клиент начинает с since=0 (получает все записи), а дальше запрашивает
+изменения после последнего полученного next_since. Повторное получение
+изменения безопасно: upsert несет текущее состояние записи целиком.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session
+
+from models import ArchivedTask, ChangeLog, Reception, Task
+from schemas import Reception as ReceptionSchema, Task as TaskSchema
+
+# Сущность журнала -> (таблица, модель, схема ответа)
+SYNC_ENTITIES = {
+    "task": ("tasks", Task, TaskSchema),
+    "reception": ("reception", Reception, ReceptionSchema),
+}
+
+# Сущность журнала -> (архивная таблица, модель): удаление из рабочей таблицы
+# при наличии записи в архиве - перенос в архив
+ARCHIVE_ENTITIES = {
+    "task": ("tasks_archive", ArchivedTask),
+}
+
+# Поля компактного представления записи (для push-уведомлений)
+COMPACT_FIELDS = {
+    "task": ("number", "name", "status", "priority", "responsible", "archived"),
+    "reception": ("order_number", "name", "status"),
+}
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+
+def install_change_log(conn):
+    """
+    Триггеры записи изменений в журнал и первичное заполнение существующими
+    записями. Таблица журнала и архивные таблицы создаются миграциями; пока
+    архива нет, удаление из рабочей таблицы записывается как удаление.
+    """
+    existing = set(inspect(conn).get_table_names())
+    archives = {
+        entity: archive for entity, archive in ARCHIVE_ENTITIES.items() if archive[0] in existing
+    }
+
+    if conn.dialect.name == "sqlite":
+        now = "datetime('now', 'localtime')"
+        triggers = []
+        for entity, (table, _, _) in SYNC_ENTITIES.items():
+            delete_op = f"'{DELETE}'"
+            if entity in archives:
+                archive_table = archives[entity][0]
+                delete_op = (
+                    f"CASE WHEN EXISTS (SELECT 1 FROM {archive_table} WHERE id = old.id) "
+                    f"THEN '{UPSERT}' ELSE '{DELETE}' END"
+                )
+                triggers.append((entity, archive_table, "ad", "DELETE", "old", f"'{DELETE}'"))
+            triggers.extend([
+                (entity, table, "ai", "INSERT", "new", f"'{UPSERT}'"),
+                (entity, table, "au", "UPDATE", "new", f"'{UPSERT}'"),
+                (entity, table, "ad", "DELETE", "old", delete_op),
+            ])
+        for entity, table, suffix, event, row, op in triggers:
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_change_log_{suffix} AFTER {event} ON {table} BEGIN "
+                f"DELETE FROM change_log WHERE entity = '{entity}' AND entity_id = {row}.id; "
+                f"INSERT INTO change_log (entity, entity_id, op, changed_at) "
+                f"VALUES ('{entity}', {row}.id, {op}, {now}); END"
+            )
+    elif conn.dialect.name == "postgresql":
+        now = "now()"
+        # Блокировка до конца транзакции: номера seq выдаются в порядке коммитов,
+        # и клиент не пропустит изменение, зафиксированное позже с меньшим номером
+        conn.exec_driver_sql(
+            "CREATE OR REPLACE FUNCTION record_change() RETURNS trigger AS $$\n"
+            "DECLARE row_id integer; row_op text;\n"
+            "BEGIN\n"
+            "    PERFORM pg_advisory_xact_lock(hashtext('change_log'));\n"
+            f"    row_op := '{UPSERT}';\n"
+            "    IF TG_OP = 'DELETE' THEN\n"
+            "        row_id := OLD.id;\n"
+            f"        row_op := '{DELETE}';\n"
+            "        -- второй аргумент - архивная таблица: удаление после переноса в архив\n"
+            "        IF TG_NARGS > 1 THEN\n"
+            "            EXECUTE format('SELECT CASE WHEN EXISTS (SELECT 1 FROM %I WHERE id = $1) "
+            f"THEN ''{UPSERT}'' ELSE ''{DELETE}'' END', TG_ARGV[1]) INTO row_op USING row_id;\n"
+            "        END IF;\n"
+            "    ELSE\n"
+            "        row_id := NEW.id;\n"
+            "    END IF;\n"
+            "    DELETE FROM change_log WHERE entity = TG_ARGV[0] AND entity_id = row_id;\n"
+            "    INSERT INTO change_log (entity, entity_id, op, changed_at) VALUES (TG_ARGV[0], row_id, row_op, now());\n"
+            "    RETURN NULL;\n"
+            "END;\n"
+            "$$ LANGUAGE plpgsql"
+        )
+        for entity, (table, _, _) in SYNC_ENTITIES.items():
+            arguments = f"'{entity}'"
+            if entity in archives:
+                archive_table = archives[entity][0]
+                arguments += f", '{archive_table}'"
+                conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {archive_table}_change_log ON {archive_table}")
+                conn.exec_driver_sql(
+                    f"CREATE TRIGGER {archive_table}_change_log AFTER DELETE ON {archive_table} "
+                    f"FOR EACH ROW EXECUTE FUNCTION record_change('{entity}')"
+                )
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {table}_change_log ON {table}")
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER {table}_change_log AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION record_change({arguments})"
+            )
+    else:
+        return
+
+    tables = [(entity, table) for entity, (table, _, _) in SYNC_ENTITIES.items()]
+    tables += [(entity, table) for entity, (table, _) in archives.items()]
+    for entity, table in tables:
+        conn.exec_driver_sql(
+            f"INSERT INTO change_log (entity, entity_id, op, changed_at) "
+            f"SELECT '{entity}', id, '{UPSERT}', {now} FROM {table} "
+            f"WHERE id NOT IN (SELECT entity_id FROM change_log WHERE entity = '{entity}') ORDER BY id"
+        )
+
+
+def changes_since(db: Session, since: int, limit: int,
+                  compact: bool = False) -> Tuple[List[Dict[str, Any]], int, bool]:
+    """
+    Изменения с номером больше since в порядке seq.
+    Возвращает (изменения, next_since, есть ли еще изменения).
+    compact=True - в data только поля COMPACT_FIELDS, без загрузки ORM-объектов.
+    """
+    entries = db.execute(
+        select(ChangeLog.seq, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op)
+        .where(ChangeLog.seq > since)
+        .order_by(ChangeLog.seq)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Текущее состояние измененных записей - одним запросом на сущность
+    current = {}
+    for entity, (_, model, schema) in SYNC_ENTITIES.items():
+        ids = [entry.entity_id for entry in entries if entry.entity == entity and entry.op == UPSERT]
+        if not ids:
+            continue
+        models = [model]
+        if entity in ARCHIVE_ENTITIES:
+            models.append(ARCHIVE_ENTITIES[entity][1])
+        for source in models:
+            if compact:
+                columns = [getattr(source, field) for field in COMPACT_FIELDS[entity]]
+                for row in db.execute(select(source.id, *columns).where(source.id.in_(ids))):
+                    current[(entity, row.id)] = row._asdict()
+            else:
+                for row in db.query(source).filter(source.id.in_(ids)):
+                    current[(entity, row.id)] = schema.model_validate(row).model_dump(mode="json")
+
+    changes = []
+    for entry in entries:
+        data = current.get((entry.entity, entry.entity_id)) if entry.op == UPSERT else None
+        changes.append({
+            "seq": entry.seq,
+            "entity": entry.entity,
+            "id": entry.entity_id,
+            # Запись удалена после чтения журнала - отдаем как удаление
+            "op": UPSERT if data is not None else DELETE,
+            "data": data,
+        })
+
+    next_since = entries[-1].seq if entries else since
+    return changes, next_since, has_more
@@ -0,0 +1,102 @@
+"""
+Общие настройки тестов.
+
+Движок базы создается при импорте models, поэтому временная база и
+настройки окружения задаются до импорта модулей приложения. Схема
+создается миграциями один раз на сессию, а данные очищаются после
+каждого теста.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+TEST_DB_DIR = tempfile.mkdtemp(prefix="sklad-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_DIR}/sklad.db"
+os.environ["SKLAD_SAMPLE_DATA"] = "0"
+os.environ["SKLAD_ARCHIVE_INTERVAL"] = "0"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy import text  # noqa: E402
+
+from models import SessionLocal, engine, prepare_database  # noqa: E402
+
+# Таблицы с данными (FTS-индексы и журнал изменений заполняются триггерами)
+DATA_TABLES = (
+    "tasks", "tasks_archive", "task_history", "task_history_archive", "task_snapshots",
+    "task_counters", "reception", "user_filters", "change_log", "import_jobs",
+)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    prepare_database(False)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def clean_tables(database):
+    yield
+    with engine.begin() as conn:
+        for table in DATA_TABLES:
+            conn.execute(text(f"DELETE FROM {table}"))
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    from cache import response_cache
+    from main import app
+
+    response_cache.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def create_task(client):
+    """Создание задания через API: create_task(номер, **поля) -> id"""
+
+    def create(number: str, **values) -> int:
+        response = client.post("/api/tasks", json={"number": number, "name": "Корпус", **values})
+        assert response.status_code == 200
+        return response.json()["id"]
+
+    return create
+
+
+@pytest.fixture
+def archive_tasks(db):
+    """Перенос готовых заданий в архив: archive_tasks(id, ...) -> число перенесенных"""
+    from archive import archive_old_tasks
+
+    def archive(*task_ids: int) -> int:
+        # Задания завершены раньше порога архивирования (статус не меняется - счетчики верны)
+        with db.begin():
+            for task_id in task_ids:
+                db.execute(
+                    text("UPDATE tasks SET completed_date = :date WHERE id = :id"),
+                    {"date": datetime.now() - timedelta(days=365), "id": task_id}
+                )
+        return archive_old_tasks()
+
+    return archive
@@ -0,0 +1,68 @@
+BEGIN TRANSACTION;
+CREATE TABLE reception (
+	id INTEGER NOT NULL, 
+	date DATETIME, 
+	order_number VARCHAR NOT NULL, 
+	designation VARCHAR NOT NULL, 
+	name VARCHAR NOT NULL, 
+	quantity VARCHAR NOT NULL, 
+	route_card_number VARCHAR NOT NULL, 
+	status VARCHAR, 
+	created_date DATETIME, 
+	PRIMARY KEY (id)
+);
+INSERT INTO "reception" VALUES(1,'2024-01-10 09:00:00.000000','З-1','АБВГ.1','Втулка','25 шт.','МК-1','принят','2024-01-10 09:00:00.000000');
+INSERT INTO "reception" VALUES(2,'2024-01-10 09:00:00.000000','З-2','АБВГ.2','Втулка','2,5 кг','МК-2','принят','2024-01-10 09:00:00.000000');
+INSERT INTO "reception" VALUES(3,'2024-01-10 09:00:00.000000','З-3','АБВГ.3','Втулка','много','МК-3','принят','2024-01-10 09:00:00.000000');
+CREATE TABLE task_history (
+	id INTEGER NOT NULL, 
+	task_id INTEGER NOT NULL, 
+	action VARCHAR NOT NULL, 
+	details TEXT NOT NULL, 
+	old_value TEXT, 
+	new_value TEXT, 
+	field_name VARCHAR, 
+	user VARCHAR, 
+	timestamp DATETIME, 
+	can_revert BOOLEAN, 
+	PRIMARY KEY (id)
+);
+INSERT INTO "task_history" VALUES(1,1,'Создано','Создано новое задание ''Корпус''','','Корпус','','Пользователь','2024-01-10 09:00:00.000000',0);
+INSERT INTO "task_history" VALUES(2,1,'Обновлено','Поле ''status'' изменено: ''подготовлено'' → ''в разработке''','подготовлено','в разработке','status','Пользователь','2024-01-10 09:00:00.000000',1);
+INSERT INTO "task_history" VALUES(3,2,'Создано','Создано новое задание ''Крышка''','','Крышка','','Пользователь','2024-01-10 09:00:00.000000',0);
+INSERT INTO "task_history" VALUES(4,2,'Обновлено','Поле ''status'' изменено: ''выполняется'' → ''готово''','выполняется','готово','status','Пользователь','2024-01-10 09:00:00.000000',1);
+INSERT INTO "task_history" VALUES(5,3,'Импортировано','Задание импортировано из Excel файла ''план.xlsx''','','план.xlsx','','Система','2024-01-10 09:00:00.000000',0);
+CREATE TABLE tasks (
+	id INTEGER NOT NULL, 
+	number VARCHAR NOT NULL, 
+	name VARCHAR NOT NULL, 
+	description TEXT, 
+	status VARCHAR, 
+	priority VARCHAR, 
+	responsible VARCHAR, 
+	due_date DATETIME, 
+	attachments TEXT, 
+	created_date DATETIME, 
+	updated_date DATETIME, 
+	completed_date DATETIME, 
+	archived BOOLEAN, 
+	PRIMARY KEY (id), 
+	UNIQUE (number)
+);
+INSERT INTO "tasks" VALUES(1,'2024/001','Корпус','Корпус станка','в разработке','высокий','Иванов И.И.',NULL,'','2024-01-10 09:00:00.000000','2024-01-10 09:00:00.000000',NULL,0);
+INSERT INTO "tasks" VALUES(2,'2024/002','Крышка','','готово','средний','Петров П.П.',NULL,'','2024-01-10 09:00:00.000000','2024-01-10 09:00:00.000000','2024-01-10 09:00:00.000000',1);
+INSERT INTO "tasks" VALUES(3,'2024/003','Вал','','выполняется','срочный','','2024-02-01 00:00:00.000000','','2024-01-10 09:00:00.000000','2024-01-10 09:00:00.000000',NULL,0);
+CREATE TABLE user_filters (
+	id INTEGER NOT NULL, 
+	name VARCHAR NOT NULL, 
+	filter_data TEXT NOT NULL, 
+	user VARCHAR, 
+	created_date DATETIME, 
+	PRIMARY KEY (id)
+);
+INSERT INTO "user_filters" VALUES(1,'Срочные','{"priority": "срочный"}','Пользователь','2024-01-10 09:00:00.000000');
+CREATE INDEX ix_tasks_id ON tasks (id);
+CREATE INDEX ix_reception_id ON reception (id);
+CREATE INDEX ix_task_history_id ON task_history (id);
+CREATE INDEX ix_user_filters_id ON user_filters (id);
+COMMIT;
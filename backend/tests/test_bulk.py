@@ -0,0 +1,40 @@
+"""Массовые операции (bulk.py) над рабочими и архивными заданиями"""
+
+from stats import rebuild_task_stats
+
+
+def test_bulk_delete_includes_archive(client, db, create_task, archive_tasks):
+    active = create_task("МАС/1", status="выполняется")
+    archived = create_task("МАС/2", status="готово")
+    kept = create_task("МАС/3")
+    assert archive_tasks(archived) == 1
+
+    response = client.request("DELETE", "/api/tasks/bulk-delete", json=[active, archived, 999999])
+    assert response.status_code == 200
+    assert response.json()["deleted_count"] == 2
+
+    assert client.get(f"/api/tasks/{active}").status_code == 404
+    assert client.get(f"/api/tasks/{archived}").status_code == 404
+    assert client.get(f"/api/tasks/{kept}").status_code == 200
+    # Из счетчиков вычтено только задание рабочей таблицы
+    assert rebuild_task_stats(db) == {}
+
+
+def test_bulk_delete_of_archived_only(client, create_task, archive_tasks):
+    archived = create_task("МАС/4", status="готово")
+    archive_tasks(archived)
+
+    response = client.request("DELETE", "/api/tasks/bulk-delete", json=[archived])
+    assert response.status_code == 200
+    assert response.json()["deleted_tasks"] == ["Корпус"]
+    assert client.request("DELETE", "/api/tasks/bulk-delete", json=[archived]).status_code == 404
+
+
+def test_bulk_update_skips_archive(client, create_task, archive_tasks):
+    active = create_task("МАС/5")
+    archived = create_task("МАС/6", status="готово")
+    archive_tasks(archived)
+
+    response = client.put("/api/tasks/bulk-update", json={"task_ids": [active, archived], "priority": "срочный"})
+    assert response.json()["updated_count"] == 1
+    assert client.get(f"/api/tasks/{archived}").json()["priority"] == "средний"
@@ -0,0 +1,47 @@
+"""Кэш ответов (cache.py): повторные чтения из кэша, сброс по версиям таблиц после записи"""
+
+from sqlalchemy import text
+
+from cache import response_cache
+from models import engine
+
+
+def test_repeated_read_is_cached(client, create_task):
+    create_task("КЭШ/1")
+    hits = response_cache.hits
+    first = client.get("/api/tasks")
+    second = client.get("/api/tasks")
+    assert second.content == first.content
+    assert response_cache.hits == hits + 1
+
+
+def test_write_invalidates_lists_and_stats(client, create_task):
+    task_id = create_task("КЭШ/2", status="в разработке")
+    assert [task["status"] for task in client.get("/api/tasks").json()["tasks"]] == ["в разработке"]
+    stats = client.get("/api/tasks-stats").json()
+
+    assert client.put(f"/api/tasks/{task_id}", json={"status": "выполняется"}).status_code == 200
+    assert [task["status"] for task in client.get("/api/tasks").json()["tasks"]] == ["выполняется"]
+    assert client.get("/api/tasks-stats").json() != stats
+
+
+def test_connection_commit_invalidates(client, create_task):
+    task_id = create_task("КЭШ/3", name="Корпус")
+    client.get(f"/api/tasks/{task_id}")
+    # Запись мимо сессии (Connection.commit) тоже увеличивает версию таблицы
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE tasks SET name = 'Крышка' WHERE id = :id"), {"id": task_id})
+    assert client.get(f"/api/tasks/{task_id}").json()["name"] == "Крышка"
+
+
+def test_other_table_write_keeps_cache(client, create_task):
+    create_task("КЭШ/4")
+    client.get("/api/tasks")
+    hits = response_cache.hits
+    reception = {
+        "order_number": "З-1", "designation": "АБВГ.001", "name": "Корпус",
+        "quantity": 1, "route_card_number": "МК-1",
+    }
+    assert client.post("/api/receptions", json=reception).status_code == 200
+    client.get("/api/tasks")
+    assert response_cache.hits == hits + 1
@@ -0,0 +1,57 @@
+"""Условные запросы: ETag и 304 Not Modified по If-None-Match"""
+
+import pytest
+from sqlalchemy import event
+
+from models import engine
+
+
+@pytest.fixture
+def statements():
+    """Счетчик SQL-запросов во время теста"""
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "after_cursor_execute", count)
+    yield executed
+    event.remove(engine, "after_cursor_execute", count)
+
+
+@pytest.mark.parametrize("path", ["/api/tasks", "/api/tasks/{id}", "/api/tasks/{id}/history", "/api/tasks-stats",
+                                  "/api/receptions", "/api/filters"])
+def test_matching_etag_returns_304_without_queries(client, create_task, statements, path):
+    task_id = create_task("ЕТГ/1")
+    path = path.format(id=task_id)
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    statements.clear()
+    repeated = client.get(path, headers={"If-None-Match": etag})
+    assert repeated.status_code == 304
+    assert repeated.headers["ETag"] == etag
+    assert repeated.content == b""
+    assert statements == []
+
+
+def test_etag_changes_after_write(client, create_task):
+    task_id = create_task("ЕТГ/2")
+    etag = client.get(f"/api/tasks/{task_id}").headers["ETag"]
+
+    assert client.put(f"/api/tasks/{task_id}", json={"priority": "срочный"}).status_code == 200
+    response = client.get(f"/api/tasks/{task_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["priority"] == "срочный"
+
+
+def test_if_none_match_forms(client, create_task):
+    create_task("ЕТГ/3")
+    etag = client.get("/api/tasks").headers["ETag"]
+    # Слабый тег, список тегов и * тоже совпадают
+    for header in (f"W/{etag}", f'"other", {etag}', "*"):
+        assert client.get("/api/tasks", headers={"If-None-Match": header}).status_code == 304
+    # Другие параметры запроса - другой ETag
+    assert client.get("/api/tasks?limit=5", headers={"If-None-Match": etag}).status_code == 200
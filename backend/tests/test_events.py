@@ -0,0 +1,84 @@
+"""Рассылка изменений подписчикам (events.EventHub): события после записи, фильтры, отключение медленных"""
+
+import asyncio
+import json
+
+import pytest
+
+from events import DROPPED, EventFilter, EventHub, format_event
+
+
+@pytest.fixture
+def hub():
+    # Отдельный хаб с частым опросом: будится только общий хаб приложения
+    event_hub = EventHub(poll_interval=0.02)
+    yield event_hub
+    event_hub.stop()
+
+
+async def next_event(subscriber, timeout=3.0):
+    return await asyncio.wait_for(subscriber.queue.get(), timeout)
+
+
+async def dropped(event_hub):
+    while not event_hub.stats()["dropped"]:
+        await asyncio.sleep(0.01)
+
+
+def test_write_is_delivered(hub, client, create_task):
+    async def scenario():
+        subscriber = hub.subscribe(EventFilter(entity="task"), asyncio.get_running_loop())
+        task_id = create_task("СОБ/1", status="выполняется")
+        change = await next_event(subscriber)
+        assert (change["entity"], change["id"], change["op"]) == ("task", task_id, "upsert")
+        assert change["data"]["status"] == "выполняется"
+
+        assert client.delete(f"/api/tasks/{task_id}").status_code == 200
+        change = await next_event(subscriber)
+        assert (change["id"], change["op"], change["data"]) == (task_id, "delete", None)
+
+        event = format_event(change)
+        assert event.startswith(f"id: {change['seq']}\nevent: change\n")
+        assert json.loads(event.split("data: ", 1)[1]) == change
+
+    asyncio.run(scenario())
+
+
+def test_filter_skips_other_changes(hub, create_task):
+    async def scenario():
+        subscriber = hub.subscribe(EventFilter(status="готово"), asyncio.get_running_loop())
+        create_task("СОБ/2", status="в разработке")
+        done = create_task("СОБ/3", status="готово")
+        change = await next_event(subscriber)
+        assert change["id"] == done
+        assert subscriber.queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_is_dropped(create_task):
+    event_hub = EventHub(queue_size=1, poll_interval=0.02)
+
+    async def scenario():
+        subscriber = event_hub.subscribe(EventFilter(), asyncio.get_running_loop())
+        create_task("СОБ/4")
+        create_task("СОБ/5")
+        # Подписчик не читает очередь, пока хаб не разложит оба события
+        await asyncio.wait_for(dropped(event_hub), 3.0)
+        # Очередь переполнилась - вместо событий маркер отключения
+        assert await next_event(subscriber) is DROPPED
+        assert event_hub.stats()["subscribers"] == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        event_hub.stop()
+
+
+def test_replay_after_reconnect(hub, create_task, client):
+    create_task("СОБ/6")
+    last_seen = client.get("/api/sync").json()["next_since"]
+    second = create_task("СОБ/7")
+    changes, last_seq, complete = hub.replay(last_seen, EventFilter(entity="task"))
+    assert [change["id"] for change in changes] == [second]
+    assert complete and last_seq > last_seen
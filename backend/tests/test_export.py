@@ -0,0 +1,69 @@
+"""Потоковая выгрузка (export.py): число строк в CSV и XLSX, пачки чтения, рабочая таблица и архив"""
+
+import csv
+import io
+
+import pytest
+from openpyxl import load_workbook
+from sqlalchemy import select
+
+from export import csv_stream, iter_batches, xlsx_stream
+from models import Task
+
+
+def csv_rows(content: bytes) -> list:
+    return list(csv.reader(io.StringIO(content.decode("utf-8-sig"))))
+
+
+def xlsx_rows(content: bytes) -> list:
+    sheet = load_workbook(io.BytesIO(content), read_only=True).active
+    return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+
+@pytest.fixture
+def tasks(create_task, archive_tasks):
+    """Пять рабочих заданий и два архивных"""
+    created = [create_task(f"ВЫГ/{index}", status="готово" if index < 2 else "в разработке") for index in range(7)]
+    archive_tasks(*created[:2])
+    return created
+
+
+@pytest.mark.parametrize("export_format, read", [("csv", csv_rows), ("xlsx", xlsx_rows)])
+def test_task_export_row_counts(client, tasks, export_format, read):
+    def exported(**params) -> list:
+        response = client.get("/api/export/tasks", params={"format": export_format, "fields": "number", **params})
+        assert response.status_code == 200
+        rows = read(response.content)
+        assert rows[0] == ["number", "id"]
+        return rows[1:]
+
+    # Заголовок (id добавляется всегда, порядок схемы) и по строке на задание: сначала рабочая таблица, затем архив
+    rows = exported()
+    assert len(rows) == 7
+    assert [int(row[1]) for row in rows] == tasks[2:] + tasks[:2]
+    assert len(exported(archived="false")) == 5
+    assert len(exported(archived="true")) == 2
+    assert exported(status="нет такого") == []
+
+
+@pytest.mark.parametrize("export_format, read", [("csv", csv_rows), ("xlsx", xlsx_rows)])
+def test_history_export_row_counts(client, create_task, export_format, read):
+    task_id = create_task("ВЫГ/И")
+    for priority in ("срочный", "низкий"):
+        assert client.put(f"/api/tasks/{task_id}", json={"priority": priority}).status_code == 200
+    history = client.get(f"/api/tasks/{task_id}/history", params={"limit": 100}).json()["history"]
+    assert len(history) >= 2
+    response = client.get("/api/export/history", params={"format": export_format, "task_id": task_id})
+    assert len(read(response.content)) == 1 + len(history)
+
+
+def test_batches_cover_all_rows(create_task):
+    created = [create_task(f"ПАЧ/{index}") for index in range(5)]
+    batches = list(iter_batches([select(Task.id, Task.number).order_by(Task.id)], batch_size=2))
+    assert [len(rows) for rows in batches] == [2, 2, 1]
+
+    # Строки всех пачек попадают в файл ровно один раз
+    content = b"".join(csv_stream(iter(batches), ("id", "number")))
+    assert [int(row[0]) for row in csv_rows(content)[1:]] == created
+    content = b"".join(xlsx_stream(iter(batches), ("id", "number")))
+    assert [row[0] for row in xlsx_rows(content)[1:]] == created
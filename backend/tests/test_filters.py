@@ -0,0 +1,44 @@
+"""Сохраненные фильтры: проверка filter_data при сохранении и применении, задания по фильтру"""
+
+import json
+
+from models import UserFilter
+
+
+def save_filter(client, **filter_data):
+    return client.post("/api/filters", json={"name": "Фильтр", "filter_data": json.dumps(filter_data)})
+
+
+def test_unknown_key_is_rejected(client):
+    response = save_filter(client, status="готово", colour="красный")
+    assert response.status_code == 400
+    assert "colour" in response.json()["detail"]
+    assert client.get("/api/filters").json() == []
+
+
+def test_broken_json_is_rejected(client):
+    response = client.post("/api/filters", json={"name": "Фильтр", "filter_data": "{status:"})
+    assert response.status_code == 400
+
+
+def test_saved_filter_selects_tasks(client, create_task):
+    create_task("ФЛТ/1", status="в разработке")
+    done = create_task("ФЛТ/2", status="готово")
+    response = save_filter(client, status="готово")
+    assert response.status_code == 200
+    filter_id = response.json()["id"]
+
+    assert [task["id"] for task in client.get(f"/api/filters/{filter_id}/tasks").json()["tasks"]] == [done]
+    assert [item["task_count"] for item in client.get("/api/filters").json()] == [1]
+
+
+def test_stored_unknown_key_returns_400(client, db):
+    # Фильтр, сохраненный до проверки содержимого
+    user_filter = UserFilter(name="Старый", filter_data=json.dumps({"colour": "красный"}))
+    db.add(user_filter)
+    db.commit()
+
+    response = client.get(f"/api/filters/{user_filter.id}/tasks")
+    assert response.status_code == 400
+    assert "colour" in response.json()["detail"]
+    assert [item["task_count"] for item in client.get("/api/filters").json()] == [None]
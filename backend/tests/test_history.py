@@ -0,0 +1,127 @@
+"""Сжатие истории (history.compact_batch) и восстановление состояния по ней (revisions.task_states)"""
+
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from history import compact_batch, history_select
+from models import Task, TaskHistory, TaskSnapshot, log_task_changes
+from revisions import task_states
+
+NOW = datetime.now().replace(microsecond=0)
+BASE = NOW - timedelta(days=200)
+CUTOFF = NOW - timedelta(days=90)
+
+
+def at(hour: int) -> datetime:
+    return BASE + timedelta(hours=hour)
+
+
+def change(task_id, hour, field, old, new, can_revert=False):
+    return {
+        "task_id": task_id,
+        "action": "Обновлено" if can_revert else "Массовое обновление",
+        "field_name": field,
+        "old_value": old,
+        "new_value": new,
+        "user": "Пользователь",
+        "can_revert": can_revert,
+        "timestamp": at(hour),
+    }
+
+
+def create_task(db, number, **values) -> int:
+    task = Task(number=number, name="Корпус", created_date=BASE, updated_date=BASE, archived=False, **values)
+    db.add(task)
+    db.flush()
+    return task.id
+
+
+def history(db, task_id):
+    return db.execute(
+        history_select(TaskHistory, ["id", "field_name", "old_value", "new_value", "can_revert"])
+        .where(TaskHistory.task_id == task_id)
+        .order_by(TaskHistory.timestamp, TaskHistory.id)
+    ).all()
+
+
+def compact(db) -> int:
+    removed, after_task_id = 0, 0
+    while after_task_id is not None:
+        count, after_task_id = compact_batch(db, TaskHistory, CUTOFF, after_task_id=after_task_id)
+        removed += count
+    db.commit()
+    return removed
+
+
+def states(db, task_id, hours):
+    return {hour: task_states(db, [task_id], at(hour))[task_id] for hour in hours}
+
+
+def test_revertible_entry_breaks_chain(db):
+    # A→B (массово), B→C (пользователь, откатываемое), C→D, D→E (массово)
+    task_id = create_task(db, "ИСТ/1", status="E")
+    log_task_changes(db, [
+        change(task_id, 1, "status", "A", "B"),
+        change(task_id, 2, "status", "B", "C", can_revert=True),
+        change(task_id, 3, "status", "C", "D"),
+        change(task_id, 4, "status", "D", "E"),
+    ])
+    db.commit()
+    # Моменты на границах отрезков: до всех изменений, между ними и после сжатого отрезка
+    checkpoints = [0, 1, 2, 5]
+    before = states(db, task_id, checkpoints)
+
+    assert compact(db) == 1
+
+    rows = history(db, task_id)
+    assert [(row.old_value, row.new_value) for row in rows] == [("A", "B"), ("B", "C"), ("C", "E")]
+    assert [row.can_revert for row in rows] == [False, True, False]
+    # Значения соседних записей сходятся
+    assert all(left.new_value == right.old_value for left, right in zip(rows, rows[1:]))
+    assert states(db, task_id, checkpoints) == before
+    assert [before[hour]["status"] for hour in checkpoints] == ["A", "B", "C", "E"]
+
+
+def test_snapshot_anchor_is_kept(db):
+    task_id = create_task(db, "ИСТ/2", status="в работе", priority="высокий")
+    log_task_changes(db, [
+        change(task_id, 1, "priority", "низкий", "средний"),
+        change(task_id, 3, "priority", "средний", "высокий"),
+    ])
+    db.flush()
+    first = db.execute(
+        select(TaskHistory.id).where(TaskHistory.task_id == task_id).order_by(TaskHistory.id)
+    ).scalars().first()
+    db.add(TaskSnapshot(
+        task_id=task_id, history_id=first, timestamp=at(1),
+        data=json.dumps({"status": "в работе", "priority": "средний"}, ensure_ascii=False)
+    ))
+    db.commit()
+    checkpoints = [0, 2, 4]
+    before = states(db, task_id, checkpoints)
+
+    # Отрезок разорван снимком - сжимать нечего
+    assert compact(db) == 0
+    assert first in [row.id for row in history(db, task_id)]
+    assert states(db, task_id, checkpoints) == before
+    assert [before[hour]["priority"] for hour in checkpoints] == ["низкий", "средний", "высокий"]
+
+
+def test_chain_returning_to_start_is_removed(db):
+    task_id = create_task(db, "ИСТ/3", responsible="Иванов")
+    log_task_changes(db, [
+        change(task_id, 1, "responsible", "Иванов", "Петров"),
+        change(task_id, 2, "responsible", "Петров", "Сидоров"),
+        change(task_id, 3, "responsible", "Сидоров", "Иванов"),
+        # Свежие изменения не сжимаются
+        {**change(task_id, 4, "responsible", "Иванов", "Петров"), "timestamp": NOW},
+        {**change(task_id, 5, "responsible", "Петров", "Иванов"), "timestamp": NOW},
+    ])
+    db.commit()
+
+    assert compact(db) == 3
+    rows = history(db, task_id)
+    assert [(row.old_value, row.new_value) for row in rows] == [("Иванов", "Петров"), ("Петров", "Иванов")]
+    assert task_states(db, [task_id], at(0))[task_id]["responsible"] == "Иванов"
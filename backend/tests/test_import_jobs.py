@@ -0,0 +1,101 @@
+"""Фоновый импорт (jobs.py): состояние задач в базе видно из любого рабочего процесса"""
+
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from openpyxl import Workbook
+
+from jobs import CANCELLED, COMPLETED, FAILED, FINISHED_STATES, ImportJobManager, fail_interrupted_jobs
+
+
+def xlsx_file(*rows) -> bytes:
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Номер", "Наименование", "Статус"])
+    for row in rows:
+        sheet.append(list(row))
+    content = io.BytesIO()
+    workbook.save(content)
+    return content.getvalue()
+
+
+def wait_finished(manager: ImportJobManager, job_id: str, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job.status in FINISHED_STATES:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Импорт {job_id} не завершился")
+
+
+def occupy(manager: ImportJobManager) -> threading.Event:
+    """Занять единственный поток очереди: следующая задача ждет, пока не открыт шлюз"""
+    gate = threading.Event()
+    manager._executor = manager._executor or ThreadPoolExecutor(max_workers=1)
+    manager._executor.submit(gate.wait)
+    return gate
+
+
+@pytest.fixture
+def manager():
+    """Очередь импорта другого рабочего процесса"""
+    job_manager = ImportJobManager(max_workers=1)
+    yield job_manager
+    job_manager.shutdown(wait=True)
+
+
+def test_job_is_visible_to_other_process(client, manager):
+    content = xlsx_file(("ИМП/1", "Корпус", "готово"), ("ИМП/2", "Крышка", ""), ("ИМП/1", "Повтор", ""))
+    response = client.post("/api/tasks/import", files={"file": ("план.xlsx", content)})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    # Опрос через другой процесс видит прогресс и итог задачи
+    job = wait_finished(manager, job_id)
+    assert (job.status, job.rows_parsed, job.rows_inserted, job.rows_failed) == (COMPLETED, 3, 2, 1)
+
+    assert client.get(f"/api/import-jobs/{job_id}").json()["rows_inserted"] == 2
+    report = client.get(f"/api/import-jobs/{job_id}/report").json()
+    assert (report["created"], report["failed"]) == (2, 1)
+    assert [error["number"] for error in report["errors"]] == ["ИМП/1"]
+    assert [job["id"] for job in client.get("/api/import-jobs").json()] == [job_id]
+
+
+def test_cancel_through_other_process(client, manager, tmp_path):
+    gate = occupy(manager)
+    path = tmp_path / "план.xlsx"
+    path.write_bytes(xlsx_file(("ИМП/3", "Корпус", "")))
+    job = manager.submit(str(path), "план.xlsx")
+
+    response = client.post(f"/api/import-jobs/{job.id}/cancel")
+    assert response.status_code == 200
+    gate.set()
+    assert wait_finished(manager, job.id).status == CANCELLED
+    assert client.get("/api/tasks").json()["tasks"] == []
+    assert not path.exists()
+
+
+def test_unknown_job_is_not_found(client):
+    assert client.get("/api/import-jobs/нет").status_code == 404
+    assert client.post("/api/import-jobs/нет/cancel").status_code == 404
+
+
+def test_interrupted_jobs_fail_on_restart(manager, tmp_path):
+    gate = occupy(manager)
+    path = tmp_path / "план.xlsx"
+    path.write_bytes(xlsx_file(("ИМП/4", "Корпус", "")))
+    job = manager.submit(str(path), "план.xlsx")
+
+    # Процесс, принявший файл, остановлен, не начав импорт
+    assert fail_interrupted_jobs() == 1
+    interrupted = manager.get(job.id)
+    assert interrupted.status == FAILED and interrupted.finished_date is not None
+
+    # Прерванная задача не запускается повторно
+    gate.set()
+    manager.shutdown(wait=True)
+    assert manager.get(job.id).status == FAILED
@@ -0,0 +1,39 @@
+"""Сложение метрик рабочих процессов через общий каталог (metrics.SharedMetricsDir)"""
+
+import json
+
+from metrics import Registry
+
+
+def make_registry():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Запросы", ("route",))
+    latency = registry.histogram("latency_seconds", "Время", ("route",), (0.1, 1.0))
+    registry.collector(lambda: [("pool_size", "gauge", "Пул", [((), 5)])])
+    return registry, requests, latency
+
+
+def test_shared_metrics_are_summed(tmp_path):
+    registry, requests, latency = make_registry()
+    requests.inc(("/api/tasks",))
+    registry.share(str(tmp_path))
+    # Значения до fork обнуляются, чтобы процессы не унаследовали их
+    assert registry.snapshot()["metrics"]["requests_total"] == []
+
+    requests.inc(("/api/tasks",), 2)
+    latency.observe(0.05, ("/api/tasks",))
+    # Снимок другого процесса
+    other = registry.snapshot()
+    (tmp_path / "1.json").write_text(json.dumps(other), encoding="utf-8")
+
+    text = registry.render()
+    assert 'requests_total{route="/api/tasks"} 4' in text
+    assert 'latency_seconds_bucket{route="/api/tasks",le="0.1"} 2' in text
+    assert 'latency_seconds_count{route="/api/tasks"} 2' in text
+    assert "pool_size 10" in text
+
+    # Завершившийся процесс: счетчики остаются в сумме, текущие значения - нет
+    registry.shared.mark_dead(1)
+    text = registry.render()
+    assert 'requests_total{route="/api/tasks"} 4' in text
+    assert "pool_size 5" in text
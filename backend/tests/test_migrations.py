@@ -0,0 +1,87 @@
+"""Миграции 1→10: база первой версии (fixtures/legacy_v0.sql) и новая база приходят к одной схеме"""
+
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from conftest import FIXTURES_DIR
+from migrations import MIGRATIONS, current_version, migrate
+
+
+def schema(path) -> dict:
+    """Объекты схемы SQLite: имя -> SQL (без кавычек, которые добавляет ALTER TABLE ... RENAME)"""
+    with sqlite3.connect(path) as conn:
+        return {
+            name: " ".join((sql or "").replace('"', "").split())
+            for name, sql in conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'"
+            )
+        }
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript((FIXTURES_DIR / "legacy_v0.sql").read_text(encoding="utf-8"))
+    engine = create_engine(f"sqlite:///{path}")
+    yield engine
+    engine.dispose()
+
+
+def test_legacy_database_reaches_fresh_schema(legacy_engine, tmp_path):
+    assert migrate(legacy_engine) == len(MIGRATIONS)
+    assert current_version(legacy_engine) == MIGRATIONS[-1][0]
+
+    fresh = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    migrate(fresh)
+    fresh.dispose()
+    assert schema(tmp_path / "legacy.db") == schema(tmp_path / "fresh.db")
+
+    # Повторный запуск ничего не применяет
+    assert migrate(legacy_engine) == 0
+
+
+def test_legacy_data_is_migrated(legacy_engine):
+    migrate(legacy_engine)
+    with legacy_engine.connect() as conn:
+        # Архивированное задание перенесено в архив вместе с историей
+        assert conn.execute(text("SELECT id FROM tasks ORDER BY id")).scalars().all() == [1, 3]
+        assert conn.execute(text("SELECT id FROM tasks_archive")).scalars().all() == [2]
+        assert conn.execute(text("SELECT id FROM task_history_archive ORDER BY id")).scalars().all() == [3, 4]
+
+        # История в компактном формате: строки - в словаре, details по шаблону не хранится
+        row = conn.execute(text(
+            "SELECT a.value, f.value, h.old_value, h.new_value, h.details, h.can_revert "
+            "FROM task_history h JOIN history_terms a ON a.id = h.action_id "
+            "LEFT JOIN history_terms f ON f.id = h.field_id WHERE h.id = 2"
+        )).one()
+        assert tuple(row) == ("Обновлено", "status", "подготовлено", "в разработке", None, 1)
+
+        # Количество приемки - число и единица, нераспознанный текст - в единице
+        assert conn.execute(text("SELECT quantity, unit FROM reception ORDER BY id")).all() == [
+            (25, "шт."), (2.5, "кг"), (None, "много")
+        ]
+
+        # Счетчики - только по рабочим заданиям
+        counters = dict(conn.execute(text("SELECT kind || ':' || key, count FROM task_counters")).all())
+        assert counters == {
+            "status:в разработке": 1, "status:выполняется": 1,
+            "priority:высокий": 1, "priority:срочный": 1,
+        }
+
+        # Журнал синхронизации: по одной записи на задание и приемку, перенос в архив - upsert
+        log = conn.execute(text("SELECT entity, entity_id, op FROM change_log ORDER BY entity, entity_id")).all()
+        assert log == [
+            ("reception", 1, "upsert"), ("reception", 2, "upsert"), ("reception", 3, "upsert"),
+            ("task", 1, "upsert"), ("task", 2, "upsert"), ("task", 3, "upsert"),
+        ]
+
+        # Поиск по рабочим и архивным заданиям
+        assert conn.execute(text(
+            "SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH 'корпус*'"
+        )).scalars().all() == [1]
+        assert conn.execute(text(
+            "SELECT rowid FROM tasks_archive_fts WHERE tasks_archive_fts MATCH 'крышка*'"
+        )).scalars().all() == [2]
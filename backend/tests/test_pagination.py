@@ -0,0 +1,61 @@
+"""Курсорная пагинация: упаковка курсора и обход списка заданий по страницам, включая NULL в due_date"""
+
+from datetime import datetime
+
+import pytest
+
+from models import Task
+from pagination import CursorError, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    value = datetime(2026, 3, 1, 8, 30)
+    cursor = encode_cursor("due_date", "asc", value, 42)
+    assert decode_cursor(cursor, "due_date", "asc", Task.due_date) == (value, 42)
+    # NULL в колонке сортировки тоже переносится курсором
+    assert decode_cursor(encode_cursor("due_date", "desc", None, 7), "due_date", "desc", Task.due_date) == (None, 7)
+
+
+@pytest.mark.parametrize("cursor", ["не-base64!", encode_cursor("name", "asc", "Корпус", 1)[:-3]])
+def test_broken_cursor_is_rejected(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor, "name", "asc", Task.name)
+
+
+def test_cursor_of_other_sort_is_rejected(client):
+    cursor = encode_cursor("name", "asc", "Корпус", 1)
+    with pytest.raises(CursorError):
+        decode_cursor(cursor, "name", "desc", Task.name)
+    response = client.get("/api/tasks", params={"sort_by": "due_date", "sort_order": "asc", "cursor": cursor})
+    assert response.status_code == 400
+
+
+def fetch_all(client, **params):
+    """Все страницы по next_cursor"""
+    ids, cursor = [], None
+    while True:
+        page = client.get("/api/tasks", params={**params, "limit": 3, **({"cursor": cursor} if cursor else {})})
+        assert page.status_code == 200
+        body = page.json()
+        ids.extend(task["id"] for task in body["tasks"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+def test_pages_cover_null_segment(client, create_task, sort_order):
+    # Одинаковые даты проверяют сортировку по id внутри значения, None - отрезок NULL
+    dates = [None, "2026-05-01T00:00:00", None, "2026-04-01T00:00:00", "2026-05-01T00:00:00",
+             None, "2026-06-01T00:00:00", None, "2026-04-01T00:00:00", None, "2026-05-01T00:00:00"]
+    created = [(due_date, create_task(f"СТР/{index}", due_date=due_date)) for index, due_date in enumerate(dates)]
+
+    # NULL - первыми при возрастании и последними при убывании
+    nulls = sorted(task_id for due_date, task_id in created if due_date is None)
+    dated = sorted((due_date, task_id) for due_date, task_id in created if due_date is not None)
+    if sort_order == "asc":
+        expected = nulls + [task_id for _, task_id in dated]
+    else:
+        expected = [task_id for _, task_id in reversed(dated)] + nulls[::-1]
+
+    assert fetch_all(client, sort_by="due_date", sort_order=sort_order) == expected
@@ -0,0 +1,77 @@
+"""Приемка: идемпотентный прием (receptions.ingest_receptions), старый строковый формат и вид количества в ответах"""
+
+from sqlalchemy import func, select
+
+from models import Reception
+from receptions import ingest_receptions
+
+
+def item(key=None, quantity=100, **values):
+    return {
+        "order_number": "З-1", "designation": "АБВГ.001", "name": "Корпус",
+        "quantity": quantity, "unit": "шт.", "route_card_number": "МК-1",
+        "idempotency_key": key, **values,
+    }
+
+
+def reception_count(db) -> int:
+    return db.execute(select(func.count(Reception.id))).scalar_one()
+
+
+def test_ingest_is_idempotent(db):
+    ids, created = ingest_receptions(db, [item("скан-1"), item("скан-2"), item("скан-1"), item()])
+    db.commit()
+    # Повтор ключа внутри пакета получает id первой позиции
+    assert created == 3
+    assert ids[0] == ids[2] and len(set(ids)) == 3
+
+    # Повтор отправки: новые записи создаются только для позиций без ключа
+    again, created = ingest_receptions(db, [item("скан-2"), item("скан-1"), item("скан-3")])
+    db.commit()
+    assert created == 1
+    assert again[:2] == [ids[1], ids[0]]
+    assert reception_count(db) == 4
+
+
+def test_batch_endpoint_reports_duplicates(client, db):
+    batch = {"items": [item("ТСД-7/1"), item("ТСД-7/2")]}
+    first = client.post("/api/receptions/batch", json=batch).json()
+    second = client.post("/api/receptions/batch", json=batch).json()
+    assert (first["created_count"], first["duplicate_count"]) == (2, 0)
+    assert (second["created_count"], second["duplicate_count"]) == (0, 2)
+    assert second["ids"] == first["ids"]
+    assert reception_count(db) == 2
+
+
+def test_legacy_string_quantity(client):
+    parsed = client.post("/api/receptions", json=item(quantity="2,5 кг", unit=None)).json()
+    assert (parsed["quantity"], parsed["unit"]) == (2.5, "кг")
+
+    # Нераспознанный текст не отклоняется, а сохраняется в единице
+    response = client.post("/api/receptions", json=item(quantity="много"))
+    assert response.status_code == 200
+    assert (response.json()["quantity"], response.json()["unit"]) == (None, "много")
+
+    # Нулевое количество строкой - тоже текст, а не ошибка
+    response = client.post("/api/receptions", json=item(quantity="0 шт."))
+    assert response.status_code == 200
+    assert (response.json()["quantity"], response.json()["unit"]) == (None, "0 шт.")
+
+    # Число по-прежнему должно быть положительным, а без количества - None
+    assert client.post("/api/receptions", json=item(quantity=0)).status_code == 422
+    missing = item()
+    del missing["quantity"]
+    assert client.post("/api/receptions", json=missing).json()["quantity"] is None
+
+
+def test_quantity_is_float_everywhere(client):
+    created = client.post("/api/receptions", json=item("ТСД-1/1", quantity=100))
+    listed = client.get("/api/receptions")
+    synced = client.get("/api/sync")
+    exported = client.get("/api/export/receptions")
+
+    # 100 == 100.0 в Python, поэтому сравнивается текст ответа
+    for response in (created, listed, synced, exported):
+        assert '"quantity":100.0' in response.text.replace(" ", "")
+    assert listed.json() == [created.json()]
+    assert [change["data"] for change in synced.json()["changes"]] == [created.json()]
@@ -0,0 +1,46 @@
+"""Откат изменения задания (POST /api/tasks/{id}/revert/{history_id})"""
+
+import pytest
+
+
+def revertible_entry(client, task_id: int) -> dict:
+    history = client.get(f"/api/tasks/{task_id}/history").json()["history"]
+    return next(entry for entry in history if entry["can_revert"])
+
+
+@pytest.fixture
+def changed_task(client, create_task):
+    """Задание, у которого статус изменен один раз"""
+    task_id = create_task("ОТК/1", status="в разработке")
+    assert client.put(f"/api/tasks/{task_id}", json={"status": "выполняется"}).status_code == 200
+    return task_id, revertible_entry(client, task_id)["id"]
+
+
+def test_revert_restores_field(client, changed_task):
+    task_id, history_id = changed_task
+    response = client.post(f"/api/tasks/{task_id}/revert/{history_id}")
+    assert response.status_code == 200
+    assert response.json()["reverted_field"] == "status"
+    assert response.json()["reverted_to"] == "в разработке"
+    assert client.get(f"/api/tasks/{task_id}").json()["status"] == "в разработке"
+
+    # Повторный откат ничего не меняет
+    repeated = client.post(f"/api/tasks/{task_id}/revert/{history_id}").json()
+    assert (repeated["reverted_field"], repeated["reverted_to"]) == (None, None)
+
+
+def test_entry_of_other_task_is_not_found(client, create_task, changed_task):
+    _, history_id = changed_task
+    other_id = create_task("ОТК/2")
+    assert client.post(f"/api/tasks/{other_id}/revert/{history_id}").status_code == 404
+    assert client.post(f"/api/tasks/999999/revert/{history_id}").status_code == 404
+
+
+def test_archived_task_is_read_only(client, create_task, archive_tasks):
+    task_id = create_task("ОТК/3", status="в разработке")
+    assert client.put(f"/api/tasks/{task_id}", json={"status": "готово"}).status_code == 200
+    history_id = revertible_entry(client, task_id)["id"]
+    archive_tasks(task_id)
+    response = client.post(f"/api/tasks/{task_id}/revert/{history_id}")
+    assert response.status_code == 400
+    assert "в архиве" in response.json()["detail"]
@@ -0,0 +1,72 @@
+"""Полнотекстовый поиск: синхронизация индексов FTS5 триггерами, перестройка и курсор по релевантности"""
+
+from sqlalchemy import text
+
+
+def found(client, query, **params) -> list:
+    response = client.get("/api/tasks", params={"search": query, "limit": 1000, **params})
+    assert response.status_code == 200
+    return [task["id"] for task in response.json()["tasks"]]
+
+
+def test_index_follows_writes(client, create_task):
+    task_id = create_task("ПСК/1", name="Кронштейн усиленный")
+    create_task("ПСК/2", name="Крышка")
+    # Словоформа приводится к основе и ищется по префиксу
+    assert found(client, "кронштейны") == [task_id]
+
+    assert client.put(f"/api/tasks/{task_id}", json={"name": "Втулка стальная"}).status_code == 200
+    assert found(client, "кронштейн") == []
+    assert found(client, "втулки") == [task_id]
+
+    assert client.delete(f"/api/tasks/{task_id}").status_code == 200
+    assert found(client, "втулка") == []
+
+
+def test_new_reception_is_searchable(client):
+    reception = {
+        "order_number": "З-77", "designation": "АБВГ.002", "name": "Фланец",
+        "quantity": 4, "route_card_number": "МК-9",
+    }
+    reception_id = client.post("/api/receptions", json=reception).json()["id"]
+    response = client.get("/api/receptions", params={"search": "фланец"})
+    assert [item["id"] for item in response.json()] == [reception_id]
+
+
+def test_rebuild_restores_index(client, create_task, db):
+    task_id = create_task("ПСК/3", name="Шестерня")
+    # Индекс очищен в обход триггеров
+    with db.begin():
+        db.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('delete-all')"))
+    assert found(client, "шестерня") == []
+
+    response = client.post("/api/search/rebuild")
+    assert response.status_code == 200
+    assert "tasks_fts" in response.json()["rebuilt"]
+    assert found(client, "шестерня") == [task_id]
+
+
+def test_relevance_cursor_round_trip(client, create_task):
+    # Совпадение в наименовании весит больше, чем в описании
+    in_name = [create_task(f"ПСК/Н{index}", name="Корпус редуктора") for index in range(3)]
+    in_description = [
+        create_task(f"ПСК/О{index}", name="Крышка", description="для корпуса") for index in range(3)
+    ]
+    create_task("ПСК/Х", name="Вал")
+
+    ids, cursor = [], None
+    while True:
+        params = {"search": "корпус", "sort_by": "relevance", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/tasks", params=params)
+        assert page.status_code == 200
+        ids.extend(task["id"] for task in page.json()["tasks"])
+        cursor = page.json()["next_cursor"]
+        if cursor is None:
+            break
+
+    # Каждое совпадение ровно один раз, сначала совпадения в наименовании
+    assert len(ids) == len(set(ids)) == 6
+    assert set(ids[:3]) == set(in_name)
+    assert set(ids[3:]) == set(in_description)
@@ -0,0 +1,84 @@
+"""Счетчики статистики (stats.py) не расходятся с таблицей заданий после записей через API, импорт и архивирование"""
+
+from io import BytesIO
+
+from openpyxl import Workbook
+from sqlalchemy import select
+
+from history import history_select
+from importer import import_tasks
+from models import TaskCounter, TaskHistory
+from stats import StatsDelta, apply_stats_delta, rebuild_task_stats
+
+
+def drift(db) -> dict:
+    """Расхождения счетчиков; пересчет откатывается, чтобы проверять сами записи"""
+    try:
+        return rebuild_task_stats(db)
+    finally:
+        db.rollback()
+
+
+def xlsx(rows) -> BytesIO:
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Номер", "Наименование", "Статус"])
+    for row in rows:
+        sheet.append(row)
+    buffer = BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def test_counters_have_no_drift_after_writes(client, db, create_task, archive_tasks):
+    ids = [
+        create_task(f"СЧТ/{index}", status=status, priority=priority)
+        for index, (status, priority) in enumerate([
+            ("в разработке", "средний"), ("выполняется", "высокий"), ("подготовлено", "низкий"),
+            ("в разработке", "срочный"), ("выполняется", "средний"), ("подготовлено", "высокий"),
+        ])
+    ]
+    assert drift(db) == {}
+
+    assert client.put(f"/api/tasks/{ids[0]}", json={"status": "готово", "priority": "срочный"}).status_code == 200
+    assert drift(db) == {}
+
+    bulk = {"task_ids": ids[1:3], "status": "готово", "responsible": "Иванов"}
+    assert client.put("/api/tasks/bulk-update", json=bulk).status_code == 200
+    assert drift(db) == {}
+
+    # Откат изменения статуса возвращает задание в прежнюю группу
+    history_id = db.execute(
+        history_select(TaskHistory, ["id", "field_name"])
+        .where(TaskHistory.task_id == ids[0], TaskHistory.can_revert.is_(True))
+        .order_by(TaskHistory.id)
+    ).first().id
+    db.rollback()
+    assert client.post(f"/api/tasks/{ids[0]}/revert/{history_id}").status_code == 200
+    assert drift(db) == {}
+
+    assert client.delete(f"/api/tasks/{ids[3]}").status_code == 200
+    assert client.request("DELETE", "/api/tasks/bulk-delete", json=[ids[4]]).status_code == 200
+    assert drift(db) == {}
+
+    # Импорт: новые задания учитываются, строки с занятым номером - нет
+    report = import_tasks(db, xlsx([["СЧТ/5", "Дубль", "готово"], ["СЧТ/10", "Крышка", "выполняется"]]), "tasks.xlsx")
+    assert (report.created, len(report.errors)) == (1, 1)
+    assert drift(db) == {}
+
+    # Архивирование вычитает перенесенные задания из счетчиков рабочей таблицы
+    assert archive_tasks(ids[1], ids[2]) == 2
+    assert drift(db) == {}
+
+
+def test_delta_creates_and_updates_counters(db):
+    delta = StatsDelta()
+    delta[("status", "новый")] += 2
+    delta[("priority", "")] += 1
+    apply_stats_delta(db, delta)
+    # Тот же ключ повторно - сложение с существующей строкой, а не второй INSERT
+    apply_stats_delta(db, StatsDelta({("status", "новый"): -1, ("status", "пусто"): 0}))
+
+    counters = dict(db.execute(select(TaskCounter.kind + ":" + TaskCounter.key, TaskCounter.count)).all())
+    assert counters == {"status:новый": 1, "priority:": 1}
@@ -0,0 +1,53 @@
+"""Дельта-синхронизация (/api/sync): одна запись журнала на запись, удаления и перенос в архив"""
+
+
+def sync(client, since=0, limit=1000) -> dict:
+    response = client.get("/api/sync", params={"since": since, "limit": limit})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_sync_returns_latest_state_once(client, create_task):
+    first, second, third = (create_task(f"СНХ/{index}") for index in range(3))
+    start = sync(client)["next_since"]
+
+    assert client.put(f"/api/tasks/{first}", json={"status": "выполняется"}).status_code == 200
+    assert client.put(f"/api/tasks/{first}", json={"responsible": "Петров"}).status_code == 200
+    assert client.delete(f"/api/tasks/{second}").status_code == 200
+
+    changes = sync(client, start)["changes"]
+    # Два изменения одного задания - одна запись с текущим состоянием
+    assert [(change["id"], change["op"]) for change in changes] == [(first, "upsert"), (second, "delete")]
+    assert changes[0]["data"]["status"] == "выполняется"
+    assert changes[0]["data"]["responsible"] == "Петров"
+    assert changes[1]["data"] is None
+
+    # Полная синхронизация с нуля: каждая запись ровно один раз, в порядке последнего изменения
+    assert [change["id"] for change in sync(client)["changes"]] == [third, first, second]
+
+
+def test_sync_pages_by_next_since(client, create_task):
+    ids = [create_task(f"СНХ/{index}") for index in range(5)]
+    seen, since = [], 0
+    while True:
+        page = sync(client, since, limit=2)
+        seen.extend(change["id"] for change in page["changes"])
+        since = page["next_since"]
+        if not page["has_more"]:
+            break
+    assert seen == ids
+    assert sync(client, since)["changes"] == []
+
+
+def test_archived_task_is_an_upsert(client, create_task, archive_tasks):
+    task_id = create_task("СНХ/А", status="готово")
+    start = sync(client)["next_since"]
+
+    assert archive_tasks(task_id) == 1
+    changes = sync(client, start)["changes"]
+    # Перенос в архив - не удаление: клиент получает задание с archived = true
+    assert [(change["id"], change["op"]) for change in changes] == [(task_id, "upsert")]
+    assert changes[0]["data"]["archived"] is True
+
+    assert client.delete(f"/api/tasks/{task_id}").status_code == 200
+    assert [change["op"] for change in sync(client, changes[0]["seq"])["changes"]] == ["delete"]
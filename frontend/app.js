@@ -13,8 +13,19 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeApp();
     setupEventListeners();
     loadInitialData();
+    subscribeToChanges();
 });
 
+// Подписка на изменения других операторов вместо периодического опроса
+function subscribeToChanges() {
+    if (!window.EventSource) return;
+    
+    const source = new EventSource(`${API_BASE_URL}/events`);
+    const reload = debounce(() => loadTabData(currentTab), 500);
+    source.addEventListener('change', reload);
+    source.addEventListener('resync', reload);
+}
+
 // Инициализация приложения
 function initializeApp() {
     console.log('Инициализация системы управления складом...');
@@ -34,6 +45,9 @@ function setupEventListeners() {
     // Скрытие контекстного меню при клике вне его
     document.addEventListener('click', hideContextMenu);
     
+    // Подгрузка следующей страницы списка (scroll не всплывает - перехват)
+    document.addEventListener('scroll', debounce(handleListScroll, 100), true);
+    
     // Обработка поиска
     const searchInput = document.getElementById('searchInput');
     if (searchInput) {
@@ -144,7 +158,7 @@ function hideContextMenu() {
 // Обработка кликов по таблице
 function handleTableClick(e) {
     const row = e.target.closest('tr');
-    if (!row || row.parentElement.tagName !== 'TBODY') return;
+    if (!row || row.parentElement.tagName !== 'TBODY' || row.classList.contains('load-more-row')) return;
     
     // Двойной клик - редактирование
     if (e.detail === 2) {
@@ -247,14 +261,78 @@ async function loadInitialData() {
     updateStatusBar();
 }
 
+// Размер страницы списка заданий; следующие страницы подгружаются при прокрутке
+const TASKS_PAGE_SIZE = 100;
+const TASKS_MAX_PAGE_SIZE = 1000;
+
+// Загруженные страницы списков: задания, курсор следующей страницы (null - все загружено)
+const taskLists = {
+    tasks: { params: {}, items: [], cursor: null, loading: false, render: tasks => renderTasksTable(tasks) },
+    archive: { params: { archived: 'true' }, items: [], cursor: null, loading: false, render: tasks => renderArchiveTable(tasks) }
+};
+
+async function fetchTasksPage(params, limit, cursor = null) {
+    const query = new URLSearchParams(params);
+    query.set('limit', limit);
+    if (cursor) query.set('cursor', cursor);
+    
+    const response = await fetch(`${API_BASE_URL}/tasks?${query.toString()}`);
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    return response.json();
+}
+
+// Загрузка списка с начала; при обновлении сохраняется число уже показанных строк
+async function loadTaskList(name) {
+    const list = taskLists[name];
+    const limit = Math.min(Math.max(list.items.length, TASKS_PAGE_SIZE), TASKS_MAX_PAGE_SIZE);
+    const page = await fetchTasksPage(list.params, limit);
+    list.items = page.tasks;
+    list.cursor = page.next_cursor;
+    list.render(list.items);
+}
+
+// Следующая страница списка по next_cursor
+async function loadMoreTasks(name) {
+    const list = taskLists[name];
+    if (!list.cursor || list.loading) return;
+    
+    list.loading = true;
+    try {
+        const page = await fetchTasksPage(list.params, TASKS_PAGE_SIZE, list.cursor);
+        list.items.push(...page.tasks);
+        list.cursor = page.next_cursor;
+        list.render(list.items);
+    } catch (error) {
+        console.error('Ошибка загрузки заданий:', error);
+        showNotification('Ошибка загрузки заданий', 'error');
+    } finally {
+        list.loading = false;
+    }
+}
+
+// Подгрузка при прокрутке таблицы к концу
+function handleListScroll(event) {
+    if (!taskLists[currentTab]) return;
+    const target = event.target === document ? document.scrollingElement : event.target;
+    if (target.scrollTop + target.clientHeight >= target.scrollHeight - 200) {
+        loadMoreTasks(currentTab);
+    }
+}
+
+// Строка "Показать еще" в конце таблицы, пока есть следующая страница
+function appendLoadMoreRow(tbody, name, columns) {
+    if (!taskLists[name].cursor) return;
+    
+    const row = document.createElement('tr');
+    row.className = 'load-more-row';
+    row.innerHTML = `<td colspan="${columns}"><button class="btn" onclick="loadMoreTasks('${name}')">Показать еще</button></td>`;
+    tbody.appendChild(row);
+}
+
 // Загрузка заданий
 async function loadTasks() {
     try {
-        const response = await fetch(`${API_BASE_URL}/tasks`);
-        if (!response.ok) throw new Error('Ошибка загрузки заданий');
-        
-        const tasks = await response.json();
-        renderTasksTable(tasks);
+        await loadTaskList('tasks');
         updateStatusBar();
     } catch (error) {
         console.error('Ошибка загрузки заданий:', error);
@@ -287,6 +365,7 @@ function renderTasksTable(tasks) {
         
         tbody.appendChild(row);
     });
+    appendLoadMoreRow(tbody, 'tasks', 7);
 }
 
 // Загрузка приемки
@@ -319,7 +398,7 @@ function renderReceptionsTable(receptions) {
             <td>${reception.order_number}</td>
             <td>${reception.designation}</td>
             <td>${reception.name}</td>
-            <td>${reception.quantity}</td>
+            <td>${reception.quantity ?? ''} ${reception.unit || ''}</td>
             <td>${reception.route_card_number || '-'}</td>
             <td><span class="status status-accepted">${reception.status}</span></td>
         `;
@@ -331,11 +410,7 @@ function renderReceptionsTable(receptions) {
 // Загрузка архива
 async function loadArchive() {
     try {
-        const response = await fetch(`${API_BASE_URL}/tasks?archived=true`);
-        if (!response.ok) throw new Error('Ошибка загрузки архива');
-        
-        const archive = await response.json();
-        renderArchiveTable(archive);
+        await loadTaskList('archive');
     } catch (error) {
         console.error('Ошибка загрузки архива:', error);
         showNotification('Ошибка загрузки архива', 'error');
@@ -365,6 +440,7 @@ function renderArchiveTable(archive) {
         
         tbody.appendChild(row);
     });
+    appendLoadMoreRow(tbody, 'archive', 7);
 }
 
 // Создание нового задания
@@ -545,8 +621,8 @@ async function viewTaskHistory() {
         const response = await fetch(`${API_BASE_URL}/tasks/${taskId}/history`);
         if (!response.ok) throw new Error('Ошибка загрузки истории');
         
-        const history = await response.json();
-        showTaskHistory(history);
+        const page = await response.json();
+        showTaskHistory(page.history);
     } catch (error) {
         console.error('Ошибка загрузки истории:', error);
         showNotification('Ошибка загрузки истории', 'error');
@@ -569,7 +645,7 @@ function showTaskHistory(history) {
                 <tr>
                     <td>${formatDateTime(entry.timestamp)}</td>
                     <td>${entry.action}</td>
-                    <td>${entry.changes || '-'}</td>
+                    <td>${entry.details || '-'}</td>
                 </tr>
             `;
         });
@@ -608,8 +684,18 @@ async function handleExcelImport(event) {
         
         if (!response.ok) throw new Error('Ошибка импорта файла');
         
-        const result = await response.json();
-        showNotification(`Импортировано заданий: ${result.imported_count}`, 'success');
+        // Импорт выполняется в фоне - опрашиваем состояние задачи
+        let job = await response.json();
+        showNotification('Импорт запущен...', 'info');
+        while (job.status === 'queued' || job.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const jobResponse = await fetch(`${API_BASE_URL}/import-jobs/${job.id}`);
+            if (!jobResponse.ok) throw new Error('Ошибка получения состояния импорта');
+            job = await jobResponse.json();
+        }
+        
+        if (job.status !== 'completed') throw new Error(job.error || 'Импорт не выполнен');
+        showNotification(`Импортировано заданий: ${job.rows_inserted}, ошибок: ${job.rows_failed}`, 'success');
         
         await loadTasks();
     } catch (error) {
@@ -110,12 +110,85 @@ function updateToolbar() {
     });
 }
 
+// Размер страницы списка заданий; следующие страницы - по кнопке "Показать еще" и при прокрутке
+const TASKS_PAGE_SIZE = 100;
+const TASKS_MAX_PAGE_SIZE = 1000;
+
+// Параметры запроса и курсор следующей страницы (null - все загружено) вкладок заданий и архива
+const taskPaging = {
+    0: { params: null, cursor: null, loading: false },
+    2: { params: null, cursor: null, loading: false }
+};
+
+async function fetchTasksPage(params, limit, cursor = null) {
+    const query = new URLSearchParams(params);
+    query.set('limit', limit);
+    if (cursor) query.set('cursor', cursor);
+    
+    const response = await fetch(`${API_URL}/tasks?${query.toString()}`);
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    }
+    return response.json();
+}
+
+// Первая страница вкладки; при обновлении сохраняется число уже показанных строк
+async function loadTasksTab(tab, params, loaded) {
+    const limit = Math.min(Math.max(loaded, TASKS_PAGE_SIZE), TASKS_MAX_PAGE_SIZE);
+    const page = await fetchTasksPage(params, limit);
+    taskPaging[tab] = { params, cursor: page.next_cursor, loading: false };
+    return page.tasks;
+}
+
+// Следующая страница текущей вкладки по next_cursor
+async function loadMoreTasks() {
+    const tab = currentTab;
+    const paging = taskPaging[tab];
+    if (!paging || !paging.cursor || paging.loading) return;
+    
+    paging.loading = true;
+    try {
+        const page = await fetchTasksPage(paging.params, TASKS_PAGE_SIZE, paging.cursor);
+        paging.cursor = page.next_cursor;
+        if (tab === 0) {
+            tasks = tasks.concat(page.tasks);
+            renderTasks();
+        } else {
+            archivedTasks = archivedTasks.concat(page.tasks);
+            renderArchivedTasks();
+        }
+        updateTabCounters();
+    } catch (error) {
+        console.error('Ошибка загрузки данных:', error);
+        showError(`Не удалось загрузить данные: ${error.message}`);
+    } finally {
+        paging.loading = false;
+    }
+}
+
+// Кнопка "Показать еще" под таблицей, пока есть следующая страница
+function loadMoreButton(tab) {
+    if (!taskPaging[tab].cursor) return '';
+    return `
+        <div class="empty-state">
+            <button class="btn btn-secondary" onclick="loadMoreTasks()">Показать еще</button>
+        </div>
+    `;
+}
+
+// Подгрузка при прокрутке списка к концу (scroll не всплывает - перехват)
+document.addEventListener('scroll', event => {
+    const target = event.target === document ? document.scrollingElement : event.target;
+    if (target.scrollTop + target.clientHeight >= target.scrollHeight - 200) {
+        loadMoreTasks();
+    }
+}, true);
+
 // Загрузка данных
 async function loadData() {
     showLoading();
     
     try {
-        let url = '';
         const params = new URLSearchParams();
         
         // Добавляем фильтры
@@ -130,29 +203,18 @@ async function loadData() {
         
         if (currentTab === 0) {
             params.append('archived', 'false');
-            url = `${API_URL}/tasks?${params.toString()}`;
-        } else if (currentTab === 1) {
-            url = `${API_URL}/receptions?${params.toString()}`;
-        } else if (currentTab === 2) {
-            params.set('archived', 'true');
-            url = `${API_URL}/tasks?${params.toString()}`;
-        }
-
-        const response = await fetch(url);
-        if (!response.ok) {
-            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-        }
-        
-        const data = await response.json();
-
-        if (currentTab === 0) {
-            tasks = data;
+            tasks = await loadTasksTab(0, params, tasks.length);
             renderTasks();
         } else if (currentTab === 1) {
-            receptions = data;
+            const response = await fetch(`${API_URL}/receptions?${params.toString()}`);
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            }
+            receptions = await response.json();
             renderReceptions();
         } else if (currentTab === 2) {
-            archivedTasks = data;
+            params.set('archived', 'true');
+            archivedTasks = await loadTasksTab(2, params, archivedTasks.length);
             renderArchivedTasks();
         }
         
@@ -201,7 +263,8 @@ function updateTabCounters() {
     receptionsCounter.textContent = receptions.length;
     receptionsCounter.style.display = receptions.length > 0 ? 'inline' : 'none';
     
-    archiveCounter.textContent = archivedTasks.length;
+    // Архив загружается страницами: "+" - загружено не все
+    archiveCounter.textContent = `${archivedTasks.length}${taskPaging[2].cursor ? '+' : ''}`;
     archiveCounter.style.display = archivedTasks.length > 0 ? 'inline' : 'none';
 }
 
@@ -261,7 +324,7 @@ function renderTasks() {
                     
                     return `
                         <tr class="${rowClass}" ondblclick="editTask(${task.id})" 
-                            style="animation: fadeInUp 0.3s ease ${index * 0.05}s both">
+                            style="animation: fadeInUp 0.3s ease ${Math.min(index, 20) * 0.05}s both">
                             <td onclick="event.stopPropagation()">
                                 <input type="checkbox" class="checkbox task-checkbox" 
                                        value="${task.id}" onchange="toggleTaskSelection(${task.id})">
@@ -297,6 +360,7 @@ function renderTasks() {
                 }).join('')}
             </tbody>
         </table>
+        ${loadMoreButton(0)}
     `;
     
     // Обновляем состояние чекбоксов
@@ -732,6 +796,7 @@ function openTaskModal(task = null) {
 
 // Экспорт функций для глобального использования
 window.switchTab = switchTab;
+window.loadMoreTasks = loadMoreTasks;
 window.openTaskModal = openTaskModal;
 window.openReceptionModal = openReceptionModal;
 window.editTask = editTask;